@@ -1,3 +1,29 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.auth.admin import UserAdmin
+from django.contrib.auth.models import User
 
-# Register your models here.
+from tasks.purging import request_account_deletion
+
+
+admin.site.unregister(User)
+
+
+@admin.register(User)
+class AccountUserAdmin(UserAdmin):
+    """
+    The stock user admin plus a bulk action that deletes users in the
+    background (see tasks.purging), for users with too many tasks for the
+    delete page.
+    """
+    actions = ['schedule_deletion']
+
+    @admin.action(description='Deactivate and delete selected users in the background')
+    def schedule_deletion(self, request, queryset):
+        users = list(queryset)
+        for user in users:
+            request_account_deletion(user)
+        self.message_user(
+            request,
+            f'{len(users)} user(s) deactivated; run purge_deleted_users to delete their data.',
+            messages.SUCCESS,
+        )
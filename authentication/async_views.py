@@ -0,0 +1,122 @@
+"""
+Native async login and registration for ASGI deployments.
+
+``LoginView`` and ``RegisterView`` hold a worker thread for the whole
+password hash. ``AsyncLoginView`` and ``AsyncRegisterView`` answer JSON
+requests as coroutines that await the hashing pool instead (see
+``authentication.hashing``), so a login storm occupies at most the pool's
+threads, never the ones serving other requests. Responses are the same as
+the DRF views'; anything else (browsable API, form posts, OPTIONS) is
+passed to ``sync_view``. Enabled by ``AUTH_ASYNC_VIEWS``.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from .hashing import aauthenticate_user, amake_password
+from .serializers import LoginSerializer, RegisterSerializer, UserSerializer
+
+
+JSON = 'application/json'
+
+
+class AsyncAuthView(View):
+    """Base for the async views: JSON ``POST`` natively, the rest via ``sync_view``."""
+    sync_view = None
+    renderer = JSONRenderer()
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # Like DRF's APIView: these endpoints take no session credentials.
+        view.csrf_exempt = True
+        return view
+
+    def handles(self, request):
+        """Whether this request can be served natively."""
+        return (
+            request.method == 'POST'
+            and request.content_type == JSON
+            and request.headers.get('Accept', '*/*') in ('*/*', JSON)
+            and 'format' not in request.GET
+        )
+
+    async def dispatch(self, request, *args, **kwargs):
+        if not self.handles(request):
+            return await sync_to_async(self.sync_view)(request, *args, **kwargs)
+        try:
+            # The DRF view's throttles, in memory (todo_project.throttling).
+            drf_request = Request(request)
+            self.sync_view.cls(request=drf_request, args=args, kwargs=kwargs).check_throttles(drf_request)
+            try:
+                data = json.loads(request.body or b'null')
+            except ValueError as exc:
+                raise exceptions.ParseError(f'JSON parse error - {exc}')
+            return await self.handle(request, data)
+        except exceptions.APIException as exc:
+            return self.error_response(exc)
+
+    def response(self, data, status_code=status.HTTP_200_OK):
+        response = HttpResponse(self.renderer.render(data), status=status_code, content_type=JSON)
+        response['Allow'] = 'POST, OPTIONS'
+        patch_vary_headers(response, ['Accept'])
+        return response
+
+    def error_response(self, exc):
+        if isinstance(exc.detail, (list, dict)):
+            data = exc.detail
+        else:
+            data = {'detail': exc.detail}
+        response = self.response(data, exc.status_code)
+        if getattr(exc, 'wait', None):
+            response['Retry-After'] = '%d' % exc.wait
+        return response
+
+    # View.view_is_async inspects the HTTP verb handlers; every verb goes
+    # through dispatch() above.
+    get = post = put = patch = delete = dispatch
+
+
+class AsyncLoginView(AsyncAuthView):
+    """``POST /api/auth/login/``, answered like ``LoginView``."""
+
+    async def handle(self, request, data):
+        serializer = LoginSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        user = await aauthenticate_user(
+            request, serializer.validated_data['username'], serializer.validated_data['password'],
+        )
+        if user is None:
+            return self.response({'error': 'Invalid credentials'}, status.HTTP_401_UNAUTHORIZED)
+        token, _ = await Token.objects.aget_or_create(user=user)
+        return self.response({
+            'token': token.key,
+            'user_id': user.id,
+            'username': user.username,
+            'email': user.email,
+        })
+
+
+class AsyncRegisterView(AsyncAuthView):
+    """``POST /api/auth/register/``, answered like ``RegisterView``."""
+
+    async def handle(self, request, data):
+        serializer = RegisterSerializer(data=data)
+        # The unique email check and password validators query the database.
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+        user = serializer.build_user(serializer.validated_data)
+        user.password = await amake_password(serializer.validated_data['password'])
+        await user.asave()
+        token, _ = await Token.objects.aget_or_create(user=user)
+        return self.response({
+            'user': UserSerializer(user).data,
+            'token': token.key,
+            'message': 'User registered successfully',
+        }, status.HTTP_201_CREATED)
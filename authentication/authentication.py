@@ -0,0 +1,250 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+from rest_framework.exceptions import AuthenticationFailed
+
+
+class TokenCache:
+    """
+    Base class for token -> (user, token) caches with hit/miss counters.
+
+    Subclasses implement ``_get``, ``_set``, ``_delete`` and ``_clear``, and
+    may override ``_aget``/``_aset`` when they can avoid a thread hop.
+    """
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._counter_lock = threading.Lock()
+
+    def get(self, key):
+        return self._count(self._get(key))
+
+    async def aget(self, key):
+        return self._count(await self._aget(key))
+
+    def _count(self, value):
+        with self._counter_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self._set(key, value)
+
+    async def aset(self, key, value):
+        await self._aset(key, value)
+
+    async def _aget(self, key):
+        return await sync_to_async(self._get)(key)
+
+    async def _aset(self, key, value):
+        await sync_to_async(self._set)(key, value)
+
+    def delete(self, key):
+        self._delete(key)
+
+    def clear(self):
+        self._clear()
+        with self._counter_lock:
+            self.hits = self.misses = 0
+
+    def stats(self):
+        """Return hit/miss counters for this process."""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / total if total else 0.0,
+        }
+
+
+class LocalTokenCache(TokenCache):
+    """
+    Bounded, thread-safe LRU with a per-entry TTL, local to the process.
+
+    Invalidation only reaches the process that handled the write; other
+    worker processes drop stale entries when their TTL expires. Use
+    ``DjangoTokenCache`` with a shared cache when that window matters.
+    """
+
+    def __init__(self, timeout, max_entries, clock=time.monotonic):
+        super().__init__(timeout)
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= self.clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        # Hand out a copy so one request cannot mutate another's user.
+        user, token = value
+        return copy.copy(user), token
+
+    def _set(self, key, value):
+        with self._lock:
+            self._entries[key] = (self.clock() + self.timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def _aget(self, key):
+        # Memory only: safe to call from the event loop.
+        return self._get(key)
+
+    async def _aset(self, key, value):
+        self._set(key, value)
+
+    def _delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def _clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {**super().stats(), 'size': len(self._entries)}
+
+
+class DjangoTokenCache(TokenCache):
+    """
+    Token cache stored in a Django cache backend (e.g. Redis or memcached).
+
+    Keys are hashed so raw tokens never appear in the cache's key space.
+    """
+    key_prefix = 'authtoken'
+
+    def __init__(self, timeout, alias):
+        super().__init__(timeout)
+        self.cache = caches[alias]
+
+    def make_key(self, key):
+        return f'{self.key_prefix}:{hashlib.sha256(key.encode()).hexdigest()}'
+
+    def _get(self, key):
+        return self.cache.get(self.make_key(key))
+
+    def _set(self, key, value):
+        self.cache.set(self.make_key(key), value, self.timeout)
+
+    async def _aget(self, key):
+        return await self.cache.aget(self.make_key(key))
+
+    async def _aset(self, key, value):
+        await self.cache.aset(self.make_key(key), value, self.timeout)
+
+    def _delete(self, key):
+        self.cache.delete(self.make_key(key))
+
+    def _clear(self):
+        # Entries expire on their own; clearing a shared cache here would
+        # drop unrelated keys.
+        pass
+
+
+_token_cache = None
+
+
+def get_token_cache():
+    """
+    Return the process-wide token cache configured by ``TOKEN_AUTH_CACHE``.
+    """
+    global _token_cache
+    if _token_cache is None:
+        options = settings.TOKEN_AUTH_CACHE
+        if options['BACKEND'] == 'django':
+            _token_cache = DjangoTokenCache(options['TIMEOUT'], options['CACHE_ALIAS'])
+        else:
+            _token_cache = LocalTokenCache(options['TIMEOUT'], options['MAX_ENTRIES'])
+    return _token_cache
+
+
+@receiver(setting_changed)
+def reset_token_cache(setting, **kwargs):
+    global _token_cache
+    if setting in ('TOKEN_AUTH_CACHE', 'CACHES'):
+        _token_cache = None
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    ``TokenAuthentication`` that caches the token -> user lookup.
+
+    A cache hit authenticates the request without touching the database.
+    Entries are evicted when the token is deleted (logout) and when its
+    user is saved (deactivation, profile changes); see
+    ``authentication.signals``.
+    """
+
+    def authenticate_credentials(self, key):
+        cache = get_token_cache()
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+        user, token = super().authenticate_credentials(key)
+        cache.set(key, (user, token))
+        return user, token
+
+    async def aauthenticate(self, request):
+        """
+        Async counterpart of ``authenticate()`` for native async views.
+
+        Returns ``None`` when the request carries no token header.
+        """
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) == 1:
+            raise AuthenticationFailed(_('Invalid token header. No credentials provided.'))
+        if len(auth) > 2:
+            raise AuthenticationFailed(_('Invalid token header. Token string should not contain spaces.'))
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise AuthenticationFailed(
+                _('Invalid token header. Token string should not contain invalid characters.')
+            )
+        return await self.aauthenticate_credentials(key)
+
+    async def aauthenticate_credentials(self, key):
+        """
+        ``authenticate_credentials()`` with the async ORM; a cache hit stays
+        on the event loop.
+        """
+        cache = get_token_cache()
+        cached = await cache.aget(key)
+        if cached is not None:
+            return cached
+
+        model = self.get_model()
+        try:
+            token = await model.objects.select_related('user').aget(key=key)
+        except model.DoesNotExist:
+            raise AuthenticationFailed(_('Invalid token.'))
+        if not token.user.is_active:
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+        await cache.aset(key, (token.user, token))
+        return token.user, token
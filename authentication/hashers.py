@@ -0,0 +1,29 @@
+"""
+Password hashers whose cost comes from ``PASSWORD_HASHING``.
+
+They keep Django's algorithm names, so hashes made by Django's own
+hashers still verify. ``must_update()`` compares the stored cost with the
+configured one, so when the cost or ``PASSWORD_HASHING['HASHER']`` changes
+each password is rehashed the next time its user logs in.
+"""
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 with ``PBKDF2_ITERATIONS`` iterations."""
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASHING['PBKDF2_ITERATIONS']
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    """``hashlib.scrypt`` with a CPU/memory cost of ``SCRYPT_WORK_FACTOR``."""
+    # A limit, not an allocation: OpenSSL's default of 32 MB would reject
+    # work factors above 2**14.
+    maxmem = 2**30
+
+    @property
+    def work_factor(self):
+        return settings.PASSWORD_HASHING['SCRYPT_WORK_FACTOR']
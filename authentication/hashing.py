@@ -0,0 +1,149 @@
+"""
+Password hashing off the request thread.
+
+Making or checking a password hash costs tens to hundreds of milliseconds
+of CPU by design (see ``authentication.hashers``). Login and registration
+run it on a dedicated pool of ``PASSWORD_HASHING['WORKERS']`` threads:
+
+- at most ``WORKERS`` hashes run at once, so a burst of logins uses at most
+  that many cores and leaves the rest to other requests (``hashlib``
+  releases the GIL while hashing, so the pool's threads run in parallel);
+- at most ``QUEUE_SIZE`` more wait for a thread; past that ``HashingBusy``
+  answers 503 with ``Retry-After`` at once instead of letting requests
+  pile up;
+- the async views (``authentication.async_views``) await the pool without
+  holding a thread; the synchronous views block on it.
+
+``authenticate_user()`` and ``aauthenticate_user()`` stand in for
+``django.contrib.auth.authenticate()`` with the model backend (the only
+one configured): same checks, same ``user_login_failed`` signal, and a
+password stored with an outdated hasher or cost is rehashed on success.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_login_failed
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class HashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many logins in progress, try again shortly.'
+    default_code = 'hashing_busy'
+    # Sent as Retry-After by DRF's exception handler.
+    wait = 1
+
+
+class HashingPool:
+    """A thread pool that refuses work once ``workers + queue_size`` jobs are pending."""
+
+    def __init__(self, workers, queue_size):
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='password-hashing')
+        self.slots = threading.BoundedSemaphore(workers + queue_size)
+
+    def submit(self, func, *args):
+        if not self.slots.acquire(blocking=False):
+            raise HashingBusy()
+        try:
+            future = self.executor.submit(func, *args)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+    def run(self, func, *args):
+        return self.submit(func, *args).result()
+
+    async def arun(self, func, *args):
+        return await asyncio.wrap_future(self.submit(func, *args))
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_hashing_pool():
+    """Return the process-wide pool configured by ``PASSWORD_HASHING``."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            options = settings.PASSWORD_HASHING
+            _pool = HashingPool(options['WORKERS'], options['QUEUE_SIZE'])
+        return _pool
+
+
+@receiver(setting_changed)
+def reset_hashing_pool(setting, **kwargs):
+    global _pool
+    if setting == 'PASSWORD_HASHING' and _pool is not None:
+        _pool.shutdown()
+        _pool = None
+
+
+def make_password(password):
+    """``make_password()`` on the hashing pool."""
+    return get_hashing_pool().run(hashers.make_password, password)
+
+
+async def amake_password(password):
+    """Async counterpart of ``make_password()``."""
+    return await get_hashing_pool().arun(hashers.make_password, password)
+
+
+def _verify(password, encoded):
+    """Return whether ``password`` matches and whether its hash is outdated."""
+    outdated = []
+    return hashers.check_password(password, encoded, outdated.append), bool(outdated)
+
+
+def _lookup(username):
+    return User._default_manager.filter(**{User.USERNAME_FIELD: username})
+
+
+def authenticate_user(request, username, password):
+    """Return the active user with these credentials, or None."""
+    pool = get_hashing_pool()
+    user = _lookup(username).first()
+    if user is None:
+        # Take as long as a wrong password would.
+        pool.run(hashers.make_password, password)
+    else:
+        valid, outdated = pool.run(_verify, password, user.password)
+        if valid and user.is_active:
+            if outdated:
+                user.password = pool.run(hashers.make_password, password)
+                user.save(update_fields=['password'])
+            return user
+    user_login_failed.send(sender=__name__, credentials={'username': username}, request=request)
+    return None
+
+
+async def aauthenticate_user(request, username, password):
+    """Async counterpart of ``authenticate_user()``."""
+    pool = get_hashing_pool()
+    user = await _lookup(username).afirst()
+    if user is None:
+        await pool.arun(hashers.make_password, password)
+    else:
+        valid, outdated = await pool.arun(_verify, password, user.password)
+        if valid and user.is_active:
+            if outdated:
+                user.password = await pool.arun(hashers.make_password, password)
+                await user.asave(update_fields=['password'])
+            return user
+    await sync_to_async(user_login_failed.send)(
+        sender=__name__, credentials={'username': username}, request=request,
+    )
+    return None
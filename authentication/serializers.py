@@ -2,6 +2,7 @@ from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
 from rest_framework.validators import UniqueValidator
+from .hashing import make_password
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -50,18 +51,26 @@ class RegisterSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError({"password": "Password fields didn't match."})
         return attrs
 
-    def create(self, validated_data):
+    def build_user(self, validated_data):
         """
-        Create and return a new user with encrypted password.
+        Return the new user, unsaved and without a password, the way
+        ``create_user()`` builds it.
         """
-        validated_data.pop('password2')
-        user = User.objects.create_user(
-            username=validated_data['username'],
-            email=validated_data['email'],
-            password=validated_data['password'],
+        return User(
+            username=User.normalize_username(validated_data['username']),
+            email=User.objects.normalize_email(validated_data['email']),
             first_name=validated_data.get('first_name', ''),
             last_name=validated_data.get('last_name', '')
         )
+
+    def create(self, validated_data):
+        """
+        Create and return a new user with encrypted password, hashed on
+        the password hashing pool (see authentication.hashing).
+        """
+        user = self.build_user(validated_data)
+        user.password = make_password(validated_data['password'])
+        user.save()
         return user
 
 
@@ -0,0 +1,23 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import get_token_cache
+
+
+@receiver(post_delete, sender=Token)
+def evict_deleted_token(sender, instance, **kwargs):
+    """Drop a deleted token (e.g. on logout) from the token cache."""
+    get_token_cache().delete(instance.key)
+
+
+@receiver(post_save, sender=User)
+def evict_saved_user_tokens(sender, instance, **kwargs):
+    """
+    Drop a user's cached token whenever the user is saved, so deactivation
+    and profile changes are seen by the next request.
+    """
+    cache = get_token_cache()
+    for key in Token.objects.filter(user=instance).values_list('key', flat=True):
+        cache.delete(key)
@@ -1,8 +1,17 @@
-from django.test import TestCase
+import json
+import threading
+
+from django.conf import settings
+from django.test import AsyncRequestFactory, TestCase, override_settings
 from django.contrib.auth.models import User
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from .async_views import AsyncLoginView, AsyncRegisterView
+from .authentication import CachedTokenAuthentication, DjangoTokenCache, LocalTokenCache, get_token_cache
+from .hashing import get_hashing_pool
+from .views import LoginView, RegisterView
 
 
 class AuthenticationAPITest(APITestCase):
@@ -155,3 +164,159 @@ class AuthenticationAPITest(APITestCase):
         # Verify changes were saved
         self.user.refresh_from_db()
         self.assertEqual(self.user.first_name, 'Test')
+
+
+class CachedTokenAuthenticationTest(APITestCase):
+    """Test the cached token -> user lookup"""
+
+    def setUp(self):
+        get_token_cache().clear()
+        self.user = User.objects.create_user(username='cached', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def test_second_request_skips_token_query(self):
+        """Test that a cached token authenticates without a query"""
+        with self.assertNumQueries(2):
+            self.client.get('/api/auth/profile/')
+        with self.assertNumQueries(1):  # the profile itself
+            response = self.client.get('/api/auth/profile/')
+        self.assertEqual(response.data['username'], 'cached')
+        self.assertEqual(get_token_cache().stats()['hits'], 1)
+        self.assertEqual(get_token_cache().stats()['misses'], 1)
+
+    def test_logout_invalidates_cached_token(self):
+        """Test that a logged-out token stops working immediately"""
+        self.client.get('/api/auth/profile/')
+        self.client.post('/api/auth/logout/')
+        response = self.client.get('/api/auth/profile/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivation_invalidates_cached_token(self):
+        """Test that a deactivated user is rejected on the next request"""
+        self.client.get('/api/auth/profile/')
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get('/api/auth/profile/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_profile_is_read_from_the_database(self):
+        """Test that the profile is not served or saved from a cached user"""
+        self.client.get('/api/auth/profile/')
+        User.objects.filter(pk=self.user.pk).update(email='fresh@example.com')
+        response = self.client.patch('/api/auth/profile/', {'first_name': 'Cached'})
+        self.assertEqual(response.data['email'], 'fresh@example.com')
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.email, self.user.first_name), ('fresh@example.com', 'Cached'))
+
+    @override_settings(TOKEN_AUTH_CACHE={'BACKEND': 'django', 'TIMEOUT': 60, 'CACHE_ALIAS': 'default'})
+    def test_django_cache_backend(self):
+        """Test caching and invalidation through the Django cache framework"""
+        self.assertIsInstance(get_token_cache(), DjangoTokenCache)
+        self.client.get('/api/auth/profile/')
+        with self.assertNumQueries(1):
+            self.client.get('/api/auth/profile/')
+        self.token.delete()
+        response = self.client.get('/api/auth/profile/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_local_cache_lru_and_ttl(self):
+        """Test that the local cache is bounded and entries expire"""
+        now = [0.0]
+        cache = LocalTokenCache(timeout=10, max_entries=2, clock=lambda: now[0])
+        cache.set('a', (self.user, 'a'))
+        cache.set('b', (self.user, 'b'))
+        cache.get('a')
+        cache.set('c', (self.user, 'c'))
+        self.assertIsNone(cache.get('b'))  # least recently used was evicted
+        self.assertIsNotNone(cache.get('a'))
+        now[0] = 11.0
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['size'], 1)
+
+    async def test_async_authentication_uses_cache(self):
+        """Test aauthenticate() against the same cache as the sync path"""
+        factory, auth = AsyncRequestFactory(), CachedTokenAuthentication()
+        request = factory.get('/api/tasks/', headers={'Authorization': 'Token ' + self.token.key})
+        user, token = await auth.aauthenticate(request)
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(token.key, self.token.key)
+        self.assertIsNotNone(get_token_cache().get(self.token.key))
+        self.assertIsNone(await auth.aauthenticate(factory.get('/api/tasks/')))
+        with self.assertRaises(AuthenticationFailed):
+            await auth.aauthenticate(factory.get('/api/tasks/', headers={'Authorization': 'Token nope'}))
+
+
+FAST_HASHING = {**settings.PASSWORD_HASHING, 'PBKDF2_ITERATIONS': 1000, 'SCRYPT_WORK_FACTOR': 2**10}
+SCRYPT_FIRST = [
+    'authentication.hashers.ScryptPasswordHasher',
+    'authentication.hashers.PBKDF2PasswordHasher',
+]
+
+
+@override_settings(PASSWORD_HASHING=FAST_HASHING)
+class PasswordHashingTest(APITestCase):
+    """Test login/register hashing on the bounded pool"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='hasher', email='h@example.com', password='testpass123')
+        self.factory = AsyncRequestFactory()
+
+    def login(self, password='testpass123'):
+        return self.client.post('/api/auth/login/', {'username': 'hasher', 'password': password})
+
+    def post(self, path, data):
+        return self.factory.post(path, json.dumps(data), content_type='application/json')
+
+    def test_rehash_on_login(self):
+        """Test that passwords move to the configured hasher and cost on login"""
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+        with override_settings(PASSWORD_HASHING={**FAST_HASHING, 'HASHER': 'scrypt'}, PASSWORD_HASHERS=SCRYPT_FIRST):
+            self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+            self.user.refresh_from_db()
+            self.assertTrue(self.user.password.startswith('scrypt$1024$'))
+            with override_settings(PASSWORD_HASHING={**FAST_HASHING, 'SCRYPT_WORK_FACTOR': 2**11}):
+                self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+            self.user.refresh_from_db()
+            self.assertTrue(self.user.password.startswith('scrypt$2048$'))
+            self.assertEqual(self.login('wrong').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_busy_pool_sheds_logins(self):
+        """Test that logins past the pool's queue get 503 with Retry-After"""
+        with override_settings(PASSWORD_HASHING={**FAST_HASHING, 'WORKERS': 1, 'QUEUE_SIZE': 0}):
+            release = threading.Event()
+            get_hashing_pool().submit(release.wait)
+            try:
+                response = self.login()
+            finally:
+                release.set()
+            self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+            self.assertEqual(response['Retry-After'], '1')
+
+    async def test_async_login_matches_sync_view(self):
+        """Test that the async login view answers like LoginView"""
+        view = AsyncLoginView.as_view(sync_view=LoginView.as_view())
+        response = await view(self.post('/api/auth/login/', {'username': 'hasher', 'password': 'testpass123'}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        token = await Token.objects.aget(user=self.user)
+        self.assertEqual(json.loads(response.content), {
+            'token': token.key, 'user_id': self.user.pk, 'username': 'hasher', 'email': 'h@example.com',
+        })
+        response = await view(self.post('/api/auth/login/', {'username': 'hasher', 'password': 'wrong'}))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = await view(self.post('/api/auth/login/', {'username': 'hasher'}))
+        self.assertEqual(json.loads(response.content), {'password': ['This field is required.']})
+
+    async def test_async_register(self):
+        """Test that the async register view creates a usable account"""
+        view = AsyncRegisterView.as_view(sync_view=RegisterView.as_view())
+        data = {'username': 'fresh', 'email': 'Fresh@EXAMPLE.com', 'password': 'newpass123!', 'password2': 'newpass123!'}
+        response = await view(self.post('/api/auth/register/', data))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        body = json.loads(response.content)
+        self.assertEqual((body['user']['username'], body['user']['email']), ('fresh', 'Fresh@example.com'))
+        user = await User.objects.aget(username='fresh')
+        self.assertTrue(user.check_password('newpass123!'))
+        self.assertEqual(body['token'], (await Token.objects.aget(user=user)).key)
+        response = await view(self.post('/api/auth/register/', data))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,9 +1,19 @@
+from django.conf import settings
 from django.urls import path
+from .async_views import AsyncLoginView, AsyncRegisterView
 from .views import RegisterView, LoginView, LogoutView, UserProfileView
 
+
+def async_view(async_view_class, sync_view):
+    """The native async view falling back to ``sync_view``, if AUTH_ASYNC_VIEWS is on."""
+    if settings.AUTH_ASYNC_VIEWS:
+        return async_view_class.as_view(sync_view=sync_view)
+    return sync_view
+
+
 urlpatterns = [
-    path('register/', RegisterView.as_view(), name='register'),
-    path('login/', LoginView.as_view(), name='login'),
+    path('register/', async_view(AsyncRegisterView, RegisterView.as_view()), name='register'),
+    path('login/', async_view(AsyncLoginView, LoginView.as_view()), name='login'),
     path('logout/', LogoutView.as_view(), name='logout'),
     path('profile/', UserProfileView.as_view(), name='profile'),
 ]
@@ -3,8 +3,10 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.authtoken.models import Token
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
+from tasks.purging import request_account_deletion
+from todo_project.replicas import ReplicaReadMixin
+from .hashing import authenticate_user
 from .serializers import RegisterSerializer, LoginSerializer, UserSerializer
 
 
@@ -32,6 +34,9 @@ class RegisterView(generics.CreateAPIView):
         "token": "a1b2c3d4e5f6...",
         "message": "User registered successfully"
     }
+
+    The password is hashed on the hashing pool (authentication.hashing);
+    AsyncRegisterView serves the same endpoint under ASGI.
     """
     queryset = User.objects.all()
     permission_classes = [AllowAny]
@@ -69,9 +74,14 @@ class LoginView(APIView):
         "username": "johndoe",
         "email": "john@example.com"
     }
+
+    The password is checked on the hashing pool (authentication.hashing)
+    and rehashed if its hasher or cost is outdated; AsyncLoginView serves
+    the same endpoint under ASGI.
     """
     permission_classes = [AllowAny]
     serializer_class = LoginSerializer
+    throttle_scope = 'login'
 
     def post(self, request):
         serializer = LoginSerializer(data=request.data)
@@ -80,8 +90,8 @@ class LoginView(APIView):
         username = serializer.validated_data['username']
         password = serializer.validated_data['password']
         
-        # Authenticate user
-        user = authenticate(username=username, password=password)
+        # Authenticate user (the password is checked on the hashing pool)
+        user = authenticate_user(request, username, password)
         
         if user is not None:
             # Get or create token
@@ -127,18 +137,30 @@ class LogoutView(APIView):
             }, status=status.HTTP_400_BAD_REQUEST)
 
 
-class UserProfileView(generics.RetrieveUpdateAPIView):
+class UserProfileView(ReplicaReadMixin, generics.RetrieveUpdateAPIView):
     """
     API endpoint to view and update user profile.
     
     GET /api/auth/profile/
-    Returns current user's profile
+    Returns current user's profile (from a read replica, if configured)
     
     PUT/PATCH /api/auth/profile/
     Update current user's profile
+
+    DELETE /api/auth/profile/
+    Delete the account: the user is deactivated and logged out at once,
+    their data is purged in the background (tasks.purging)
     """
     permission_classes = [IsAuthenticated]
     serializer_class = UserSerializer
 
     def get_object(self):
-        return self.request.user
+        # request.user may come from the token cache: edit the stored row,
+        # not a copy that can be a few seconds old.
+        return User.objects.get(pk=self.request.user.pk)
+
+    def delete(self, request):
+        request_account_deletion(request.user)
+        return Response({
+            'message': 'Account scheduled for deletion'
+        }, status=status.HTTP_202_ACCEPTED)
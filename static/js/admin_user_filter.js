@@ -0,0 +1,15 @@
+// Task admin: reload the changelist when a user is picked in the user filter
+'use strict';
+django.jQuery(function($) {
+    $('.user-filter select').on('change', function() {
+        const params = new URLSearchParams(window.location.search);
+        // A new filter starts again from the first page.
+        params.delete('cursor');
+        if (this.value) {
+            params.set(this.name, this.value);
+        } else {
+            params.delete(this.name);
+        }
+        window.location.search = params.toString();
+    });
+});
@@ -4,6 +4,10 @@ let authToken = localStorage.getItem('authToken');
 let currentUser = JSON.parse(localStorage.getItem('currentUser') || 'null');
 let allTasks = [];
 let currentFilter = 'all';
+let taskEvents = null;
+let taskEventsCursor = null;
+let taskEventsTimer = null;
+let statsTimer = null;
 
 // Initialize app
 document.addEventListener('DOMContentLoaded', () => {
@@ -121,6 +125,7 @@ async function logout() {
         currentUser = null;
         localStorage.removeItem('authToken');
         localStorage.removeItem('currentUser');
+        disconnectTaskEvents();
         showAlert('Logged out successfully', 'success');
         setTimeout(() => {
             showAuth();
@@ -131,7 +136,10 @@ async function logout() {
 // Task Functions
 async function loadTasks() {
     try {
+        // 'no-cache' revalidates with If-None-Match, so an unchanged list
+        // comes back as a bodyless 304 served from the browser cache.
         const response = await fetch(`${API_BASE_URL}/tasks/`, {
+            cache: 'no-cache',
             headers: {
                 'Authorization': `Token ${authToken}`,
                 'Content-Type': 'application/json'
@@ -143,6 +151,9 @@ async function loadTasks() {
             allTasks = data.results || data;
             renderTasks();
             updateStats();
+            if (!taskEvents) {
+                connectTaskEvents();
+            }
         } else if (response.status === 401) {
             showAlert('Session expired. Please login again.', 'error');
             logout();
@@ -177,7 +188,7 @@ async function addTask(event) {
         if (response.ok) {
             showAlert('Task added successfully!', 'success');
             form.reset();
-            await loadTasks();
+            await refreshTasks();
         } else {
             showAlert('Failed to add task', 'error');
         }
@@ -200,7 +211,7 @@ async function toggleTaskComplete(taskId, currentStatus) {
         });
         
         if (response.ok) {
-            await loadTasks();
+            await refreshTasks();
         }
     } catch (error) {
         showAlert('Error updating task', 'error');
@@ -221,13 +232,97 @@ async function deleteTask(taskId) {
         
         if (response.ok) {
             showAlert('Task deleted successfully', 'success');
-            await loadTasks();
+            await refreshTasks();
         }
     } catch (error) {
         showAlert('Error deleting task', 'error');
     }
 }
 
+// Reload the list after a write, unless the event stream will deliver the
+// change.
+async function refreshTasks() {
+    if (!taskEvents || taskEvents.readyState !== EventSource.OPEN) {
+        await loadTasks();
+    }
+}
+
+// Live updates: the server pushes every change to this user's tasks as a
+// server-sent event, applied to allTasks in place.
+async function connectTaskEvents() {
+    if (!window.EventSource || taskEvents) return;
+    // EventSource cannot send an Authorization header, and a token in the
+    // URL would end up in server logs: open the stream with a short-lived,
+    // single-use ticket instead.
+    taskEvents = { readyState: EventSource.CONNECTING, close() {} };
+    let ticket;
+    try {
+        const response = await fetch(`${API_BASE_URL}/tasks/events/ticket/`, {
+            method: 'POST',
+            headers: { 'Authorization': `Token ${authToken}` }
+        });
+        if (!response.ok) throw new Error(`Ticket request failed: ${response.status}`);
+        ({ ticket } = await response.json());
+    } catch (error) {
+        reconnectTaskEvents();
+        return;
+    }
+    if (!taskEvents) return;  // logged out meanwhile
+
+    const params = new URLSearchParams({ ticket });
+    if (taskEventsCursor) params.set('since', taskEventsCursor);
+    taskEvents = new EventSource(`${API_BASE_URL}/tasks/events/?${params}`);
+    taskEvents.addEventListener('upsert', (event) => {
+        const task = JSON.parse(event.data);
+        const index = allTasks.findIndex(existing => existing.id === task.id);
+        if (index === -1) {
+            allTasks.unshift(task);
+        } else {
+            allTasks[index] = task;
+        }
+        taskChanged();
+    });
+    taskEvents.addEventListener('delete', (event) => {
+        const { id } = JSON.parse(event.data);
+        allTasks = allTasks.filter(task => task.id !== id);
+        taskChanged();
+    });
+    taskEvents.addEventListener('cursor', (event) => {
+        taskEventsCursor = event.lastEventId;
+    });
+    taskEvents.addEventListener('reset', () => {
+        // The server cannot resume from our last event; start over.
+        disconnectTaskEvents();
+        loadTasks();
+    });
+    // The ticket is spent: reconnect with a new one rather than letting
+    // EventSource retry the same URL.
+    taskEvents.addEventListener('error', reconnectTaskEvents);
+}
+
+function reconnectTaskEvents() {
+    if (!taskEvents) return;
+    taskEvents.close();
+    taskEvents = null;
+    taskEventsTimer = setTimeout(connectTaskEvents, 3000);
+}
+
+function disconnectTaskEvents() {
+    clearTimeout(taskEventsTimer);
+    taskEventsCursor = null;
+    if (taskEvents) {
+        taskEvents.close();
+        taskEvents = null;
+    }
+}
+
+function taskChanged() {
+    renderTasks();
+    // A burst of events refreshes the counters once.
+    clearTimeout(statsTimer);
+    statsTimer = setTimeout(updateStats, 250);
+}
+
 // Render Functions
 function renderTasks() {
     const taskList = document.getElementById('task-list');
@@ -282,14 +377,26 @@ function renderTasks() {
     `).join('');
 }
 
-function updateStats() {
-    const total = allTasks.length;
-    const completed = allTasks.filter(task => task.completed).length;
-    const active = total - completed;
-    
-    document.getElementById('stat-total').textContent = total;
-    document.getElementById('stat-active').textContent = active;
-    document.getElementById('stat-completed').textContent = completed;
+async function updateStats() {
+    // Counts come from the server's counters, so they cover every task,
+    // not just the page that was loaded.
+    try {
+        const response = await fetch(`${API_BASE_URL}/tasks/stats/`, {
+            headers: {
+                'Authorization': `Token ${authToken}`,
+                'Content-Type': 'application/json'
+            }
+        });
+        
+        if (response.ok) {
+            const stats = await response.json();
+            document.getElementById('stat-total').textContent = stats.total;
+            document.getElementById('stat-active').textContent = stats.active;
+            document.getElementById('stat-completed').textContent = stats.completed;
+        }
+    } catch (error) {
+        console.error('Error loading stats:', error);
+    }
 }
 
 function setFilter(filter) {
@@ -1,17 +1,175 @@
+from django import forms
 from django.contrib import admin
-from .models import Task
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ChangeList
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+
+from .models import AccountDeletion, Job, Task
+from .pagination import KeysetPagination, _CountedPaginator, estimate_count
+from .search import get_search_backend
+from .sharding import get_shard, shard_aliases
+
+
+CURSOR_VAR = KeysetPagination.cursor_query_param
+
+
+class ShardListFilter(admin.SimpleListFilter):
+    """
+    Pick the shard the task list is read from (see tasks.sharding). Without
+    a choice, the shard of the user filtered on, or else the first one.
+    """
+    title = 'shard'
+    parameter_name = 'shard'
+
+    def lookups(self, request, model_admin):
+        return [(alias, alias) for alias in shard_aliases()]
+
+    def choices(self, changelist):
+        # There is no "All": a query runs on one database.
+        for alias, title in self.lookup_choices:
+            yield {
+                'selected': self.value() == alias,
+                'query_string': changelist.get_query_string({self.parameter_name: alias}),
+                'display': title,
+            }
+
+    def queryset(self, request, queryset):
+        # TaskAdmin.get_queryset() reads the choice.
+        return queryset
+
+
+class UserAutocompleteFilter(admin.ListFilter):
+    """
+    Filter on the task owner, picked in an autocomplete box that searches
+    the user admin, instead of a sidebar link per user.
+    """
+    title = 'user'
+    parameter_name = 'user__id__exact'
+    template = 'admin/tasks/task/user_filter.html'
+
+    def __init__(self, request, params, model, model_admin):
+        super().__init__(request, params, model, model_admin)
+        self.value = params.pop(self.parameter_name, None)
+        if self.value is not None:
+            self.used_parameters[self.parameter_name] = self.value
+        self.field = forms.ModelChoiceField(
+            queryset=User.objects.all(),
+            required=False,
+            widget=AutocompleteSelect(model._meta.get_field('user'), model_admin.admin_site),
+        )
+
+    def has_output(self):
+        return True
+
+    def expected_parameters(self):
+        return [self.parameter_name]
+
+    def queryset(self, request, queryset):
+        if self.value is None:
+            return queryset
+        try:
+            return queryset.filter(user_id=self.value)
+        except ValueError as exc:
+            raise IncorrectLookupParameters(exc)
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.value is None,
+            'query_string': changelist.get_query_string(remove=[self.parameter_name]),
+            'display': 'All',
+        }
+
+    def rendered_widget(self):
+        # Only the selected user is read, to label the box.
+        return self.field.widget.render(self.parameter_name, self.value)
+
+
+class TaskChangeList(ChangeList):
+    """
+    Changelist read with ``KeysetPagination``: no ``COUNT(*)`` and no
+    ``OFFSET``, the page links carry a ``?cursor=`` to the previous or next
+    page. The number of matching tasks is only counted up to
+    ``TaskAdmin.count_limit`` (see ``estimate_count()``).
+    """
+
+    def get_ordering(self, request, queryset):
+        # KeysetPagination appends the primary key in the direction of the
+        # last key, so (-created_at, -id) indexes serve both sort orders.
+        return [
+            key for key in super().get_ordering(request, queryset)
+            if not (isinstance(key, str) and key.lstrip('-') == 'pk')
+        ]
+
+    def get_queryset(self, request):
+        # Filter, search and sort links start again from the first page.
+        self.params.pop(CURSOR_VAR, None)
+        return super().get_queryset(request)
+
+    def get_results(self, request):
+        keyset = KeysetPagination()
+        keyset.page_size = self.list_per_page
+        try:
+            result_list = keyset.paginate_queryset(self.queryset, Request(request))
+        except NotFound:
+            raise IncorrectLookupParameters
+        if shard_aliases():
+            # A shard has no users table to join: read the page's owners in
+            # one query instead of one per row.
+            users = User.objects.in_bulk({task.user_id for task in result_list})
+            for task in result_list:
+                Task.user.field.set_cached_value(task, users.get(task.user_id))
+
+        limit = self.model_admin.count_limit
+        count, exact = estimate_count(self.queryset, limit)
+        if exact:
+            self.result_estimate = f'{count:,}'
+        elif count > limit:
+            self.result_estimate = f'about {count:,}'
+        else:
+            self.result_estimate = f'more than {limit:,}'
+
+        self.keyset = keyset
+        # "Select all" would act on every matching task; only the page is
+        # offered.
+        self.result_count = len(result_list)
+        self.full_result_count = None
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.result_list = result_list
+        self.can_show_all = False
+        self.multi_page = keyset.has_previous or keyset.has_next
+        self.paginator = _CountedPaginator(len(result_list), self.list_per_page)
 
 
 @admin.register(Task)
 class TaskAdmin(admin.ModelAdmin):
     """
     Admin interface for Task model.
+
+    The list is built for tables with millions of tasks: it is paginated
+    by keyset (see ``TaskChangeList``), sorted only on indexed columns,
+    filtered on one user through an autocomplete box and searched through
+    the full-text index unless the terms are in most tasks, and the owner
+    is picked by id on the change page.
+
+    With sharding on, the list shows one shard at a time and the change
+    page finds a task on whichever shard holds it.
     """
     list_display = ['title', 'user', 'completed', 'created_at', 'updated_at']
-    list_filter = ['completed', 'created_at', 'user']
-    search_fields = ['title', 'description', 'user__username']
+    list_filter = ['completed', 'created_at', UserAutocompleteFilter]
+    list_select_related = ['user']
+    sortable_by = ['created_at']
+    search_fields = ['title', 'description']
+    raw_id_fields = ['user']
     readonly_fields = ['created_at', 'updated_at']
-    
+    show_full_result_count = False
+    # Matching tasks are counted up to this many.
+    count_limit = 10000
+
     fieldsets = (
         ('Task Information', {
             'fields': ('title', 'description', 'completed')
@@ -24,12 +182,99 @@ class TaskAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
-    
+
+    def get_list_filter(self, request):
+        if shard_aliases():
+            return [ShardListFilter, *self.list_filter]
+        return self.list_filter
+
+    def get_list_select_related(self, request):
+        return () if shard_aliases() else self.list_select_related
+
+    def get_changelist(self, request, **kwargs):
+        return TaskChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        terms = search_term.split()
+        backend = get_search_backend(queryset.db) if terms else None
+        # Rows matching a term found in most tasks turn up at once when the
+        # list is read in order and searched with LIKE, where collecting
+        # every match from the index first would take seconds. Rarer terms
+        # are looked up in the index, where LIKE would scan the table.
+        if backend is None or backend.count(terms, self.count_limit + 1) > self.count_limit:
+            return super().get_search_results(request, queryset, search_term)
+        # The list is not sorted by relevance: skip the ranking.
+        return backend.search(queryset, terms, rank=False), False
+
+    @property
+    def media(self):
+        widget = AutocompleteSelect(Task._meta.get_field('user'), self.admin_site)
+        return super().media + widget.media + forms.Media(js=['js/admin_user_filter.js'])
+
+    def get_readonly_fields(self, request, obj=None):
+        # Changing the owner would have to move the row between shards.
+        if shard_aliases() and obj is not None:
+            return [*self.readonly_fields, 'user']
+        return self.readonly_fields
+
     def get_queryset(self, request):
         """
         Show all tasks to superusers, only own tasks to staff users.
         """
         qs = super().get_queryset(request)
-        if request.user.is_superuser:
-            return qs
-        return qs.filter(user=request.user)
+        if not request.user.is_superuser:
+            return qs.using(get_shard(request.user.pk)).filter(user=request.user)
+        if shard_aliases():
+            user_id = request.GET.get('user__id__exact')
+            shard = request.GET.get(ShardListFilter.parameter_name)
+            if shard not in shard_aliases():
+                shard = get_shard(user_id) if user_id else shard_aliases()[0]
+            return qs.using(shard)
+        return qs.select_related('user')
+
+    def get_object(self, request, object_id, from_field=None):
+        if not shard_aliases():
+            return super().get_object(request, object_id, from_field)
+        queryset = self.get_queryset(request)
+        field = self.model._meta.pk if from_field is None else self.model._meta.get_field(from_field)
+        try:
+            object_id = field.to_python(object_id)
+        except (ValidationError, ValueError):
+            return None
+        # Task ids are unique across shards.
+        for alias in shard_aliases():
+            obj = queryset.using(alias).filter(**{field.name: object_id}).first()
+            if obj is not None:
+                return obj
+        return None
+
+
+@admin.register(AccountDeletion)
+class AccountDeletionAdmin(admin.ModelAdmin):
+    """
+    Read-only progress of the background account deletions (see
+    tasks.purging).
+    """
+    list_display = ['username', 'user_id', 'requested_at', 'tasks_deleted', 'finished_at']
+    search_fields = ['username']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """
+    Read-only view of the background job queue (see tasks.jobs).
+    """
+    list_display = ['id', 'name', 'status', 'priority', 'attempts', 'user_id', 'created_at', 'finished_at']
+    list_filter = ['status', 'name']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
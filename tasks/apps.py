@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class TasksConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "tasks"
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        # Register the job handlers (tasks.jobs).
+        from . import archiving, exporting, importing, purging  # noqa: F401
@@ -0,0 +1,112 @@
+"""
+Hot/cold split of the task table.
+
+Completed tasks nobody has touched for ``TASK_ARCHIVE['AFTER_DAYS']`` are
+moved from ``Task`` to ``ArchivedTask`` by ``manage.py archive_tasks``, so
+the indexes and scans behind the task API only cover tasks still in use.
+
+``archive_tasks()`` walks each task database in primary-key order and moves
+``BATCH_SIZE`` tasks per transaction: the rows are copied with their ids
+and deleted through the queryset, so the per-user counters, the data
+version (ETags, cached responses) and the sync tombstones are updated like
+for any other delete. Rows locked by a live write are skipped where the
+database supports it, and a run stopped half way leaves every task in
+exactly one of the two tables; running it again picks up where it stopped.
+``archive_tasks --background`` runs it as a ``tasks.archive`` job instead
+(see tasks.jobs).
+
+Archived tasks are no longer part of the user's live set: they are not in
+``/api/tasks/`` (unless ``?include_archived=true``, see
+``with_archived()``), in the stats or in delta sync.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .changes import batch_changes
+from .jobs import job_handler
+from .models import ArchivedTask, Task
+from .search import SEARCH_RANK
+from .sharding import task_databases
+
+
+ARCHIVED_FIELDS = ['id', 'title', 'description', 'completed', 'user_id', 'created_at', 'updated_at']
+
+
+def archive_batch(alias, before, after_id=0, batch_size=500):
+    """
+    Move up to ``batch_size`` tasks on ``alias`` completed and last updated
+    before ``before``, with ids above ``after_id``, in one transaction.
+    Return the ids moved.
+    """
+    skip_locked = connections[alias].features.has_select_for_update_skip_locked
+    with transaction.atomic(using=alias), batch_changes():
+        tasks = list(
+            Task.objects.using(alias)
+            .filter(completed=True, updated_at__lt=before, id__gt=after_id)
+            .order_by('id')
+            .select_for_update(skip_locked=skip_locked)[:batch_size]
+        )
+        if not tasks:
+            return []
+        ArchivedTask.objects.using(alias).bulk_create(
+            ArchivedTask(**{field: getattr(task, field) for field in ARCHIVED_FIELDS}) for task in tasks
+        )
+        # Sends post_delete per task; batch_changes() merges them per user.
+        ids = [task.id for task in tasks]
+        Task.objects.using(alias).filter(id__in=ids).delete()
+    return ids
+
+
+def archive_tasks(before, batch_size=500, pause=0, progress=None):
+    """
+    Archive every task completed and last updated before ``before`` and
+    return how many were moved. ``pause`` seconds are slept between
+    batches; ``progress`` is called with ``(alias, moved so far)`` after
+    each one.
+    """
+    moved = 0
+    for alias in task_databases():
+        last_id = 0
+        while True:
+            ids = archive_batch(alias, before, last_id, batch_size)
+            if not ids:
+                break
+            moved += len(ids)
+            last_id = ids[-1]
+            if progress:
+                progress(alias, moved)
+            if pause:
+                time.sleep(pause)
+    return moved
+
+
+@job_handler('tasks.archive', priority=-10)
+def archive_tasks_job(job, days=None, batch_size=None, pause=0):
+    options = settings.TASK_ARCHIVE
+    before = timezone.now() - timedelta(days=options['AFTER_DAYS'] if days is None else days)
+    return {'archived': archive_tasks(before, batch_size or options['BATCH_SIZE'], pause)}
+
+
+def with_archived(rows, queryset, archived):
+    """
+    Return the ``values()`` rows of ``queryset`` (filtered and ordered
+    ``Task`` rows) followed by those of ``archived`` (the same user's
+    ``ArchivedTask`` rows, filtered alike) as one ``UNION ALL`` query, in
+    ``queryset``'s ordering. Relevance ranking is not available across the
+    two tables, so search results use the default ordering.
+    """
+    ordering = [
+        field for field in queryset.query.order_by
+        if isinstance(field, str) and field.lstrip('-') != SEARCH_RANK
+    ] or list(Task._meta.ordering)
+    if not any(field.lstrip('-') == 'id' for field in ordering):
+        ordering.append('-id' if ordering[0].startswith('-') else 'id')
+    columns = list(rows.columns.values())
+    combined = queryset.order_by().values(*columns).union(
+        archived.order_by().values(*columns), all=True,
+    )
+    return combined.order_by(*ordering)
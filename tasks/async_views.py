@@ -0,0 +1,333 @@
+"""
+Native async task endpoints for ASGI deployments.
+
+Under ASGI every synchronous view, including all of DRF, runs on a worker
+thread, so the number of requests a process can hold open is bounded by
+its thread pool. ``AsyncTaskView`` serves the common task requests as
+coroutines instead:
+
+- list (page-number pagination, ``?completed=``, ``?search=``,
+  ``?ordering=``, ``If-None-Match``), retrieve, create, update, partial
+  update and delete;
+- answering list and retrieve from the response cache shared with
+  ``TaskViewSet`` (see ``tasks.response_cache``), with the same ``X-Cache``
+  header;
+- authenticated with ``CachedTokenAuthentication.aauthenticate()`` and
+  throttled like ``TaskViewSet``;
+- producing the same status codes, headers and JSON bodies as
+  ``TaskViewSet``.
+
+Anything else (browsable API, session authentication, ``If-Match``
+preconditions, cursor pagination, ``?include_archived=``, non-JSON bodies,
+OPTIONS/HEAD) is passed to the synchronous ``TaskViewSet`` view unchanged.
+
+Django 4.2's async ORM still executes each query on a thread, but a
+request only occupies one while a query runs rather than for its whole
+lifetime, so slow clients no longer tie up the pool. Enable the views with
+``TASK_ASYNC_VIEWS = True`` when serving ``todo_project.asgi``; under WSGI
+they would only add an event loop per request.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotAllowed, StreamingHttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+
+from authentication.authentication import CachedTokenAuthentication
+from todo_project.performance import timed
+from todo_project.replicas import apin_to_primary, ause_replica, release_replica
+
+from .changes import aget_task_version
+from .events import aredeem_ticket, event_stream, parse_cursor
+from .mixins import get_etag_version, make_etag
+from .models import Task
+from .pagination import AsyncPageNumberPagination, KeysetPagination
+from .renderers import FastJSONRenderer
+from .response_cache import get_response_cache
+from .search import aget_search_backend
+from .serializers import TaskCreateUpdateSerializer, TaskRowSerializer
+from .views import TaskViewSet
+
+
+JSON = 'application/json'
+
+
+class AsyncTaskView(View):
+    """
+    Async list/create (``detail=False``) or retrieve/update/delete
+    (``detail=True``) endpoint that falls back to ``sync_view``.
+    """
+    detail = False
+    sync_view = None
+    authentication = CachedTokenAuthentication()
+    renderer = FastJSONRenderer()
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # Token authentication needs no CSRF protection; session requests
+        # go to the DRF view, which enforces it.
+        view.csrf_exempt = True
+        return view
+
+    @property
+    def allowed(self):
+        if self.detail:
+            return 'GET, PUT, PATCH, DELETE, HEAD, OPTIONS'
+        return 'GET, POST, HEAD, OPTIONS'
+
+    def handles(self, request):
+        """Whether this request can be served natively."""
+        methods = {'GET', 'PUT', 'PATCH', 'DELETE'} if self.detail else {'GET', 'POST'}
+        if request.method not in methods or 'format' in request.GET:
+            return False
+        if request.headers.get('Accept', '*/*') not in ('*/*', JSON):
+            return False
+        if not request.headers.get('Authorization', '').startswith(self.authentication.keyword + ' '):
+            return False
+        if request.method == 'GET':
+            return self.detail or (
+                self.pagination_mode(request) == 'page' and 'include_archived' not in request.GET
+            )
+        if 'If-Match' in request.headers:
+            return False
+        return request.method == 'DELETE' or request.content_type == JSON
+
+    @staticmethod
+    def pagination_mode(request):
+        mode = request.GET.get(TaskViewSet.pagination_query_param)
+        if mode not in TaskViewSet.pagination_classes:
+            mode = 'cursor' if KeysetPagination.cursor_query_param in request.GET else settings.TASK_PAGINATION_MODE
+        return mode
+
+    async def dispatch(self, request, *args, **kwargs):
+        if not self.handles(request):
+            return await sync_to_async(self.sync_view)(request, *args, **kwargs)
+        try:
+            credentials = await self.authentication.aauthenticate(request)
+            if credentials is None:
+                raise exceptions.NotAuthenticated()
+            self.drf_request = Request(request)
+            self.drf_request.user, self.drf_request.auth = credentials
+            self.viewset = TaskViewSet(
+                request=self.drf_request, args=args, kwargs=kwargs, format_kwarg=None,
+                action=self.action_name(request),
+            )
+            # In memory (todo_project.throttling): fine on the event loop.
+            self.viewset.check_throttles(self.drf_request)
+        except exceptions.APIException as exc:
+            return self.error_response(exc)
+
+        # Same replica routing as ReplicaReadMixin on TaskViewSet.
+        user_id = credentials[0].pk
+        replica_token = await ause_replica(user_id) if request.method == 'GET' else None
+        try:
+            return await getattr(self, self.viewset.action)(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return self.error_response(exc)
+        finally:
+            if replica_token is not None:
+                release_replica(replica_token)
+            if request.method != 'GET':
+                await apin_to_primary(user_id)
+
+    def action_name(self, request):
+        if not self.detail:
+            return 'list' if request.method == 'GET' else 'create'
+        return {
+            'GET': 'retrieve', 'PUT': 'update', 'PATCH': 'partial_update', 'DELETE': 'destroy',
+        }[request.method]
+
+    def response(self, data, status_code=status.HTTP_200_OK):
+        if data is None:
+            response = HttpResponse(status=status_code, content_type=JSON)
+        else:
+            with timed('render'):
+                content = self.renderer.render(data)
+            response = HttpResponse(content, status=status_code, content_type=JSON)
+        response['Allow'] = self.allowed
+        patch_vary_headers(response, ['Accept'])
+        return response
+
+    def error_response(self, exc):
+        if isinstance(exc.detail, (list, dict)):
+            data = exc.detail
+        else:
+            data = {'detail': exc.detail}
+        response = self.response(data, exc.status_code)
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            response.status_code = status.HTTP_401_UNAUTHORIZED
+            response['WWW-Authenticate'] = self.authentication.authenticate_header(request=None)
+        if getattr(exc, 'wait', None):
+            response['Retry-After'] = '%d' % exc.wait
+        return response
+
+    async def etag(self, request):
+        version = await aget_task_version(self.drf_request.user.pk)
+        return make_etag(self.drf_request.user.pk, request.path, request.GET, JSON, version)
+
+    async def cached_response(self, request, etag, get_data):
+        """
+        Async counterpart of ``ConditionalTaskMixin.cached_get()``: respond
+        with the data stored for this request at the version of ``etag``, or
+        await ``get_data()`` and store its result.
+        """
+        responses = get_response_cache()
+        if responses is None:
+            return self.response(await get_data())
+        user = self.drf_request.user
+        # Same key as the sync view, so the two serve each other's entries.
+        key = responses.make_key(user, make_etag(
+            user.pk, request.build_absolute_uri(request.path), request.GET, JSON, get_etag_version(etag),
+        ).strip('"'))
+        data = await sync_to_async(responses.get)(key)
+        if data is not None:
+            response = self.response(data)
+            response['X-Cache'] = 'hit'
+            return response
+        data = await get_data()
+        await sync_to_async(responses.set)(key, data)
+        response = self.response(data)
+        response['X-Cache'] = 'miss'
+        return response
+
+    def tag(self, response, etag):
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Authorization'])
+        return response
+
+    async def filtered_queryset(self):
+        queryset = self.viewset.get_queryset()
+        if self.drf_request.query_params.get('search'):
+            # Resolve the search backend off the event loop the first time.
+            await aget_search_backend(queryset.db)
+        return self.viewset.filter_queryset(queryset)
+
+    async def get_task(self, pk):
+        queryset = await self.filtered_queryset()
+        try:
+            return await queryset.aget(pk=pk)
+        except (Task.DoesNotExist, ValueError, TypeError):
+            raise exceptions.NotFound('No Task matches the given query.')
+
+    def parse_body(self, request):
+        try:
+            return json.loads(request.body or b'null')
+        except ValueError as exc:
+            raise exceptions.ParseError(f'JSON parse error - {exc}')
+
+    async def list(self, request):
+        etag = await self.etag(request)
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return self.tag(self.response(None, status.HTTP_304_NOT_MODIFIED), etag)
+
+        return self.tag(await self.cached_response(request, etag, self.list_data), etag)
+
+    async def list_data(self):
+        queryset = await self.filtered_queryset()
+        rows = TaskRowSerializer(owner=self.drf_request.user)
+        paginator = AsyncPageNumberPagination()
+        page = await paginator.apaginate_queryset(rows.values(queryset), self.drf_request, count_queryset=queryset)
+        with timed('serialize'):
+            data = rows.many(page)
+        return paginator.get_paginated_response(data).data
+
+    async def retrieve(self, request, pk):
+        etag = await self.etag(request)
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return self.tag(self.response(None, status.HTTP_304_NOT_MODIFIED), etag)
+
+        return self.tag(await self.cached_response(request, etag, lambda: self.retrieve_data(pk)), etag)
+
+    async def retrieve_data(self, pk):
+        rows = TaskRowSerializer(owner=self.drf_request.user)
+        queryset = rows.values(await self.filtered_queryset())
+        try:
+            row = await queryset.filter(pk=pk).afirst()
+        except (ValueError, TypeError):
+            row = None
+        if row is None:
+            raise exceptions.NotFound('No Task matches the given query.')
+        with timed('serialize'):
+            return rows.to_representation(row)
+
+    async def create(self, request):
+        serializer = TaskCreateUpdateSerializer(data=self.parse_body(request))
+        serializer.is_valid(raise_exception=True)
+        task = Task(user=self.drf_request.user, **serializer.validated_data)
+        await task.asave()
+        return self.response(TaskCreateUpdateSerializer(task).data, status.HTTP_201_CREATED)
+
+    async def update(self, request, pk, partial=False):
+        task = await self.get_task(pk)
+        serializer = TaskCreateUpdateSerializer(task, data=self.parse_body(request), partial=partial)
+        serializer.is_valid(raise_exception=True)
+        for attr, value in serializer.validated_data.items():
+            setattr(task, attr, value)
+        await task.asave()
+        response = self.response(TaskCreateUpdateSerializer(task).data)
+        response['ETag'] = await self.etag(request)
+        return response
+
+    async def partial_update(self, request, pk):
+        return await self.update(request, pk, partial=True)
+
+    async def destroy(self, request, pk):
+        task = await self.get_task(pk)
+        await task.adelete()
+        response = self.response({'message': 'Task deleted successfully'})
+        response['ETag'] = await self.etag(request)
+        return response
+
+    # View.view_is_async inspects the HTTP verb handlers; every verb goes
+    # through dispatch() above.
+    get = post = put = patch = delete = dispatch
+
+
+async def task_events(request):
+    """
+    ``GET /api/tasks/events/``: the user's task changes as server-sent
+    events (see ``tasks.events``). ``EventSource`` cannot send headers, so
+    browsers authenticate with a stream ticket as ``?ticket=``; ``?since=``
+    takes a sync cursor when there is no ``Last-Event-ID`` yet.
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    authentication = CachedTokenAuthentication()
+    try:
+        if 'ticket' in request.GET:
+            user = await aredeem_ticket(request.GET['ticket'])
+            if user is None:
+                raise exceptions.AuthenticationFailed('Invalid, expired or already used stream ticket.')
+            credentials = (user, None)
+        else:
+            credentials = await authentication.aauthenticate(request)
+        if credentials is None:
+            raise exceptions.NotAuthenticated()
+    except exceptions.APIException as exc:
+        response = HttpResponse(
+            FastJSONRenderer().render({'detail': exc.detail}), status=status.HTTP_401_UNAUTHORIZED,
+            content_type=JSON,
+        )
+        response['WWW-Authenticate'] = authentication.authenticate_header(request)
+        return response
+
+    user = credentials[0]
+    cursor = await sync_to_async(parse_cursor)(user, request.headers.get('Last-Event-ID') or request.GET.get('since'))
+    if 'wsgi.version' in request.META:
+        # A WSGI worker cannot wait for changes without blocking; send what
+        # the client missed and let it reconnect after the retry delay.
+        content = b''.join([chunk async for chunk in event_stream(user, cursor, once=True)])
+        response = HttpResponse(content, content_type='text/event-stream')
+    else:
+        response = StreamingHttpResponse(event_stream(user, cursor), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Keep nginx from buffering the stream.
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,723 @@
+"""
+In-process HTTP benchmark of the task and authentication endpoints.
+
+Every scenario drives one endpoint of ``tasks.urls`` or
+``authentication.urls`` through Django's test ``Client``, so requests go
+through the full middleware, authentication, view and renderer stack and
+the queries each one runs can be counted. Concurrency comes from worker
+threads, each with its own client and database connection; every worker
+acts as one of the seeded users.
+
+``run_benchmark()`` returns one result per scenario with latency
+percentiles, throughput, query counts and the response cache hit ratio,
+ready to be dumped as JSON.
+
+``run_serving_benchmark()`` compares server models instead: it calls the
+project's WSGI application from a fixed pool of worker threads, the way a
+threaded WSGI server does, or drives the ASGI application from one event
+loop, the way uvicorn or daphne do, with many concurrent slow clients.
+
+``run_login_storm()`` measures login throughput and how much a burst of
+logins slows the task API down on either server model.
+
+``run_admin_benchmark()`` renders the task admin changelist the way a
+staff user browses it, with ``TaskAdmin`` and with a stock ``ModelAdmin``
+for comparison.
+"""
+import asyncio
+import io
+import json
+import logging
+import math
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from urllib.parse import parse_qsl, urlsplit
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.db import connection, reset_queries, transaction
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.authtoken.models import Token
+
+from .changes import record_change
+from .models import Task
+from .sharding import get_shard
+
+
+@dataclass
+class Scenario:
+    """
+    ``request(worker)`` performs the timed request; ``setup(worker)``, if
+    given, runs untimed before each one (e.g. to create the task that
+    ``request`` deletes).
+    """
+    name: str
+    request: callable
+    setup: callable = None
+
+
+SCENARIOS = {}
+
+# The benchmarks measure capacity: no throttling or load shedding.
+UNLIMITED = {
+    'THROTTLING': {'RATES': {}, 'MAX_ENTRIES': 0},
+    'LOAD_SHEDDING': {'PATHS': [], 'MAX_IN_FLIGHT': 0, 'TARGET_LATENCY_MS': 0, 'INTERVAL_MS': 1000, 'RETRY_AFTER': 1},
+}
+
+
+def scenario(name, setup=None):
+    def decorator(func):
+        SCENARIOS[name] = Scenario(name, func, setup)
+        return func
+    return decorator
+
+
+class Worker:
+    """
+    One benchmark thread: an authenticated client for one seeded user plus
+    scratch state shared between a scenario's setup and request.
+    """
+
+    def __init__(self, index, user, password):
+        self.index = index
+        self.user = user
+        self.password = password
+        self.iteration = 0
+        self.state = {}
+        # Server errors are counted as 500s instead of aborting the worker.
+        self.client = Client(raise_request_exception=False)
+        self.authenticate()
+
+    def authenticate(self):
+        token, _ = Token.objects.get_or_create(user=self.user)
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Token {token.key}'
+
+    def task_id(self):
+        """A task of this worker's user, cycling through the first 100."""
+        if 'task_ids' not in self.state:
+            self.state['task_ids'] = list(
+                Task.objects.for_user(self.user.pk).order_by('id').values_list('id', flat=True)[:100]
+            )
+        ids = self.state['task_ids']
+        return ids[self.iteration % len(ids)]
+
+    def create_tasks(self, count):
+        shard = get_shard(self.user.pk)
+        with transaction.atomic(using=shard):
+            tasks = Task.objects.using(shard).bulk_create(
+                Task(user=self.user, title=f'Bench {self.iteration} {i}') for i in range(count)
+            )
+            ids = [task.id for task in tasks]
+            record_change(self.user.pk, created=ids, total=count)
+        return ids
+
+
+# Authentication endpoints
+
+@scenario('auth-register')
+def register(worker):
+    username = f'{worker.user.username}-r{worker.iteration}-{time.monotonic_ns()}'
+    return worker.client.post('/api/auth/register/', {
+        'username': username,
+        'email': f'{username}@example.com',
+        'password': 'Bench-pass-123',
+        'password2': 'Bench-pass-123',
+    })
+
+
+@scenario('auth-login')
+def login(worker):
+    return worker.client.post('/api/auth/login/', {
+        'username': worker.user.username, 'password': worker.password,
+    })
+
+
+@scenario('auth-profile')
+def profile(worker):
+    return worker.client.get('/api/auth/profile/')
+
+
+@scenario('auth-profile-update')
+def profile_update(worker):
+    return worker.client.patch(
+        '/api/auth/profile/', {'first_name': f'Bench {worker.iteration}'}, content_type='application/json'
+    )
+
+
+def _login(worker):
+    worker.authenticate()
+
+
+@scenario('auth-logout', setup=_login)
+def logout(worker):
+    return worker.client.post('/api/auth/logout/')
+
+
+# Task endpoints
+
+@scenario('tasks-list')
+def list_tasks(worker):
+    return worker.client.get('/api/tasks/')
+
+
+@scenario('tasks-list-completed')
+def list_completed(worker):
+    return worker.client.get('/api/tasks/', {'completed': 'true'})
+
+
+@scenario('tasks-list-search')
+def list_search(worker):
+    return worker.client.get('/api/tasks/', {'search': 'invoice'})
+
+
+@scenario('tasks-list-cursor')
+def list_cursor(worker):
+    return worker.client.get('/api/tasks/', {'pagination': 'cursor', 'ordering': 'title'})
+
+
+def _fetch_etag(worker):
+    worker.state['etag'] = worker.client.get('/api/tasks/')['ETag']
+
+
+@scenario('tasks-list-not-modified', setup=_fetch_etag)
+def list_not_modified(worker):
+    return worker.client.get('/api/tasks/', HTTP_IF_NONE_MATCH=worker.state['etag'])
+
+
+@scenario('tasks-retrieve')
+def retrieve(worker):
+    return worker.client.get(f'/api/tasks/{worker.task_id()}/')
+
+
+@scenario('tasks-create')
+def create(worker):
+    return worker.client.post('/api/tasks/', {'title': f'Bench {worker.iteration}'})
+
+
+@scenario('tasks-update')
+def update(worker):
+    return worker.client.put(
+        f'/api/tasks/{worker.task_id()}/',
+        {'title': f'Bench {worker.iteration}', 'completed': worker.iteration % 2 == 0},
+        content_type='application/json',
+    )
+
+
+@scenario('tasks-partial-update')
+def partial_update(worker):
+    return worker.client.patch(
+        f'/api/tasks/{worker.task_id()}/', {'completed': worker.iteration % 2 == 0},
+        content_type='application/json',
+    )
+
+
+def _create_one(worker):
+    worker.state['delete_id'] = worker.create_tasks(1)[0]
+
+
+@scenario('tasks-delete', setup=_create_one)
+def delete(worker):
+    return worker.client.delete(f"/api/tasks/{worker.state['delete_id']}/")
+
+
+@scenario('tasks-stats')
+def stats(worker):
+    return worker.client.get('/api/tasks/stats/')
+
+
+def _sync(worker):
+    worker.state['cursor'] = worker.client.get('/api/tasks/changes/', {'limit': 1}).json()['cursor']
+
+
+@scenario('tasks-changes', setup=_sync)
+def changes(worker):
+    return worker.client.get('/api/tasks/changes/', {'since': worker.state['cursor']})
+
+
+@scenario('tasks-bulk-create')
+def bulk_create(worker):
+    return worker.client.post(
+        '/api/tasks/bulk/',
+        [{'title': f'Bench {worker.iteration} {i}'} for i in range(10)],
+        content_type='application/json',
+    )
+
+
+def _create_ten(worker):
+    worker.state['bulk_ids'] = worker.create_tasks(10)
+
+
+@scenario('tasks-bulk-update', setup=_create_ten)
+def bulk_update(worker):
+    return worker.client.patch(
+        '/api/tasks/bulk/',
+        [{'id': task_id, 'completed': True} for task_id in worker.state['bulk_ids']],
+        content_type='application/json',
+    )
+
+
+@scenario('tasks-bulk-delete', setup=_create_ten)
+def bulk_delete(worker):
+    return worker.client.delete(
+        '/api/tasks/bulk/', {'ids': worker.state['bulk_ids']}, content_type='application/json'
+    )
+
+
+@scenario('tasks-bulk-filter')
+def bulk_filter(worker):
+    return worker.client.patch(
+        '/api/tasks/bulk/filter/?search=invoice', {'completed': worker.iteration % 2 == 0},
+        content_type='application/json',
+    )
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def run_scenario(scenario, users, password, requests, concurrency):
+    """
+    Send ``requests`` requests for ``scenario`` from ``concurrency`` worker
+    threads and return the aggregated measurements.
+    """
+    timings, queries, statuses, cached = [], [], {}, []
+    lock = threading.Lock()
+    errors = []
+
+    def work(index, count):
+        try:
+            worker = Worker(index, users[index % len(users)], password)
+            local_timings, local_queries, local_statuses, local_cached = [], [], {}, []
+            for iteration in range(count):
+                worker.iteration = iteration
+                if scenario.setup:
+                    scenario.setup(worker)
+                with CaptureQueriesContext(connection) as captured:
+                    start = time.perf_counter()
+                    response = scenario.request(worker)
+                    local_timings.append((time.perf_counter() - start) * 1000)
+                local_queries.append(len(captured))
+                local_statuses[response.status_code] = local_statuses.get(response.status_code, 0) + 1
+                if response.has_header('X-Cache'):
+                    local_cached.append(response['X-Cache'] == 'hit')
+            with lock:
+                timings.extend(local_timings)
+                queries.extend(local_queries)
+                cached.extend(local_cached)
+                for code, seen in local_statuses.items():
+                    statuses[code] = statuses.get(code, 0) + seen
+        except Exception as exc:
+            with lock:
+                errors.append(f'{type(exc).__name__}: {exc}')
+        finally:
+            connection.close()
+
+    shares = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+    threads = [threading.Thread(target=work, args=(i, share)) for i, share in enumerate(shares) if share]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    timings.sort()
+    return {
+        'scenario': scenario.name,
+        'concurrency': concurrency,
+        'requests': len(timings),
+        'statuses': {str(code): count for code, count in sorted(statuses.items())},
+        'failed': sum(count for code, count in statuses.items() if code >= 400),
+        'errors': errors,
+        'throughput_rps': len(timings) / elapsed if elapsed else None,
+        'mean_ms': statistics.fmean(timings) if timings else None,
+        'p50_ms': percentile(timings, 50),
+        'p95_ms': percentile(timings, 95),
+        'p99_ms': percentile(timings, 99),
+        'max_ms': timings[-1] if timings else None,
+        'queries_mean': statistics.fmean(queries) if queries else None,
+        'queries_max': max(queries) if queries else None,
+        # Share of the responses that went through the response cache
+        # (see tasks.response_cache) served from it.
+        'cache_hit_ratio': sum(cached) / len(cached) if cached else None,
+    }
+
+
+def run_benchmark(user_ids, password, names=None, requests=100, concurrency_levels=(1,), progress=None):
+    """
+    Run the scenarios in ``names`` (all by default) at each concurrency
+    level as the users in ``user_ids`` and return the list of results.
+
+    Each worker thread keeps its own database connection, so the database
+    must be shareable between threads (not an in-memory SQLite database).
+    """
+    users = list(User.objects.filter(pk__in=user_ids).order_by('pk'))
+    results = []
+    # Failures are reported as status counts; skip their tracebacks.
+    request_logger = logging.getLogger('django.request')
+    disabled, request_logger.disabled = request_logger.disabled, True
+    try:
+        # The test client sends Host: testserver.
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], **UNLIMITED):
+            for concurrency in concurrency_levels:
+                for name in names or SCENARIOS:
+                    result = run_scenario(SCENARIOS[name], users, password, requests, concurrency)
+                    results.append(result)
+                    if progress:
+                        progress(result)
+    finally:
+        request_logger.disabled = disabled
+    return results
+
+
+# Serving comparison
+
+SERVING_REQUESTS = {
+    'list': ('GET', '/api/tasks/', None),
+    'retrieve': ('GET', '/api/tasks/{task_id}/', None),
+    'create': ('POST', '/api/tasks/', {'title': 'Serving benchmark'}),
+}
+
+
+def _call_wsgi(app, method, path, query, headers, body, client_delay):
+    # A threaded server's worker is busy while the request arrives.
+    time.sleep(client_delay)
+    environ = {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': '127.0.0.1',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': io.StringIO(),
+        'wsgi.url_scheme': 'http',
+        'wsgi.version': (1, 0),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in headers.items():
+        key = name.upper().replace('-', '_')
+        environ[key if key == 'CONTENT_TYPE' else f'HTTP_{key}'] = value
+    status = []
+    result = app(environ, lambda status_line, response_headers: status.append(int(status_line[:3])))
+    try:
+        for _ in result:
+            pass
+    finally:
+        result.close()
+    return status[0]
+
+
+async def _call_asgi(app, method, path, query, headers, body, client_delay):
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query.encode(),
+        'root_path': '',
+        'headers': [(b'host', b'localhost'), (b'content-length', str(len(body)).encode())] + [
+            (name.lower().encode(), value.encode()) for name, value in headers.items()
+        ],
+        'client': ('127.0.0.1', 0),
+        'server': ('localhost', 80),
+    }
+    status = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    # The event loop serves other connections while the request arrives.
+    await asyncio.sleep(client_delay)
+    await app(scope, receive, send)
+    return status[0]
+
+
+def run_serving_benchmark(mode, user_ids, request_name, requests=1000, concurrency=100,
+                          threads=16, client_delay=0.02):
+    """
+    Send ``requests`` requests from ``concurrency`` concurrent clients to
+    the WSGI application served by ``threads`` worker threads
+    (``mode='wsgi'``) or to the ASGI application (``mode='asgi'``). Every
+    client takes ``client_delay`` seconds to send its request.
+
+    Returns the same latency and throughput fields as ``run_scenario()``.
+    """
+    from django.core.asgi import get_asgi_application
+    from django.core.wsgi import get_wsgi_application
+
+    method, path_template, payload = SERVING_REQUESTS[request_name]
+    clients = []
+    for user_id in user_ids:
+        token, _ = Token.objects.get_or_create(user_id=user_id)
+        task_id = Task.objects.filter(user_id=user_id).values_list('id', flat=True).first()
+        headers = {'Authorization': f'Token {token.key}', 'Accept': 'application/json'}
+        body = b''
+        if payload is not None:
+            headers['Content-Type'] = 'application/json'
+            body = json.dumps(payload).encode()
+        clients.append((path_template.format(task_id=task_id), headers, body))
+    connection.close()
+
+    timings, statuses = [], {}
+    if mode == 'wsgi':
+        app, pool = get_wsgi_application(), ThreadPoolExecutor(threads)
+    else:
+        app, pool = get_asgi_application(), None
+
+    async def client(index, count):
+        loop = asyncio.get_running_loop()
+        path, headers, body = clients[index % len(clients)]
+        for _ in range(count):
+            start = time.perf_counter()
+            args = (app, method, path, '', headers, body, client_delay)
+            if pool is None:
+                status_code = await _call_asgi(*args)
+            else:
+                status_code = await loop.run_in_executor(pool, _call_wsgi, *args)
+            timings.append((time.perf_counter() - start) * 1000)
+            statuses[status_code] = statuses.get(status_code, 0) + 1
+
+    async def main():
+        shares = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+        await asyncio.gather(*(client(i, share) for i, share in enumerate(shares) if share))
+
+    request_logger = logging.getLogger('django.request')
+    disabled, request_logger.disabled = request_logger.disabled, True
+    started = time.perf_counter()
+    try:
+        with override_settings(**UNLIMITED):
+            asyncio.run(main())
+    finally:
+        elapsed = time.perf_counter() - started
+        request_logger.disabled = disabled
+        if pool is not None:
+            pool.shutdown()
+
+    timings.sort()
+    return {
+        'mode': mode,
+        'request': request_name,
+        'concurrency': concurrency,
+        'threads': threads if mode == 'wsgi' else None,
+        'client_delay_ms': client_delay * 1000,
+        'requests': len(timings),
+        'statuses': {str(code): count for code, count in sorted(statuses.items())},
+        'failed': sum(count for code, count in statuses.items() if code >= 400),
+        'throughput_rps': len(timings) / elapsed if elapsed else None,
+        'mean_ms': statistics.fmean(timings) if timings else None,
+        'p50_ms': percentile(timings, 50),
+        'p95_ms': percentile(timings, 95),
+        'p99_ms': percentile(timings, 99),
+        'max_ms': timings[-1] if timings else None,
+    }
+
+
+# Login storm
+
+def _latencies(timings):
+    timings = sorted(timings)
+    return {
+        'requests': len(timings),
+        'p50_ms': percentile(timings, 50),
+        'p95_ms': percentile(timings, 95),
+        'p99_ms': percentile(timings, 99),
+        'max_ms': timings[-1] if timings else None,
+    }
+
+
+def run_login_storm(mode, user_ids, password, logins=200, login_concurrency=50, requests=500,
+                    concurrency=4, threads=16):
+    """
+    Measure ``GET /api/tasks/`` latency from ``concurrency`` clients alone
+    (``requests`` requests), then again while ``login_concurrency`` clients
+    send ``logins`` logins, against the WSGI application on ``threads``
+    worker threads (``mode='wsgi'``) or the ASGI application.
+
+    Logins per core divides the login rate by the cores the hashing pool
+    can use: ``PASSWORD_HASHING['WORKERS']``, at most the CPU count.
+    """
+    from django.core.asgi import get_asgi_application
+    from django.core.wsgi import get_wsgi_application
+
+    users = list(User.objects.filter(pk__in=user_ids).order_by('pk'))
+    task_headers, login_bodies = [], []
+    for user in users:
+        token, _ = Token.objects.get_or_create(user=user)
+        task_headers.append({'Authorization': f'Token {token.key}', 'Accept': 'application/json'})
+        login_bodies.append(json.dumps({'username': user.username, 'password': password}).encode())
+    login_headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
+    connection.close()
+
+    if mode == 'wsgi':
+        app, pool = get_wsgi_application(), ThreadPoolExecutor(threads)
+    else:
+        app, pool = get_asgi_application(), None
+
+    async def call(method, path, headers, body):
+        args = (app, method, path, '', headers, body, 0)
+        if pool is None:
+            return await _call_asgi(*args)
+        return await asyncio.get_running_loop().run_in_executor(pool, _call_wsgi, *args)
+
+    async def task_client(index, timings, count=None, stop=None):
+        headers = task_headers[index % len(task_headers)]
+        sent = 0
+        while (count is None or sent < count) and not (stop and stop.is_set()):
+            start = time.perf_counter()
+            await call('GET', '/api/tasks/', headers, b'')
+            timings.append((time.perf_counter() - start) * 1000)
+            sent += 1
+
+    async def login_client(index, count, timings, statuses):
+        for iteration in range(count):
+            body = login_bodies[(index + iteration) % len(login_bodies)]
+            start = time.perf_counter()
+            status_code = await call('POST', '/api/auth/login/', login_headers, body)
+            timings.append((time.perf_counter() - start) * 1000)
+            statuses[status_code] = statuses.get(status_code, 0) + 1
+
+    baseline, during, login_timings, statuses = [], [], [], {}
+
+    async def storm(stop):
+        shares = [logins // login_concurrency + (i < logins % login_concurrency) for i in range(login_concurrency)]
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            login_client(i, share, login_timings, statuses) for i, share in enumerate(shares) if share
+        ))
+        stop.set()
+        return time.perf_counter() - started
+
+    async def main():
+        shares = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+        await asyncio.gather(*(task_client(i, baseline, count=share) for i, share in enumerate(shares) if share))
+        stop = asyncio.Event()
+        elapsed, *_ = await asyncio.gather(storm(stop), *(task_client(i, during, stop=stop) for i in range(concurrency)))
+        return elapsed
+
+    request_logger = logging.getLogger('django.request')
+    disabled, request_logger.disabled = request_logger.disabled, True
+    try:
+        with override_settings(**UNLIMITED):
+            elapsed = asyncio.run(main())
+    finally:
+        request_logger.disabled = disabled
+        if pool is not None:
+            pool.shutdown()
+
+    succeeded = statuses.get(200, 0)
+    cores = min(settings.PASSWORD_HASHING['WORKERS'], os.cpu_count() or 1)
+    rate = succeeded / elapsed if elapsed else None
+    return {
+        'mode': mode,
+        'hasher': settings.PASSWORD_HASHING['HASHER'],
+        'hashing_workers': settings.PASSWORD_HASHING['WORKERS'],
+        'cpu_count': os.cpu_count(),
+        'threads': threads if mode == 'wsgi' else None,
+        'login_statuses': {str(code): count for code, count in sorted(statuses.items())},
+        'logins_per_second': rate,
+        'logins_per_second_per_core': rate / cores if rate is not None else None,
+        'login': _latencies(login_timings),
+        'tasks_baseline': _latencies(baseline),
+        'tasks_during_storm': _latencies(during),
+    }
+
+
+# Admin changelist
+
+class BaselineTaskAdmin(admin.ModelAdmin):
+    """The task admin with the stock changelist, for comparison."""
+    list_display = ['title', 'user', 'completed', 'created_at', 'updated_at']
+    list_filter = ['completed', 'created_at', 'user']
+    search_fields = ['title', 'description', 'user__username']
+
+
+def _next_page(cl):
+    """Query parameters of the page after ``cl``'s, or None on the last page."""
+    keyset = getattr(cl, 'keyset', None)
+    if keyset is not None:
+        link = keyset.get_next_link()
+        return dict(parse_qsl(urlsplit(link).query)) if link else None
+    return {'p': cl.page_num + 1} if cl.page_num < cl.paginator.num_pages else None
+
+
+ADMIN_SCENARIOS = {
+    'first-page': lambda user_id, search: {},
+    # Each request asks for the page after the previous one.
+    'next-pages': None,
+    'completed': lambda user_id, search: {'completed__exact': '1'},
+    'user': lambda user_id, search: {'user__id__exact': str(user_id)},
+    'search': lambda user_id, search: {'q': search},
+}
+
+
+def run_admin_benchmark(admin_user, user_id, search, requests=20, baseline=True, progress=None):
+    """
+    Render the task changelist ``requests`` times per scenario as
+    ``admin_user`` with ``TaskAdmin`` and, with ``baseline``, with
+    ``BaselineTaskAdmin``, and return one result per admin and scenario.
+    ``user_id`` is filtered on and ``search`` searched for.
+    """
+    model_admins = {'task-admin': admin.site._registry[Task]}
+    if baseline:
+        model_admins['baseline'] = BaselineTaskAdmin(Task, admin.site)
+    factory = RequestFactory()
+    results = []
+    # RequestFactory sends Host: testserver.
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+        for admin_name, model_admin in model_admins.items():
+            for name, params in ADMIN_SCENARIOS.items():
+                timings, queries, statuses = [], [], {}
+                query = {}
+                for _ in range(requests):
+                    if params is not None:
+                        query = params(user_id, search)
+                    request = factory.get('/admin/tasks/task/', query)
+                    request.user = admin_user
+                    request._messages = CookieStorage(request)
+                    # A full query log (e.g. after seeding with DEBUG on)
+                    # would hide the new queries.
+                    reset_queries()
+                    with CaptureQueriesContext(connection) as captured:
+                        start = time.perf_counter()
+                        response = model_admin.changelist_view(request)
+                        if hasattr(response, 'render'):
+                            response.render()
+                        timings.append((time.perf_counter() - start) * 1000)
+                    queries.append(len(captured))
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                    if params is None:
+                        query = _next_page(response.context_data['cl']) or {}
+                result = {
+                    'admin': admin_name,
+                    'scenario': name,
+                    'statuses': {str(code): count for code, count in sorted(statuses.items())},
+                    **_latencies(timings),
+                    'queries_mean': statistics.fmean(queries),
+                }
+                results.append(result)
+                if progress:
+                    progress(result)
+    return results
@@ -0,0 +1,182 @@
+"""
+Change tracking for users' task sets.
+
+Every write path reports the tasks it touched through ``record_change()``:
+the ``Task`` save/delete signal handlers in ``tasks.signals`` for single
+rows, and the bulk endpoints explicitly for ``bulk_create``/``bulk_update``
+and queryset ``update()``, which send no model signals.
+
+Each change is delivered as one ``task_changes`` signal per user, inside the
+writer's transaction, so receivers can keep derived per-user state (the
+data version and the task counters on ``UserTaskState``) consistent with
+the rows. Inside ``batch_changes()`` the
+changes are merged and delivered once per user when the block exits, so a
+bulk operation costs one receiver call per user instead of one per row.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.dispatch import Signal
+
+from .models import Task, UserTaskState
+from .sharding import get_shard
+
+
+# Sent with sender=Task and change=TaskChange.
+task_changes = Signal()
+
+_batch = ContextVar('task_change_batch', default=None)
+
+
+@dataclass
+class TaskChange:
+    """
+    The tasks of one user touched by a write.
+
+    ``updated`` is ``None`` when the exact rows are unknown, e.g. after a
+    queryset ``update()`` over a filter. ``total`` and ``completed`` are the
+    changes to the user's task and completed-task counts.
+    """
+    user_id: int
+    created: list = field(default_factory=list)
+    updated: list = field(default_factory=list)
+    deleted: list = field(default_factory=list)
+    total: int = 0
+    completed: int = 0
+
+    def merge(self, other):
+        self.created.extend(other.created)
+        if self.updated is None or other.updated is None:
+            self.updated = None
+        else:
+            self.updated.extend(other.updated)
+        self.deleted.extend(other.deleted)
+        self.total += other.total
+        self.completed += other.completed
+
+
+def record_change(user_id, created=(), updated=(), deleted=(), total=0, completed=0):
+    """
+    Report that tasks of ``user_id`` were created, updated or deleted (by
+    id), and by how much that moved the user's total and completed counts.
+    """
+    change = TaskChange(
+        user_id,
+        list(created),
+        None if updated is None else list(updated),
+        list(deleted),
+        total,
+        completed,
+    )
+    batch = _batch.get()
+    if batch is None:
+        task_changes.send(sender=Task, change=change)
+    elif user_id in batch:
+        batch[user_id].merge(change)
+    else:
+        batch[user_id] = change
+
+
+@contextmanager
+def batch_changes():
+    """
+    Merge the changes recorded in the block and send them once per user on
+    exit. Nothing is sent if the block raises. Use inside the transaction
+    that performs the writes.
+    """
+    if _batch.get() is not None:
+        # The outermost batch delivers everything.
+        yield
+        return
+
+    batch = {}
+    token = _batch.set(batch)
+    try:
+        yield
+    finally:
+        _batch.reset(token)
+    for change in batch.values():
+        task_changes.send(sender=Task, change=change)
+
+
+def get_task_version(user_id, for_update=False):
+    """
+    Return the current data version of a user's tasks (0 if never written).
+
+    With ``for_update`` the state row is locked until the end of the
+    transaction, so the version cannot move under a conditional write.
+    """
+    queryset = UserTaskState.objects.for_user(user_id)
+    if for_update:
+        queryset = queryset.select_for_update()
+    return queryset.values_list('version', flat=True).first() or 0
+
+
+async def aget_task_version(user_id):
+    """Async counterpart of ``get_task_version()``."""
+    return await (
+        UserTaskState.objects.for_user(user_id)
+        .values_list('version', flat=True)
+        .afirst()
+    ) or 0
+
+
+def apply_change(change):
+    """
+    Bump the data version of ``change.user_id`` and apply its counter deltas
+    in a single UPDATE.
+
+    State rows are only created for new tasks: update and delete events
+    without a row (e.g. while the user itself is being deleted) are no-ops.
+    """
+    states = UserTaskState.objects.for_user(change.user_id)
+    values = {
+        'version': F('version') + 1,
+        'total_count': F('total_count') + change.total,
+        'completed_count': F('completed_count') + change.completed,
+    }
+    if states.update(**values) or not change.created:
+        return
+    _, created = UserTaskState.objects.using(get_shard(change.user_id)).get_or_create(
+        user_id=change.user_id,
+        defaults={'version': 1, 'total_count': change.total, 'completed_count': change.completed},
+    )
+    if not created:
+        states.update(**values)
+
+
+def get_task_stats(user_id):
+    """
+    Return the user's task counters from their state row (one primary-key
+    lookup, never a COUNT over the tasks).
+    """
+    row = (
+        UserTaskState.objects.for_user(user_id)
+        .values_list('total_count', 'completed_count')
+        .first()
+    ) or (0, 0)
+    total, completed = row
+    return {'total': total, 'active': total - completed, 'completed': completed}
+
+
+def rebuild_task_stats(user_id):
+    """
+    Recount a user's tasks and store the result in their state row.
+
+    The state row is locked while counting so concurrent writes queue
+    behind the repair instead of being lost. Returns the new counters.
+    """
+    shard = get_shard(user_id)
+    with transaction.atomic(using=shard):
+        state, _ = UserTaskState.objects.using(shard).select_for_update().get_or_create(user_id=user_id)
+        counts = Task.objects.for_user(user_id).aggregate(
+            total=Count('id'),
+            completed=Count('id', filter=Q(completed=True)),
+        )
+        state.total_count = counts['total']
+        state.completed_count = counts['completed']
+        state.save(update_fields=['total_count', 'completed_count'])
+    return get_task_stats(user_id)
@@ -0,0 +1,296 @@
+"""
+Server-sent events of task changes.
+
+``GET /api/tasks/events/`` keeps a ``text/event-stream`` response open and
+pushes an event whenever one of the user's tasks changes:
+
+    event: upsert           (a task was created or updated)
+    data: {"id": 7, "title": ..., ...}   (the TaskSerializer representation)
+
+    event: delete
+    data: {"id": 7}
+
+    event: reset            (the stream cannot resume; reload everything)
+    data: {}
+
+    event: cursor           (the position reached, also sent as the event id)
+    data: {}
+
+The stream is built on delta sync (``tasks.sync``): every event id is a
+sync cursor, so a reconnecting ``EventSource`` sends it back as
+``Last-Event-ID`` and receives exactly what it missed, even across
+processes and restarts. A created and an updated task are both an
+``upsert``, as in ``/api/tasks/changes/``; clients apply them by id.
+
+Writes do not push rows to streams. On commit they ``publish()`` the user
+id to a broker, which wakes that user's streams so they read their next
+delta. ``TASK_EVENTS['BROKER']`` selects the broker:
+
+- ``'local'``: in-process fan-out; streams only wake immediately for
+  writes made by the same process;
+- ``'cache'``: a per-user counter in the ``CACHE_ALIAS`` cache, polled
+  every ``POLL_INTERVAL`` seconds, for several processes sharing a cache
+  such as Redis or memcached;
+- or the dotted path of a ``Broker`` subclass.
+
+Whatever the broker, an idle stream checks the user's data version every
+``KEEPALIVE`` seconds (one primary-key lookup) and sends a keep-alive
+comment, so no change is lost for longer than that.
+
+Browsers cannot send an ``Authorization`` header with ``EventSource``, and a
+token in the URL ends up in access logs. They open the stream with
+``?ticket=`` instead: ``POST /api/tasks/events/ticket/`` issues a signed
+ticket for the user that is valid for ``TICKET_MAX_AGE`` seconds and for one
+stream only (see ``issue_ticket()``). A browser therefore reconnects itself
+with a new ticket, passing the id of the last ``cursor`` event as
+``?since=``.
+
+The endpoint needs ASGI (``todo_project.asgi``) to hold connections open.
+Under WSGI each request sends what the client missed and ends, and the
+browser reconnects after ``RETRY_MS``, which amounts to polling.
+"""
+import asyncio
+import secrets
+import threading
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from rest_framework.exceptions import ValidationError
+
+from .renderers import FastJSONRenderer
+from .serializers import TaskSerializer
+from .sync import ResyncRequired, SyncCursor, current_cursor, get_changes
+
+
+class Broker:
+    """Wakes up the event streams of a user when their tasks change."""
+
+    def publish(self, user_id):
+        """Signal that ``user_id``'s tasks changed. Called from sync code."""
+        raise NotImplementedError
+
+    @asynccontextmanager
+    async def subscribe(self, user_id):
+        """
+        Yield a ``Subscription`` for ``user_id``. Changes published after
+        entering are never missed, even while the stream is not waiting.
+        """
+        raise NotImplementedError
+        yield
+
+
+class Subscription:
+    def __init__(self):
+        self.event = asyncio.Event()
+        self.loop = asyncio.get_running_loop()
+
+    def notify(self):
+        self.loop.call_soon_threadsafe(self.event.set)
+
+    async def wait(self, timeout):
+        """Wait until notified (True) or for ``timeout`` seconds (False)."""
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self.event.clear()
+        return True
+
+
+class LocalBroker(Broker):
+    """In-process fan-out to the subscriptions of each user."""
+
+    def __init__(self):
+        self.subscriptions = defaultdict(set)
+        self.lock = threading.Lock()
+
+    def publish(self, user_id):
+        with self.lock:
+            subscriptions = list(self.subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            subscription.notify()
+
+    @asynccontextmanager
+    async def subscribe(self, user_id):
+        subscription = Subscription()
+        with self.lock:
+            self.subscriptions[user_id].add(subscription)
+        try:
+            yield subscription
+        finally:
+            with self.lock:
+                self.subscriptions[user_id].discard(subscription)
+                if not self.subscriptions[user_id]:
+                    del self.subscriptions[user_id]
+
+
+class CacheBroker(Broker):
+    """
+    Cross-process broker: ``publish()`` increments a per-user counter in a
+    shared cache and each subscription polls it.
+    """
+
+    def __init__(self, alias, poll_interval):
+        self.cache = caches[alias]
+        self.poll_interval = poll_interval
+
+    def key(self, user_id):
+        return f'task-events:{user_id}'
+
+    def publish(self, user_id):
+        key = self.key(user_id)
+        if not self.cache.add(key, 1, timeout=None):
+            try:
+                self.cache.incr(key)
+            except ValueError:  # expired or evicted in between
+                self.cache.set(key, 1, timeout=None)
+
+    @asynccontextmanager
+    async def subscribe(self, user_id):
+        subscription = Subscription()
+        key = self.key(user_id)
+        seen = await self.cache.aget(key)
+
+        async def poll():
+            nonlocal seen
+            while True:
+                await asyncio.sleep(self.poll_interval)
+                value = await self.cache.aget(key)
+                if value != seen:
+                    seen = value
+                    subscription.event.set()
+
+        poller = asyncio.create_task(poll())
+        try:
+            yield subscription
+        finally:
+            poller.cancel()
+
+
+_broker = None
+
+
+def get_broker():
+    """Return the process-wide broker configured by ``TASK_EVENTS``."""
+    global _broker
+    if _broker is None:
+        options = settings.TASK_EVENTS
+        if options['BROKER'] == 'local':
+            _broker = LocalBroker()
+        elif options['BROKER'] == 'cache':
+            _broker = CacheBroker(options['CACHE_ALIAS'], options['POLL_INTERVAL'])
+        else:
+            _broker = import_string(options['BROKER'])()
+    return _broker
+
+
+@receiver(setting_changed)
+def reset_broker(setting, **kwargs):
+    global _broker
+    if setting == 'TASK_EVENTS':
+        _broker = None
+
+
+def format_event(event=None, data=None, event_id=None):
+    """Encode one server-sent event; ``data`` is JSON-encoded."""
+    lines = []
+    if event is not None:
+        lines.append(b'event: ' + event.encode())
+    if data is not None:
+        lines.append(b'data: ' + FastJSONRenderer().render(data))
+    if event_id is not None:
+        lines.append(b'id: ' + event_id.encode())
+    return b'\n'.join(lines) + b'\n\n'
+
+
+TICKET_SALT = 'tasks.events.ticket'
+
+
+def issue_ticket(user):
+    """Return a ticket that opens one event stream for ``user``."""
+    return signing.dumps({'user': user.pk, 'nonce': secrets.token_urlsafe(16)}, salt=TICKET_SALT)
+
+
+async def aredeem_ticket(ticket):
+    """
+    Return the active user ``ticket`` was issued to, or None if it is
+    invalid, older than ``TICKET_MAX_AGE`` or already used. Single use
+    holds across processes when ``CACHE_ALIAS`` is a shared cache.
+    """
+    options = settings.TASK_EVENTS
+    try:
+        payload = signing.loads(ticket, salt=TICKET_SALT, max_age=options['TICKET_MAX_AGE'])
+    except signing.BadSignature:
+        return None
+    # The first redemption claims the nonce until the ticket expires anyway.
+    used = f"task-events-ticket:{payload['nonce']}"
+    if not await caches[options['CACHE_ALIAS']].aadd(used, True, options['TICKET_MAX_AGE']):
+        return None
+    return await User.objects.filter(pk=payload['user'], is_active=True).afirst()
+
+
+def parse_cursor(user, last_event_id):
+    """
+    Return the cursor to resume from for ``Last-Event-ID`` (or ``?since=``),
+    a caught-up cursor if there is none, or None if it is invalid.
+    """
+    if not last_event_id:
+        return current_cursor(user)
+    try:
+        return SyncCursor.decode(last_event_id)
+    except ValidationError:
+        return None
+
+
+def read_events(user, cursor):
+    """
+    Return the encoded events for the changes after ``cursor`` and the
+    cursor that follows them. Raises ``ResyncRequired`` like
+    ``get_changes()``.
+    """
+    events = []
+    while True:
+        tasks, deleted, cursor, has_more = get_changes(user, cursor)
+        events += [format_event('upsert', task) for task in TaskSerializer(tasks, many=True).data]
+        events += [format_event('delete', {'id': task_id}) for task_id in deleted]
+        if not has_more:
+            return events, cursor
+
+
+async def event_stream(user, cursor, once=False):
+    """
+    Yield the encoded events for ``user`` after ``cursor``, then wait for
+    changes and yield those, until the client goes away (or straight away
+    with ``once``).
+    """
+    options = settings.TASK_EVENTS
+    yield f"retry: {options['RETRY_MS']}\n\n".encode()
+    if cursor is None:
+        yield format_event('reset', {})
+        return
+
+    async with get_broker().subscribe(user.pk) as subscription:
+        sent = None
+        while True:
+            try:
+                events, cursor = await sync_to_async(read_events)(user, cursor)
+            except ResyncRequired:
+                yield format_event('reset', {})
+                return
+            if events or cursor != sent:
+                # The id moves the client's lastEventId; the event makes it
+                # visible to clients that reconnect themselves.
+                yield b''.join(events) + format_event('cursor', {}, cursor.encode())
+                sent = cursor
+            if once:
+                return
+            if not await subscription.wait(options['KEEPALIVE']):
+                yield b': keep-alive\n\n'
@@ -0,0 +1,60 @@
+"""
+Task exports written to a file by the job queue (see tasks.jobs).
+
+``POST /api/tasks/export/background/`` stores a ``tasks.export`` job
+holding the request's query string. The worker reads the same queryset as
+the streaming ``GET /api/tasks/export/`` with those filters and ordering,
+renders it to ``default_storage`` (``MEDIA_ROOT``) and records the file in
+the job's result. The owner downloads it from
+``GET /api/jobs/<id>/download/``.
+"""
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.http import HttpRequest, QueryDict
+from rest_framework.request import Request
+
+from .jobs import job_handler
+from .renderers import CSVRenderer, NDJSONRenderer
+
+
+EXPORT_RENDERERS = {renderer.format: renderer for renderer in (NDJSONRenderer, CSVRenderer)}
+
+
+def get_view(user, query, action):
+    """A ``TaskViewSet`` for ``user`` seeing the query string ``query``."""
+    # tasks.views imports this module to enqueue the jobs.
+    from .views import TaskViewSet
+
+    http_request = HttpRequest()
+    http_request.method = 'GET'
+    http_request.GET = QueryDict(query)
+    request = Request(http_request)
+    request.user = user
+    return TaskViewSet(request=request, args=(), kwargs={}, format_kwarg=None, action=action)
+
+
+@job_handler('tasks.export', priority=10)
+def export_tasks_job(job, format='ndjson', query=''):
+    view = get_view(User.objects.get(pk=job.user_id), query, 'export')
+    rows = view.get_row_serializer()
+    queryset = rows.values(view.filter_queryset(view.get_queryset()))
+    chunk_size = settings.TASK_EXPORT_CHUNK_SIZE
+    renderer = EXPORT_RENDERERS[format]()
+    count = 0
+
+    def representations():
+        nonlocal count
+        for row in queryset.iterator(chunk_size=chunk_size):
+            count += 1
+            yield rows.to_representation(row)
+
+    with tempfile.TemporaryFile() as output:
+        for chunk in renderer.render_rows(representations(), fields=list(rows.columns), chunk_size=chunk_size):
+            output.write(chunk)
+        output.seek(0)
+        name = default_storage.save(f'exports/{job.user_id}/tasks-{job.pk}.{renderer.format}', File(output))
+    return {'file': name, 'format': renderer.format, 'rows': count}
@@ -0,0 +1,38 @@
+from rest_framework import filters
+
+from .search import SEARCH_RANK, get_search_backend
+
+
+class TaskSearchFilter(filters.SearchFilter):
+    """
+    ``?search=`` backed by the full-text index from ``tasks.search``.
+
+    Every whitespace-separated term must match the start of a word in the
+    title or description, and results are annotated with a relevance rank.
+    When no index is installed for the database this behaves exactly like
+    ``SearchFilter``.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+
+        backend = get_search_backend(queryset.db)
+        if backend is None:
+            return super().filter_queryset(request, queryset, view)
+        return backend.search(queryset, terms)
+
+
+class TaskOrderingFilter(filters.OrderingFilter):
+    """
+    ``OrderingFilter`` that sorts search results by relevance by default.
+
+    An explicit ``?ordering=`` always wins; relevance ties are broken by the
+    view's default ordering.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        if not request.query_params.get(self.ordering_param) and SEARCH_RANK in queryset.query.annotations:
+            return ['-' + SEARCH_RANK] + list(self.get_default_ordering(view) or [])
+        return super().get_ordering(request, queryset, view)
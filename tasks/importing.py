@@ -0,0 +1,226 @@
+"""
+Bulk import of tasks from NDJSON or CSV.
+
+``import_tasks()`` consumes rows one at a time from any iterable, so the
+input (an upload being read from the request, or a file) is never held in
+memory: each row is checked with the ``TaskCreateUpdateSerializer`` rules,
+valid rows are inserted in ``bulk_create`` batches of ``batch_size`` and
+only the first ``max_errors`` row errors are kept for the report.
+
+Two commit modes:
+
+- ``atomic=True``: one transaction for the whole import; if any row is
+  invalid nothing is committed (the remaining rows are still checked so
+  the report lists every error, up to ``max_errors``);
+- ``atomic=False``: one transaction per batch; invalid rows are skipped
+  and every valid row is kept, even if the import stops half way.
+
+A CSV file that cannot be read any further (bad encoding, broken quoting)
+stops the import: the report gives the line as ``stopped_at``, and with
+``atomic=False`` only the rows before it are kept.
+
+``POST /api/tasks/import/?background=true`` saves the upload to
+``default_storage`` and runs it as a ``tasks.import`` job instead (see
+tasks.jobs); the report becomes the job's result.
+"""
+import codecs
+import csv
+import json
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.db import transaction
+from rest_framework import serializers
+
+from .changes import record_change
+from .jobs import job_handler
+from .models import Task
+from .search import get_search_backend
+from .serializers import TaskCreateUpdateSerializer
+from .sharding import get_shard
+
+
+FORMATS = {
+    'ndjson': ('application/x-ndjson', 'application/jsonl', 'application/json-lines'),
+    'csv': ('text/csv',),
+}
+
+
+@dataclass
+class ImportResult:
+    rows: int = 0
+    created: int = 0
+    invalid: int = 0
+    batches: int = 0
+    committed: bool = True
+    stopped_at: int = None
+    errors: list = field(default_factory=list)
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'invalid': self.invalid,
+            'batches': self.batches,
+            'committed': self.committed,
+            'stopped_at': self.stopped_at,
+            'errors': self.errors,
+        }
+
+
+class RowError(Exception):
+    """A row that could not be parsed; reported like a validation error."""
+
+
+class ReadError(RowError):
+    """The input could not be read past this line; the import stops."""
+
+
+def format_for_content_type(content_type):
+    """Return ``'ndjson'``/``'csv'`` for a request Content-Type, or None."""
+    media_type = content_type.split(';')[0].strip().lower()
+    for name, media_types in FORMATS.items():
+        if media_type in media_types:
+            return name
+    return None
+
+
+def read_ndjson(lines):
+    """
+    Yield ``(line number, row)`` for every non-blank line of ``lines``
+    (bytes or str). Undecodable lines yield a ``RowError`` as the row.
+    """
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            row = RowError(f'Invalid JSON: {exc}')
+        else:
+            if not isinstance(row, dict):
+                row = RowError('Expected a JSON object.')
+        yield number, row
+
+
+def read_csv(lines):
+    """
+    Yield ``(line number, row)`` for every record of CSV ``lines`` (bytes),
+    keyed by the header row. Empty cells count as missing, so the model
+    defaults apply. If the input cannot be read any further, the last row
+    is a ``ReadError`` at the offending line.
+    """
+    # reader.line_num lags behind when the line fails to decode.
+    read = 0
+
+    def counted():
+        nonlocal read
+        for line in lines:
+            read += 1
+            yield line
+
+    reader = csv.DictReader(codecs.iterdecode(counted(), 'utf-8-sig'))
+    try:
+        for row in reader:
+            yield reader.line_num, {key: value for key, value in row.items() if key and value != ''}
+    except (csv.Error, UnicodeDecodeError) as exc:
+        yield read, ReadError(f'Invalid CSV: {exc}. The rest of the file was not read.')
+
+
+def read_rows(lines, data_format):
+    return read_ndjson(lines) if data_format == 'ndjson' else read_csv(lines)
+
+
+def import_tasks(user, rows, batch_size=1000, atomic=True, max_errors=100, progress=None):
+    """
+    Create tasks for ``user`` from ``(line number, row)`` pairs, as yielded
+    by ``read_rows()``, and return an ``ImportResult``. ``progress`` is
+    called with the result after every batch.
+    """
+    result = ImportResult()
+    shard = get_shard(user.pk)
+    # One serializer checks every row; creating one per row costs more than
+    # the validation itself.
+    validator = TaskCreateUpdateSerializer()
+    batch = []
+
+    def error(number, detail):
+        result.invalid += 1
+        if len(result.errors) < max_errors:
+            result.errors.append({'line': number, 'errors': detail})
+
+    def flush():
+        # Once an atomic import has an invalid row nothing will be
+        # committed, so stop writing and only keep checking.
+        if not (atomic and result.invalid):
+            with transaction.atomic(using=shard):
+                created = Task.objects.using(shard).bulk_create(batch, batch_size=len(batch))
+                record_change(
+                    user.pk,
+                    created=[task.pk for task in created],
+                    total=len(created),
+                    completed=sum(task.completed for task in created),
+                )
+            result.created += len(batch)
+            result.batches += 1
+        batch.clear()
+        if progress:
+            progress(result)
+
+    try:
+        with transaction.atomic(using=shard) if atomic else nullcontext():
+            for number, row in rows:
+                result.rows += 1
+                if isinstance(row, RowError):
+                    error(number, {'non_field_errors': [str(row)]})
+                    if isinstance(row, ReadError):
+                        result.stopped_at = number
+                        break
+                    continue
+                try:
+                    data = validator.run_validation(row)
+                except serializers.ValidationError as exc:
+                    error(number, exc.detail)
+                    continue
+                batch.append(Task(user=user, **data))
+                if len(batch) >= batch_size:
+                    flush()
+            if batch:
+                flush()
+            if atomic and result.invalid:
+                raise _Rollback()
+    except _Rollback:
+        result.created = result.batches = 0
+        result.committed = False
+
+    if result.batches >= 10:
+        # Many separate inserts leave the full-text index fragmented.
+        backend = get_search_backend(Task.objects.using(shard).db)
+        if backend is not None:
+            backend.optimize()
+    return result
+
+
+class _Rollback(Exception):
+    pass
+
+
+# Not retried: a batch-mode import that failed half way has committed rows.
+@job_handler('tasks.import', priority=10, max_attempts=1)
+def import_tasks_job(job, file, format, commit='end'):
+    user = User.objects.get(pk=job.user_id)
+    try:
+        with default_storage.open(file, 'rb') as lines:
+            result = import_tasks(
+                user,
+                read_rows(lines, format),
+                batch_size=settings.TASK_IMPORT_BATCH_SIZE,
+                atomic=commit == 'end',
+                max_errors=settings.TASK_IMPORT_MAX_ERRORS,
+            )
+    finally:
+        default_storage.delete(file)
+    return result.as_dict()
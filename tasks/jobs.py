@@ -0,0 +1,255 @@
+"""
+A background job queue kept in the database.
+
+Work too long for a request (exports, imports, archive runs, account
+purges) is stored as a ``Job`` row and run by ``manage.py run_worker``, so
+no broker is needed:
+
+- handlers are registered by name with ``@job_handler(name)``, with the
+  default priority and attempts of their jobs, and called as
+  ``handler(job, **job.args)``; what they return is stored as the job's
+  ``result``;
+- ``enqueue()`` inserts a job in the caller's transaction, so workers only
+  see it once that commits;
+- ``claim()`` takes the ready job with the highest ``priority`` (oldest
+  first). Where the database supports it the row is locked with
+  ``SELECT ... FOR UPDATE SKIP LOCKED``, so workers never wait on each
+  other; everywhere the claim is a conditional ``UPDATE`` that only one
+  worker can win;
+- a failed attempt is retried after ``BACKOFF_SECONDS * 2 ** (attempt - 1)``
+  until ``max_attempts``;
+- workers refresh the ``heartbeat_at`` of the jobs they run every
+  ``HEARTBEAT_INTERVAL`` seconds. A running job with no heartbeat for
+  ``LOCK_TIMEOUT`` seconds lost its worker: it is claimed again if it has
+  attempts left, and marked failed otherwise.
+
+Clients poll ``GET /api/jobs/<id>/`` for the status of the jobs they
+started (see ``JobViewSet``).
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, OperationalError, close_old_connections, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Job
+
+
+logger = logging.getLogger('tasks.jobs')
+
+_handlers = {}
+
+
+def job_handler(name, priority=0, max_attempts=None):
+    """
+    Register the decorated function as the handler of jobs called ``name``.
+    Handlers of jobs that are not safe to run twice set ``max_attempts=1``.
+    """
+    def register(func):
+        func.priority = priority
+        func.max_attempts = max_attempts
+        _handlers[name] = func
+        return func
+    return register
+
+
+def get_handler(name):
+    return _handlers.get(name)
+
+
+def enqueue(name, args=None, user_id=None, priority=None, run_at=None):
+    """Store a job for ``name``'s handler and return it."""
+    handler = get_handler(name)
+    if handler is None:
+        raise ValueError(f'No job handler is registered as {name!r}.')
+    return Job.objects.create(
+        name=name,
+        args=args or {},
+        user_id=user_id,
+        priority=handler.priority if priority is None else priority,
+        max_attempts=handler.max_attempts or settings.JOB_QUEUE['MAX_ATTEMPTS'],
+        run_at=run_at or timezone.now(),
+    )
+
+
+def claim(worker, now=None):
+    """
+    Mark the next ready job as running for ``worker`` and return it, or
+    None when nothing is ready.
+    """
+    now = now or timezone.now()
+    stale = now - timedelta(seconds=settings.JOB_QUEUE['LOCK_TIMEOUT'])
+    lost = Q(status=Job.RUNNING, heartbeat_at__lt=stale)
+    ready = Q(status=Job.QUEUED, run_at__lte=now) | lost
+    skip_locked = connections[DEFAULT_DB_ALIAS].features.has_select_for_update_skip_locked
+    while True:
+        with transaction.atomic():
+            candidates = Job.objects.filter(ready).order_by('-priority', 'run_at', 'id')
+            if skip_locked:
+                candidates = candidates.select_for_update(skip_locked=True)
+            job = candidates.first()
+            if job is None:
+                return None
+            # Only one worker can move the job on from the state it read.
+            current = Job.objects.filter(pk=job.pk, status=job.status, attempts=job.attempts)
+            if job.status == Job.RUNNING and job.attempts >= job.max_attempts:
+                # A lost job that is not safe to run again (or out of
+                # attempts) fails rather than being started a second time.
+                current.update(
+                    status=Job.FAILED, error='The worker running the job stopped responding.', finished_at=now,
+                )
+                continue
+            claimed = current.update(
+                status=Job.RUNNING, attempts=job.attempts + 1, worker=worker, started_at=now, heartbeat_at=now,
+            )
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def run_job(job):
+    """Run a claimed job and record its result, or schedule a retry."""
+    handler = get_handler(job.name)
+    try:
+        if handler is None:
+            raise LookupError(f'No job handler is registered as {job.name!r}.')
+        result = handler(job, **job.args)
+    except Exception as exc:
+        logger.exception('Job %s (%s) failed on attempt %d', job.pk, job.name, job.attempts)
+        fail_job(job, exc, retry=handler is not None)
+        return False
+    finish(job, status=Job.SUCCEEDED, result=result, error='', finished_at=timezone.now())
+    return True
+
+
+def fail_job(job, exc, retry=True):
+    now = timezone.now()
+    error = f'{type(exc).__name__}: {exc}'
+    if retry and job.attempts < job.max_attempts:
+        delay = settings.JOB_QUEUE['BACKOFF_SECONDS'] * 2 ** (job.attempts - 1)
+        finish(job, status=Job.QUEUED, error=error, run_at=now + timedelta(seconds=delay))
+    else:
+        finish(job, status=Job.FAILED, error=error, finished_at=now)
+
+
+def finish(job, **fields):
+    """
+    Store the outcome of an attempt, retrying a few times while the database
+    is busy: a job whose outcome is lost would be taken for lost and run
+    again, or failed.
+    """
+    for delay in (0.05, 0.25, 1, None):
+        try:
+            return Job.objects.filter(pk=job.pk).update(**fields)
+        except OperationalError:
+            if delay is None:
+                raise
+            time.sleep(delay)
+
+
+def beat(jobs, now=None):
+    """Record that ``jobs`` are still running on the workers that claimed them."""
+    running = Q()
+    for job in jobs:
+        running |= Q(pk=job.pk, attempts=job.attempts)
+    Job.objects.filter(running, status=Job.RUNNING).update(heartbeat_at=now or timezone.now())
+
+
+class Worker:
+    """
+    ``concurrency`` threads claiming and running jobs until ``stop()``, or
+    with ``burst`` until no job is ready.
+    """
+
+    def __init__(self, concurrency=1, poll_interval=1.0, burst=False, name=None):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.burst = burst
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}'
+        self.stopped = threading.Event()
+        self.finished = threading.Event()
+        self.processed = 0
+        self.running = {}
+        self._lock = threading.Lock()
+
+    def run(self):
+        threads = [
+            threading.Thread(target=self.loop, args=(f'{self.name}:{index}',), name=f'job-worker-{index}')
+            for index in range(self.concurrency)
+        ]
+        heartbeat = threading.Thread(target=self.heartbeat, name='job-heartbeat', daemon=True)
+        heartbeat.start()
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=0.5)
+        except KeyboardInterrupt:
+            # Let the running jobs finish; queued ones stay queued.
+            self.stop()
+            for thread in threads:
+                thread.join()
+        finally:
+            self.finished.set()
+            heartbeat.join()
+        return self.processed
+
+    def stop(self):
+        self.stopped.set()
+
+    def heartbeat(self):
+        """
+        Refresh the heartbeat of the jobs this worker is running every
+        ``HEARTBEAT_INTERVAL`` seconds, so a job running longer than
+        ``LOCK_TIMEOUT`` is not taken for lost.
+        """
+        interval = settings.JOB_QUEUE['HEARTBEAT_INTERVAL']
+        try:
+            while not self.finished.wait(interval):
+                with self._lock:
+                    jobs = list(self.running.values())
+                if not jobs:
+                    continue
+                try:
+                    beat(jobs)
+                except DatabaseError:
+                    logger.warning('Worker %s could not record a heartbeat', self.name, exc_info=True)
+        finally:
+            connections.close_all()
+
+    def loop(self, name):
+        try:
+            while not self.stopped.is_set():
+                close_old_connections()
+                try:
+                    job = claim(name)
+                except DatabaseError:
+                    # E.g. SQLite busy past its timeout: try again later.
+                    logger.warning('Worker %s could not claim a job', name, exc_info=True)
+                    self.stopped.wait(self.poll_interval)
+                    continue
+                if job is None:
+                    if self.burst:
+                        break
+                    self.stopped.wait(self.poll_interval)
+                    continue
+                with self._lock:
+                    self.running[name] = job
+                try:
+                    run_job(job)
+                except DatabaseError:
+                    # The outcome could not be stored; with no more
+                    # heartbeats the job is taken for lost after LOCK_TIMEOUT.
+                    logger.exception('Worker %s could not record job %s', name, job.pk)
+                with self._lock:
+                    del self.running[name]
+                    self.processed += 1
+        finally:
+            connections.close_all()
@@ -0,0 +1,54 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tasks.archiving import archive_tasks
+from tasks.jobs import enqueue
+
+
+class Command(BaseCommand):
+    help = (
+        "Move completed tasks last updated more than --days ago to the "
+        "archive, --batch-size tasks per transaction. Safe to stop and run "
+        "again at any time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.TASK_ARCHIVE['AFTER_DAYS'],
+            help="Archive tasks untouched for this many days (default: TASK_ARCHIVE['AFTER_DAYS']).",
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.TASK_ARCHIVE['BATCH_SIZE'],
+            help="Tasks moved per transaction (default: TASK_ARCHIVE['BATCH_SIZE']).",
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0,
+            help='Seconds to sleep between batches, to leave room for live writes.',
+        )
+        parser.add_argument(
+            '--background', action='store_true',
+            help='Queue the run for run_worker instead of archiving now.',
+        )
+
+    def handle(self, *args, **options):
+        if options['background']:
+            job = enqueue('tasks.archive', {
+                'days': options['days'], 'batch_size': options['batch_size'], 'pause': options['pause'],
+            })
+            self.stdout.write(self.style.SUCCESS(f'Queued job {job.pk}.'))
+            return
+        before = timezone.now() - timedelta(days=options['days'])
+
+        def progress(alias, moved):
+            if options['verbosity'] >= 2:
+                self.stderr.write(f'  {alias}: {moved} task(s) archived')
+
+        moved = archive_tasks(
+            before, batch_size=options['batch_size'], pause=options['pause'], progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {moved} task(s) completed before {before.isoformat()}.'
+        ))
@@ -0,0 +1,87 @@
+import json
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+
+from tasks.models import Task
+from tasks.renderers import FastJSONRenderer
+from tasks.serializers import TaskRowSerializer, TaskSerializer
+
+
+def serializer_path(queryset):
+    """The previous list path: model instances, TaskSerializer, JSONRenderer."""
+    return JSONRenderer().render(TaskSerializer(queryset, many=True).data)
+
+
+def row_path(queryset):
+    """The current list path: values() rows, TaskRowSerializer, FastJSONRenderer."""
+    rows = TaskRowSerializer()
+    return FastJSONRenderer().render(rows.many(rows.values(queryset)))
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the TaskSerializer and values()-row read paths: query count "
+        "and time to fetch, serialize and render N tasks. Benchmark data is "
+        "created in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000])
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per size and path.')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON.')
+
+    def handle(self, *args, **options):
+        results = []
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user(username='__bench_serializers__')
+                Task.objects.bulk_create(
+                    Task(user=user, title=f'Task {i}', description='x' * 40, completed=i % 3 == 0)
+                    for i in range(max(options['sizes']))
+                )
+                for size in options['sizes']:
+                    queryset = Task.objects.filter(user=user).order_by('-created_at', '-id')[:size]
+                    results.extend(self.measure(size, queryset, options['repeat']))
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"{'rows':>6}  {'path':<10} {'queries':>7} {'median ms':>10} {'p95 ms':>8}")
+        for result in results:
+            self.stdout.write(
+                f"{result['rows']:>6}  {result['path']:<10} {result['queries']:>7} "
+                f"{result['median_ms']:>10.3f} {result['p95_ms']:>8.3f}"
+            )
+
+    def measure(self, size, queryset, repeat):
+        for name, path in [('serializer', serializer_path), ('rows', row_path)]:
+            connection.queries_log.clear()
+            with CaptureQueriesContext(connection) as queries:
+                # Use .all() so each run re-executes the query.
+                path(queryset.all())
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                path(queryset.all())
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            yield {
+                'rows': size,
+                'path': name,
+                'queries': len(queries),
+                'median_ms': statistics.median(timings),
+                'p95_ms': timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+            }
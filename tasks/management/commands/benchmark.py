@@ -0,0 +1,98 @@
+import json
+import platform
+import sys
+from datetime import datetime, timezone
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from tasks.benchmark import SCENARIOS, run_benchmark
+from tasks.seeding import delete_seeded_users, seed_tasks
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark every task and authentication endpoint at several dataset "
+        "sizes and concurrency levels and write p50/p95/p99 latency, "
+        "throughput and query counts as JSON. Users named --prefix... are "
+        "seeded for each size and deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[100, 1000, 10000],
+            help='Tasks per benchmark user, one run per size.',
+        )
+        parser.add_argument('--users', type=int, default=4, help='Benchmark users per size.')
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4], help='Worker threads.')
+        parser.add_argument('--requests', type=int, default=100, help='Requests per scenario and level.')
+        parser.add_argument(
+            '--scenario', action='append', dest='scenarios', choices=sorted(SCENARIOS),
+            help='Only run this scenario (can be repeated).',
+        )
+        parser.add_argument('--prefix', default='bench', help='Username prefix of the benchmark users.')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded data of the last size.')
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            raise CommandError('Worker threads cannot share an in-memory SQLite database.')
+
+        prefix, password = options['prefix'], 'bench-pass-123'
+        # Every concurrent worker needs its own user so logout does not
+        # revoke another worker's token.
+        users = max(options['users'], max(options['concurrency']))
+        report = {
+            'started_at': datetime.now(timezone.utc).isoformat(),
+            'environment': {
+                'python': sys.version.split()[0],
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'platform': platform.platform(),
+            },
+            'parameters': {
+                'sizes': options['sizes'],
+                'users': users,
+                'concurrency': options['concurrency'],
+                'requests': options['requests'],
+            },
+            'results': [],
+        }
+
+        delete_seeded_users(prefix)
+        try:
+            for size in options['sizes']:
+                user_ids, _, seconds = seed_tasks(users, size, prefix=prefix, password=password)
+                self.stderr.write(f'Seeded {users} user(s) x {size} task(s) in {seconds:.1f}s')
+
+                def progress(result):
+                    self.stderr.write(
+                        f"  {result['scenario']:<26} c={result['concurrency']:<3} "
+                        f"p50={result['p50_ms']:.1f}ms p99={result['p99_ms']:.1f}ms "
+                        f"{result['throughput_rps']:.0f} req/s {result['queries_mean']:.1f} queries"
+                        if result['requests'] else f"  {result['scenario']}: {result['errors']}"
+                    )
+
+                for result in run_benchmark(
+                    user_ids, password,
+                    names=options['scenarios'],
+                    requests=options['requests'],
+                    concurrency_levels=options['concurrency'],
+                    progress=progress,
+                ):
+                    report['results'].append({'size': size, **result})
+
+                if not (options['keep'] and size == options['sizes'][-1]):
+                    delete_seeded_users(prefix)
+        except BaseException:
+            delete_seeded_users(prefix)
+            raise
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+            self.stderr.write(self.style.SUCCESS(f"Wrote {len(report['results'])} result(s) to {options['output']}"))
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,61 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from tasks.benchmark import run_admin_benchmark
+from tasks.seeding import delete_seeded_users, seed_tasks
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed --tasks tasks and time the task admin changelist (first page, "
+        "following pages, completed filter, user filter and search) with the "
+        "TaskAdmin and a stock ModelAdmin, as JSON with p50/p95/p99 latency "
+        "and query counts. Users named --prefix... are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=100000, help='Tasks to seed, e.g. 10000000.')
+        parser.add_argument('--users', type=int, default=1000, help='Users the tasks are spread over.')
+        parser.add_argument('--requests', type=int, default=20, help='Requests per scenario and admin.')
+        parser.add_argument('--search', default='plants', help='Term of the search scenario.')
+        parser.add_argument('--no-baseline', action='store_true', help='Skip the stock ModelAdmin.')
+        parser.add_argument('--prefix', default='adminbench', help='Username prefix of the benchmark users.')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded data.')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        delete_seeded_users(prefix)
+        try:
+            user_ids, created, seconds = seed_tasks(
+                options['users'], options['tasks'] // options['users'], prefix=prefix,
+                defer_search_index=True,
+                progress=lambda count: self.stderr.write(f'  {count} task(s)', ending='\r'),
+            )
+            self.stderr.write(f'Seeded {created} task(s) for {len(user_ids)} user(s) in {seconds:.1f}s')
+            admin_user = User.objects.create_superuser(username=f'{prefix}-admin', password=None)
+
+            def progress(result):
+                self.stderr.write(
+                    f"  {result['admin']:<10} {result['scenario']:<11} "
+                    f"p50={result['p50_ms']:.1f}ms p99={result['p99_ms']:.1f}ms "
+                    f"{result['queries_mean']:.1f} queries {result['statuses']}"
+                )
+
+            results = run_admin_benchmark(
+                admin_user, user_ids[0], options['search'],
+                requests=options['requests'], baseline=not options['no_baseline'], progress=progress,
+            )
+        finally:
+            if not options['keep']:
+                delete_seeded_users(prefix)
+
+        output = json.dumps({'tasks': options['tasks'], 'results': results}, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+            self.stderr.write(self.style.SUCCESS(f"Wrote {len(results)} result(s) to {options['output']}"))
+        else:
+            self.stdout.write(output)
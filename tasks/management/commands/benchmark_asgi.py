@@ -0,0 +1,104 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from tasks.benchmark import SERVING_REQUESTS, run_serving_benchmark
+from tasks.seeding import delete_seeded_users, seed_tasks
+
+
+# Server model -> TASK_ASYNC_VIEWS. 'asgi-drf' serves the synchronous DRF
+# views through the ASGI handler, as todo_project.asgi does without the
+# async views.
+MODES = {'wsgi': False, 'asgi-drf': False, 'asgi': True}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare throughput and latency of the WSGI application on a thread "
+        "pool with the ASGI application (with and without the native async "
+        "task views) under many concurrent slow clients. Each mode runs in "
+        "its own process; the report is written as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', action='append', dest='modes', choices=list(MODES))
+        parser.add_argument(
+            '--request', action='append', dest='requests_names', choices=list(SERVING_REQUESTS),
+            help='Request to send (can be repeated; default: all).',
+        )
+        parser.add_argument('--tasks', type=int, default=1000, help='Tasks per benchmark user.')
+        parser.add_argument('--users', type=int, default=10, help='Benchmark users.')
+        parser.add_argument('--concurrency', type=int, default=200, help='Concurrent clients.')
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per mode and request.')
+        parser.add_argument('--threads', type=int, default=16, help='WSGI worker threads.')
+        parser.add_argument(
+            '--client-delay-ms', type=float, default=20,
+            help='Time each client takes to send its request.',
+        )
+        parser.add_argument('--prefix', default='asgibench', help='Username prefix of the benchmark users.')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+        # Internal: run one mode in this process and print its results.
+        parser.add_argument('--run-mode', choices=list(MODES), help='==SUPPRESS==')
+        parser.add_argument('--user-ids', type=int, nargs='+', help='==SUPPRESS==')
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            raise CommandError('The benchmark processes cannot share an in-memory SQLite database.')
+        names = options['requests_names'] or list(SERVING_REQUESTS)
+        if options['run_mode']:
+            for name in names:
+                result = run_serving_benchmark(
+                    options['run_mode'], options['user_ids'], name,
+                    requests=options['requests'],
+                    concurrency=options['concurrency'],
+                    threads=options['threads'],
+                    client_delay=options['client_delay_ms'] / 1000,
+                )
+                self.stdout.write(json.dumps(result))
+            return
+
+        prefix = options['prefix']
+        delete_seeded_users(prefix)
+        results = []
+        try:
+            user_ids, _, seconds = seed_tasks(options['users'], options['tasks'], prefix=prefix)
+            self.stderr.write(f"Seeded {len(user_ids)} user(s) x {options['tasks']} task(s) in {seconds:.1f}s")
+            for mode in options['modes'] or list(MODES):
+                for result in self.run_mode(mode, user_ids, names, options):
+                    self.stderr.write(
+                        f"  {mode:<9} {result['request']:<9} p50={result['p50_ms']:.1f}ms "
+                        f"p99={result['p99_ms']:.1f}ms {result['throughput_rps']:.0f} req/s "
+                        f"{result['failed']} failed"
+                    )
+                    results.append(result)
+        finally:
+            delete_seeded_users(prefix)
+
+        output = json.dumps({'results': results}, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+            self.stderr.write(self.style.SUCCESS(f"Wrote {len(results)} result(s) to {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+    def run_mode(self, mode, user_ids, names, options):
+        command = [
+            sys.executable, sys.argv[0], 'benchmark_asgi', '--run-mode', mode,
+            '--user-ids', *map(str, user_ids),
+            '--concurrency', str(options['concurrency']),
+            '--requests', str(options['requests']),
+            '--threads', str(options['threads']),
+            '--client-delay-ms', str(options['client_delay_ms']),
+        ]
+        for name in names:
+            command += ['--request', name]
+        env = {**os.environ, 'TASK_ASYNC_VIEWS': str(MODES[mode])}
+        process = subprocess.run(command, env=env, capture_output=True, text=True)
+        if process.returncode:
+            raise CommandError(f'{mode} run failed:\n{process.stderr}')
+        return [json.loads(line) for line in process.stdout.splitlines() if line.startswith('{')]
@@ -0,0 +1,97 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from tasks.benchmark import run_login_storm
+from tasks.seeding import delete_seeded_users, seed_tasks
+
+
+# Server model -> AUTH_ASYNC_VIEWS (and TASK_ASYNC_VIEWS).
+MODES = {'wsgi': False, 'asgi-drf': False, 'asgi': True}
+
+
+class Command(BaseCommand):
+    help = (
+        "Send a burst of logins while measuring task list latency, for the "
+        "WSGI application on a thread pool and the ASGI application with and "
+        "without the native async views. Reports logins per second (and per "
+        "core of the password hashing pool) and task latency before and "
+        "during the storm, as JSON. Each mode runs in its own process."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', action='append', dest='modes', choices=list(MODES))
+        parser.add_argument('--logins', type=int, default=200, help='Logins per mode.')
+        parser.add_argument('--login-concurrency', type=int, default=50, help='Concurrent login clients.')
+        parser.add_argument('--requests', type=int, default=500, help='Task list requests of the baseline.')
+        parser.add_argument('--concurrency', type=int, default=4, help='Concurrent task list clients.')
+        parser.add_argument('--threads', type=int, default=16, help='WSGI worker threads.')
+        parser.add_argument('--users', type=int, default=10, help='Benchmark users.')
+        parser.add_argument('--tasks', type=int, default=100, help='Tasks per benchmark user.')
+        parser.add_argument('--prefix', default='loginbench', help='Username prefix of the benchmark users.')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+        # Internal: run one mode in this process and print its result.
+        parser.add_argument('--run-mode', choices=list(MODES), help='==SUPPRESS==')
+        parser.add_argument('--user-ids', type=int, nargs='+', help='==SUPPRESS==')
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            raise CommandError('The benchmark processes cannot share an in-memory SQLite database.')
+        password = 'loginbench-pass-123'
+        if options['run_mode']:
+            result = run_login_storm(
+                options['run_mode'], options['user_ids'], password,
+                logins=options['logins'],
+                login_concurrency=options['login_concurrency'],
+                requests=options['requests'],
+                concurrency=options['concurrency'],
+                threads=options['threads'],
+            )
+            self.stdout.write(json.dumps(result))
+            return
+
+        prefix = options['prefix']
+        delete_seeded_users(prefix)
+        results = []
+        try:
+            user_ids, _, seconds = seed_tasks(options['users'], options['tasks'], prefix=prefix, password=password)
+            self.stderr.write(f"Seeded {len(user_ids)} user(s) x {options['tasks']} task(s) in {seconds:.1f}s")
+            for mode in options['modes'] or list(MODES):
+                result = self.run_mode(mode, user_ids, options)
+                self.stderr.write(
+                    f"  {mode:<9} {result['logins_per_second']:.1f} logins/s "
+                    f"({result['logins_per_second_per_core']:.1f}/core) "
+                    f"tasks p99 {result['tasks_baseline']['p99_ms']:.1f}ms -> "
+                    f"{result['tasks_during_storm']['p99_ms']:.1f}ms during the storm"
+                )
+                results.append(result)
+        finally:
+            delete_seeded_users(prefix)
+
+        output = json.dumps({'results': results}, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+            self.stderr.write(self.style.SUCCESS(f"Wrote {len(results)} result(s) to {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+    def run_mode(self, mode, user_ids, options):
+        command = [
+            sys.executable, sys.argv[0], 'benchmark_login_storm', '--run-mode', mode,
+            '--user-ids', *map(str, user_ids),
+            '--logins', str(options['logins']),
+            '--login-concurrency', str(options['login_concurrency']),
+            '--requests', str(options['requests']),
+            '--concurrency', str(options['concurrency']),
+            '--threads', str(options['threads']),
+        ]
+        env = {**os.environ, 'AUTH_ASYNC_VIEWS': str(MODES[mode]), 'TASK_ASYNC_VIEWS': str(MODES[mode])}
+        process = subprocess.run(command, env=env, capture_output=True, text=True)
+        if process.returncode:
+            raise CommandError(f'{mode} run failed:\n{process.stderr}')
+        return next(json.loads(line) for line in process.stdout.splitlines() if line.startswith('{'))
@@ -0,0 +1,127 @@
+from itertools import product
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, models, transaction
+from django.utils import timezone
+
+from tasks.models import Task
+from tasks.pagination import KeysetPagination
+from tasks.views import TaskViewSet
+
+
+# Plan fragments that mean the database read more rows than the query needs
+# or sorted them after the fact.
+SCAN_MARKERS = {
+    'sqlite': ['SCAN ', 'USE TEMP B-TREE'],
+    'postgresql': ['Seq Scan', 'Sort  ('],
+    'mysql': ['\tALL\t', 'Using filesort'],
+}
+
+
+def iter_query_shapes():
+    """
+    Yield (label, filters, ordering, keyset) for every query TaskViewSet.list
+    can issue, with both page-number and keyset (cursor) pagination.
+
+    Shapes are derived from the viewset's own ``filterset_fields``,
+    ``ordering_fields`` and default ``ordering`` so new fields are checked
+    as soon as they are exposed.
+    """
+    orderings = [tuple(TaskViewSet.ordering)]
+    for field in TaskViewSet.ordering_fields:
+        orderings.extend([(field,), ('-' + field,)])
+
+    filter_choices = [[None, True, False] for _ in TaskViewSet.filterset_fields]
+    shapes = product(product(*filter_choices), orderings, [False, True])
+    for values, ordering, keyset in shapes:
+        filters = {
+            name: value
+            for name, value in zip(TaskViewSet.filterset_fields, values)
+            if value is not None
+        }
+        label = ' '.join(
+            [f'{name}={value}' for name, value in filters.items()]
+            + ['ordering=' + ','.join(ordering)]
+            + (['pagination=cursor'] if keyset else [])
+        )
+        yield label, filters, list(ordering), keyset
+
+
+def keyset_queryset(queryset, ordering):
+    """Apply the ordering and seek predicate KeysetPagination uses past page 1."""
+    paginator = KeysetPagination()
+    paginator.model = queryset.model
+    keys = paginator.get_keys(ordering)
+    position = []
+    for key in keys:
+        field = paginator._get_field(key)
+        if isinstance(field, models.DateTimeField):
+            position.append(timezone.now())
+        else:
+            position.append(field.to_python('0'))
+    return paginator.filter_after(queryset.order_by(*keys), keys, position)
+
+
+def find_plan_problems(plan, vendor):
+    """Return the lines of an EXPLAIN plan that indicate a scan or a sort."""
+    markers = SCAN_MARKERS[vendor]
+    return [line for line in plan.splitlines() if any(marker in line for marker in markers)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Run EXPLAIN for every task list query shape and fail if any of them "
+        "falls back to a table scan or an explicit sort."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', default='default',
+            help='Database alias to check (default: "default").',
+        )
+        parser.add_argument(
+            '--user-id', type=int, default=1,
+            help='User id to bind in the queries; the user does not need to exist.',
+        )
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        connection = connections[alias]
+        vendor = connection.vendor
+        if vendor not in SCAN_MARKERS:
+            raise CommandError(f'Query plan checks are not supported on {vendor}.')
+
+        failures = []
+        with transaction.atomic(using=alias):
+            if vendor == 'postgresql':
+                # Small or freshly created tables make a sequential scan look
+                # cheapest; disable it so the plan reflects a large table.
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+
+            for label, filters, ordering, keyset in iter_query_shapes():
+                queryset = (
+                    Task.objects.using(alias)
+                    .filter(user_id=options['user_id'], **filters)
+                    .order_by(*ordering)
+                )
+                if keyset:
+                    queryset = keyset_queryset(queryset, ordering)
+                plan = queryset.explain()
+                problems = find_plan_problems(plan, vendor)
+                if problems:
+                    failures.append(label)
+                    self.stdout.write(self.style.ERROR(f'SCAN  {label}'))
+                    for line in problems:
+                        self.stdout.write(f'      {line.strip()}')
+                else:
+                    self.stdout.write(self.style.SUCCESS(f'OK    {label}'))
+                if options['verbosity'] > 1:
+                    self.stdout.write(plan)
+
+        if failures:
+            raise CommandError(
+                f'{len(failures)} task query shape(s) are not covered by an index: '
+                + '; '.join(failures)
+            )
+        self.stdout.write(self.style.SUCCESS('All task query shapes use an index.'))
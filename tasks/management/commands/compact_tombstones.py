@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tasks.sync import compact_tombstones
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete tombstones of tasks deleted more than --days ago. Sync "
+        "cursors older than that get a 410 and must resync from scratch."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.TASK_TOMBSTONE_RETENTION_DAYS,
+            help='Keep tombstones this many days (default: TASK_TOMBSTONE_RETENTION_DAYS).',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=10000,
+            help='Tombstones deleted per statement.',
+        )
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options['days'])
+        deleted = compact_tombstones(before, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} tombstone(s) older than {before.isoformat()}.'
+        ))
@@ -0,0 +1,73 @@
+import json
+import sys
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.importing import FORMATS, import_tasks, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Import tasks for a user from an NDJSON or CSV file ('-' for stdin), "
+        "streaming the file and inserting in bulk_create batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or '-' for stdin.")
+        parser.add_argument('--user', required=True, help='Username that will own the tasks.')
+        parser.add_argument(
+            '--format', dest='data_format', choices=list(FORMATS),
+            help='Input format (default: from the file extension, ndjson for stdin).',
+        )
+        parser.add_argument('--batch-size', type=int, default=settings.TASK_IMPORT_BATCH_SIZE)
+        parser.add_argument(
+            '--commit', choices=['end', 'batch'], default='end',
+            help="'end': one transaction, nothing is imported if any row is invalid; "
+                 "'batch': commit every batch and skip invalid rows.",
+        )
+        parser.add_argument('--max-errors', type=int, default=settings.TASK_IMPORT_MAX_ERRORS,
+                            help='Most row errors to print.')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist.")
+        path = options['path']
+        data_format = options['data_format'] or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+
+        def progress(result):
+            self.stderr.write(f'{result.rows} rows read, {result.created} created, {result.invalid} invalid')
+
+        try:
+            opened = nullcontext(sys.stdin.buffer) if path == '-' else open(path, 'rb')
+        except OSError as exc:
+            raise CommandError(str(exc))
+        with opened as stream:
+            result = import_tasks(
+                user,
+                read_rows(stream, data_format),
+                batch_size=options['batch_size'],
+                atomic=options['commit'] == 'end',
+                max_errors=options['max_errors'],
+                progress=progress if options['verbosity'] > 1 else None,
+            )
+
+        for error in result.errors:
+            self.stderr.write(f"line {error['line']}: {json.dumps(error['errors'])}")
+        if result.invalid > len(result.errors):
+            self.stderr.write(f'... and {result.invalid - len(result.errors)} more invalid row(s)')
+        if not result.committed:
+            raise CommandError(f'{result.invalid} invalid row(s); nothing was imported.')
+        if result.stopped_at:
+            raise CommandError(
+                f'Reading stopped at line {result.stopped_at}; '
+                f'only the {result.created} task(s) before it were imported.'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.created} task(s) for {user.username} from {result.rows} row(s) '
+            f'in {result.batches} batch(es); {result.invalid} invalid row(s) skipped.'
+        ))
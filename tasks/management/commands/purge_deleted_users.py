@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from tasks.purging import purge_deleted_users
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the data of users whose account deletion was requested, "
+        "--batch-size rows per transaction, then the users themselves. Safe "
+        "to stop and run again at any time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.ACCOUNT_DELETION_BATCH_SIZE,
+            help='Rows deleted per transaction (default: ACCOUNT_DELETION_BATCH_SIZE).',
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0,
+            help='Seconds to sleep between batches, to leave room for live writes.',
+        )
+
+    def handle(self, *args, **options):
+        def progress(deletion):
+            if options['verbosity'] >= 2:
+                self.stderr.write(f'  {deletion.username}: {deletion.tasks_deleted} task(s) deleted')
+
+        purged = purge_deleted_users(
+            batch_size=options['batch_size'], pause=options['pause'], progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(f'Deleted {purged} user(s).'))
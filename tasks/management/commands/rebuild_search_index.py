@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from tasks.search import BACKENDS, install_search_index
+
+
+class Command(BaseCommand):
+    help = (
+        "(Re)create the task full-text search index and repopulate it from "
+        "the tasks table. Run this after restoring data or after a schema "
+        "change that rebuilt the tasks table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', default='default',
+            help='Database alias to rebuild (default: "default").',
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        backend_class = BACKENDS.get(connection.vendor)
+        if backend_class is None:
+            raise CommandError(f'No task search backend exists for {connection.vendor}.')
+
+        install_search_index(connection)
+        backend = backend_class(connection)
+        if not backend.is_installed():
+            raise CommandError('The search index could not be installed on this database.')
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the {backend_class.__name__} search index.'))
@@ -0,0 +1,35 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from tasks.changes import get_task_stats, rebuild_task_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount every user's tasks and repair the denormalized counters "
+        "served by /api/tasks/stats/."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help='Only rebuild this user id (can be repeated).',
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids']
+        if not user_ids:
+            user_ids = list(User.objects.order_by('pk').values_list('pk', flat=True))
+
+        repaired = checked = 0
+        for user_id in user_ids:
+            before = get_task_stats(user_id)
+            after = rebuild_task_stats(user_id)
+            checked += 1
+            if before != after:
+                repaired += 1
+                self.stdout.write(f'User {user_id}: {before} -> {after}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {checked} user(s), repaired {repaired}.'
+        ))
@@ -0,0 +1,48 @@
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.resharding import misplaced_users, reshard
+from tasks.sharding import task_databases
+
+
+class Command(BaseCommand):
+    help = (
+        "Move every user's tasks, tombstones and task state onto the shard "
+        "TASK_SHARDS assigns them, e.g. after adding a shard or when turning "
+        "sharding on. Task ids are kept."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source', action='append', dest='sources', metavar='ALIAS',
+            help='Only move rows off this database (can be repeated; default: every shard). '
+                 'Use it to drain a database that is no longer a shard.',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Tasks inserted per statement.')
+        parser.add_argument('--dry-run', action='store_true', help='Only report the users that would move.')
+
+    def handle(self, *args, **options):
+        sources = options['sources']
+        unknown = set(sources or ()) - set(settings.DATABASES)
+        if unknown:
+            raise CommandError(f"Unknown database alias(es): {', '.join(sorted(unknown))}.")
+        self.stderr.write(f"Shards: {', '.join(task_databases())}")
+
+        if options['dry_run']:
+            moves = Counter((source, target) for _, source, target in misplaced_users(sources))
+            for (source, target), users in sorted(moves.items()):
+                self.stdout.write(f'{source} -> {target}: {users} user(s)')
+            self.stdout.write(f'{sum(moves.values())} user(s) would move.')
+            return
+
+        def progress(user_id, source, target, tasks):
+            self.stderr.write(f'user {user_id}: {tasks} task(s) {source} -> {target}')
+
+        users, tasks = reshard(
+            sources,
+            batch_size=options['batch_size'],
+            progress=progress if options['verbosity'] > 1 else None,
+        )
+        self.stdout.write(self.style.SUCCESS(f'Moved {tasks} task(s) of {users} user(s).'))
@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from tasks.jobs import Worker
+
+
+class Command(BaseCommand):
+    help = (
+        "Run background jobs from the database queue (exports, imports, "
+        "archive runs, account purges) until interrupted. Start as many "
+        "workers as needed: they never run the same job twice at once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=settings.JOB_QUEUE['CONCURRENCY'],
+            help="Jobs run at once, one thread each (default: JOB_QUEUE['CONCURRENCY']).",
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=settings.JOB_QUEUE['POLL_INTERVAL'],
+            help="Seconds between polls of an empty queue (default: JOB_QUEUE['POLL_INTERVAL']).",
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Exit once no job is ready instead of waiting for more.',
+        )
+
+    def handle(self, *args, **options):
+        worker = Worker(
+            concurrency=options['concurrency'],
+            poll_interval=options['poll_interval'],
+            burst=options['burst'],
+        )
+        self.stderr.write(f'Worker {worker.name} running {worker.concurrency} job(s) at a time')
+        processed = worker.run()
+        self.stdout.write(self.style.SUCCESS(f'Ran {processed} job(s).'))
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+
+from tasks.seeding import delete_seeded_users, seed_tasks
+
+
+class Command(BaseCommand):
+    help = (
+        "Load synthetic users and tasks with bulk_create, e.g. "
+        "'seed_tasks --users 100 --tasks 10000' for a million tasks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help='Users to create.')
+        parser.add_argument('--tasks', type=int, default=1000, help='Tasks per user.')
+        parser.add_argument('--prefix', default='seed', help='Username prefix of the seeded users.')
+        parser.add_argument('--password', default='seed-pass-123', help='Password of every seeded user.')
+        parser.add_argument('--completed-ratio', type=float, default=0.3)
+        parser.add_argument('--batch-size', type=int, default=5000, help='Tasks inserted per transaction.')
+        parser.add_argument('--random-seed', type=int, default=0, help='Seed for reproducible titles.')
+        parser.add_argument(
+            '--defer-search-index', action='store_true',
+            help='Drop the full-text index while loading and rebuild it at the end.',
+        )
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Delete the users seeded earlier with the prefix (and their tasks) first.',
+        )
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            deleted = delete_seeded_users(options['prefix'])
+            self.stdout.write(f"Deleted {deleted} task(s) of existing '{options['prefix']}' users.")
+
+        verbose = options['verbosity'] > 1
+        user_ids, total, seconds = seed_tasks(
+            options['users'],
+            options['tasks'],
+            prefix=options['prefix'],
+            password=options['password'],
+            completed_ratio=options['completed_ratio'],
+            batch_size=options['batch_size'],
+            random_seed=options['random_seed'],
+            defer_search_index=options['defer_search_index'],
+            progress=(lambda count: self.stdout.write(f'{count} tasks')) if verbose else None,
+        )
+        rate = total / seconds * 60 if seconds else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(user_ids)} user(s) and {total} task(s) in {seconds:.1f}s '
+            f'({rate:,.0f} tasks/min).'
+        ))
@@ -0,0 +1,132 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections, transaction
+
+from tasks.benchmark import percentile
+from tasks.changes import get_task_version
+from tasks.models import Task
+from tasks.seeding import delete_seeded_users, delete_users, seed_tasks
+from tasks.sharding import get_shard
+
+
+class Command(BaseCommand):
+    help = (
+        "Stress the database with concurrent writer threads, each running "
+        "short read-then-write transactions like the API's, and report "
+        "'database is locked' failures, latency and throughput. --compare "
+        "runs the development and production DATABASE_PROFILEs side by side."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent writer threads.')
+        parser.add_argument('--transactions', type=int, default=200, help='Transactions per worker.')
+        parser.add_argument('--prefix', default='stress', help='Username prefix of the stress users.')
+        parser.add_argument(
+            '--compare', action='store_true',
+            help='Run once per DATABASE_PROFILE, each in its own process.',
+        )
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Delete the users seeded earlier with the prefix (and their tasks) first.',
+        )
+        parser.add_argument('--keep', action='store_true', help="Keep this run's users and tasks.")
+
+    def handle(self, *args, **options):
+        if options['compare']:
+            results = [self.run_profile(profile, options) for profile in ('development', 'production')]
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            raise CommandError('Worker threads cannot share an in-memory SQLite database.')
+
+        if options['clear']:
+            delete_seeded_users(options['prefix'])
+        user_ids, _, _ = seed_tasks(options['workers'], 0, prefix=options['prefix'])
+        try:
+            result = stress(user_ids, options['transactions'])
+        finally:
+            if not options['keep']:
+                delete_users(User.objects.filter(pk__in=user_ids))
+        result['profile'] = settings.DATABASE_PROFILE
+        self.stdout.write(json.dumps(result, indent=2))
+
+    def run_profile(self, profile, options):
+        command = [
+            sys.executable, sys.argv[0], 'stress_db',
+            '--workers', str(options['workers']),
+            '--transactions', str(options['transactions']),
+            '--prefix', options['prefix'],
+        ]
+        command += [f'--{flag}' for flag in ('clear', 'keep') if options[flag]]
+        env = {**os.environ, 'DATABASE_PROFILE': profile}
+        process = subprocess.run(command, env=env, capture_output=True, text=True)
+        if process.returncode:
+            raise CommandError(f'{profile} run failed:\n{process.stderr}')
+        result = json.loads(process.stdout)
+        self.stderr.write(
+            f"{profile:<12} {result['committed']} committed, {result['locked']} locked, "
+            f"p99={result['p99_ms']:.1f}ms, {result['throughput_tps']:.0f} tx/s"
+        )
+        return result
+
+
+def stress(user_ids, transactions):
+    """
+    Run ``transactions`` transactions from one thread per user in
+    ``user_ids``; each reads the user's version, creates a task and updates
+    it, so it both reads and writes.
+    """
+    timings, errors = [], []
+    lock = threading.Lock()
+
+    def work(user_id):
+        local_timings, local_errors = [], []
+        try:
+            for i in range(transactions):
+                start = time.perf_counter()
+                try:
+                    with transaction.atomic(using=get_shard(user_id)):
+                        get_task_version(user_id)
+                        task = Task.objects.create(user_id=user_id, title=f'Stress {i}')
+                        task.completed = True
+                        task.save(update_fields=['completed', 'updated_at'])
+                except OperationalError as exc:
+                    local_errors.append(str(exc))
+                else:
+                    local_timings.append((time.perf_counter() - start) * 1000)
+        finally:
+            connections.close_all()
+            with lock:
+                timings.extend(local_timings)
+                errors.extend(local_errors)
+
+    threads = [threading.Thread(target=work, args=(user_id,)) for user_id in user_ids]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    timings.sort()
+    return {
+        'workers': len(user_ids),
+        'transactions': len(user_ids) * transactions,
+        'committed': len(timings),
+        'locked': sum('locked' in error for error in errors),
+        'errors': sorted(set(errors)),
+        'throughput_tps': len(timings) / elapsed if elapsed else None,
+        'mean_ms': statistics.fmean(timings) if timings else None,
+        'p50_ms': percentile(timings, 50),
+        'p99_ms': percentile(timings, 99),
+        'max_ms': timings[-1] if timings else None,
+    }
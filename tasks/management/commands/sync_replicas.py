@@ -0,0 +1,39 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database into every DATABASE_REPLICAS file, "
+        "standing in for replication when trying the read replicas locally. "
+        "With --interval, keep copying so the replicas lag by up to that long."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help='Copy again every INTERVAL seconds until interrupted.')
+
+    def handle(self, *args, **options):
+        aliases = settings.READ_REPLICAS['ALIASES']
+        if not aliases:
+            raise CommandError('No replicas configured; set DATABASE_REPLICAS.')
+        source = connections[DEFAULT_DB_ALIAS]
+        if source.vendor != 'sqlite' or any(connections[alias].vendor != 'sqlite' for alias in aliases):
+            raise CommandError('sync_replicas only copies SQLite databases.')
+
+        while True:
+            start = time.perf_counter()
+            source.ensure_connection()
+            for alias in aliases:
+                target = connections[alias]
+                target.ensure_connection()
+                source.connection.backup(target.connection)
+            self.stderr.write(
+                f'Copied {source.settings_dict["NAME"]} to {len(aliases)} replica(s) '
+                f'in {(time.perf_counter() - start) * 1000:.0f}ms'
+            )
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
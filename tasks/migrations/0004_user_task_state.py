@@ -0,0 +1,47 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_states(apps, schema_editor):
+    """Give every user who already owns tasks a state row."""
+    Task = apps.get_model("tasks", "Task")
+    UserTaskState = apps.get_model("tasks", "UserTaskState")
+    user_ids = Task.objects.values_list("user_id", flat=True).distinct()
+    UserTaskState.objects.bulk_create(
+        [UserTaskState(user_id=user_id, version=1) for user_id in user_ids],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("tasks", "0003_task_search_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserTaskState",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="task_state",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("version", models.BigIntegerField(default=0)),
+            ],
+            options={
+                "verbose_name": "User task state",
+                "verbose_name_plural": "User task states",
+            },
+        ),
+        migrations.RunPython(create_states, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations, models
+
+
+def rebuild_counters(apps, schema_editor):
+    Task = apps.get_model("tasks", "Task")
+    UserTaskState = apps.get_model("tasks", "UserTaskState")
+    counts = Task.objects.values("user_id").annotate(
+        total=models.Count("id"),
+        completed=models.Count("id", filter=models.Q(completed=True)),
+    )
+    for row in counts.order_by():
+        UserTaskState.objects.filter(user_id=row["user_id"]).update(
+            total_count=row["total"], completed_count=row["completed"]
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tasks", "0004_user_task_state"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="usertaskstate",
+            name="total_count",
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="usertaskstate",
+            name="completed_count",
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(rebuild_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tasks", "0005_user_task_counters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="usertaskstate",
+            name="tombstone_horizon",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name="TaskTombstone",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("user_id", models.BigIntegerField()),
+                ("task_id", models.BigIntegerField()),
+                (
+                    "deleted_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+            ],
+            options={
+                "verbose_name": "Task tombstone",
+                "verbose_name_plural": "Task tombstones",
+                "indexes": [
+                    models.Index(
+                        fields=["user_id", "deleted_at", "id"],
+                        name="tombstone_user_deleted_idx",
+                    ),
+                    models.Index(
+                        fields=["deleted_at"], name="tombstone_deleted_idx"
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,66 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def install_search_index(apps, schema_editor):
+    from tasks.search import install_search_index
+
+    install_search_index(schema_editor.connection)
+
+
+def uninstall_search_index(apps, schema_editor):
+    from tasks.search import uninstall_search_index
+
+    uninstall_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("tasks", "0006_task_tombstones"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IdSequence",
+            fields=[
+                (
+                    "name",
+                    models.CharField(max_length=100, primary_key=True, serialize=False),
+                ),
+                ("next_id", models.BigIntegerField()),
+            ],
+            options={
+                "verbose_name": "ID sequence",
+                "verbose_name_plural": "ID sequences",
+            },
+        ),
+        # SQLite rebuilds tasks_task to drop the constraint, and the search
+        # index triggers go with the old table.
+        migrations.RunPython(uninstall_search_index, install_search_index),
+        migrations.AlterField(
+            model_name="task",
+            name="user",
+            field=models.ForeignKey(
+                db_constraint=False,
+                help_text="User who owns this task",
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="tasks",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="usertaskstate",
+            name="user",
+            field=models.OneToOneField(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                primary_key=True,
+                related_name="task_state",
+                serialize=False,
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
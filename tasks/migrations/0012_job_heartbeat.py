@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+def copy_started_at(apps, schema_editor):
+    Job = apps.get_model("tasks", "Job")
+    Job.objects.filter(status="running").update(heartbeat_at=models.F("started_at"))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tasks", "0011_task_admin_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="job",
+            name="heartbeat_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(copy_started_at, migrations.RunPython.noop),
+    ]
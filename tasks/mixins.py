@@ -0,0 +1,190 @@
+import hashlib
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
+
+from todo_project.performance import timed
+
+from .changes import get_task_version
+from .response_cache import get_response_cache
+from .sharding import get_shard
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = 'The tasks have changed since they were fetched.'
+    default_code = 'precondition_failed'
+
+
+def make_etag(user_id, path, query_params, media_type, version):
+    """
+    Return the ETag of one representation of a user's tasks at ``version``.
+    """
+    params = sorted(
+        (key, value)
+        for key, values in query_params.lists()
+        for value in values
+    )
+    representation = f'{user_id}|{path}|{params}|{media_type}'
+    digest = hashlib.sha1(representation.encode()).hexdigest()[:16]
+    return f'"{version}-{digest}"'
+
+
+def get_etag_version(etag):
+    """Return the version an ETag from ``make_etag()`` was issued for, or None."""
+    try:
+        return int(etag.strip('"').split('-', 1)[0])
+    except ValueError:
+        return None
+
+
+class ConditionalTaskMixin:
+    """
+    Strong ETags and conditional requests for a user's tasks.
+
+    Every ETag is built from the per-user data version (see
+    ``tasks.changes``), which every write to the user's tasks increments:
+
+    - GET list/detail answer ``If-None-Match`` with ``304 Not Modified``
+      after a single primary-key lookup, without running the list query or
+      the serializer.
+    - PUT/PATCH/DELETE honour ``If-Match`` and fail with ``412`` when the
+      version has moved on.
+
+    ETags look like ``"<version>-<digest>"``; the digest covers the user,
+    path, query string and response media type so different
+    representations never share a tag.
+
+    The data of GET responses is cached under the same version (see
+    ``tasks.response_cache``), so clients without the ETag are answered
+    without running the handler either.
+    """
+
+    def get_etag(self, request, version):
+        return make_etag(request.user.pk, request.path, request.query_params, request.accepted_media_type, version)
+
+    def conditional_get(self, request, handler, *args, **kwargs):
+        version = get_task_version(request.user.pk)
+        etag = self.get_etag(request, version)
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = self.cached_get(request, version, handler, *args, **kwargs)
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+            # Cache privately, but always revalidate with If-None-Match.
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ['Authorization'])
+        return response
+
+    def cached_get(self, request, version, handler, *args, **kwargs):
+        """
+        Return the response stored for this request at ``version``, or run
+        ``handler`` and store the data of a successful response.
+        """
+        responses = get_response_cache()
+        if responses is None:
+            return handler(request, *args, **kwargs)
+        # The absolute URL keeps pagination links right for every host.
+        etag = make_etag(
+            request.user.pk,
+            request.build_absolute_uri(request.path),
+            request.query_params,
+            request.accepted_media_type,
+            version,
+        )
+        key = responses.make_key(request.user, etag.strip('"'))
+        data = responses.get(key)
+        if data is not None:
+            response = Response(data)
+            response['X-Cache'] = 'hit'
+            return response
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            responses.set(key, response.data)
+            response['X-Cache'] = 'miss'
+        return response
+
+    @contextmanager
+    def write_precondition(self, request):
+        """
+        Run the block only if ``If-Match`` (when sent) names the current
+        version; the version row stays locked until the write commits.
+        """
+        header = request.META.get('HTTP_IF_MATCH')
+        if not header:
+            yield
+            return
+        with transaction.atomic(using=get_shard(request.user.pk)):
+            version = get_task_version(request.user.pk, for_update=True)
+            tags = parse_etags(header)
+            if '*' not in tags and version not in map(get_etag_version, tags):
+                raise PreconditionFailed()
+            yield
+
+    def set_write_etag(self, request, response):
+        """Tag a successful write response with the new version."""
+        if status.is_success(response.status_code):
+            response['ETag'] = self.get_etag(request, get_task_version(request.user.pk))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_get(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_get(request, super().retrieve, *args, **kwargs)
+
+    def update(self, request, *args, **kwargs):
+        with self.write_precondition(request):
+            response = super().update(request, *args, **kwargs)
+        return self.set_write_etag(request, response)
+
+
+class RowReadMixin:
+    """
+    ``list`` and ``retrieve`` built from ``values()`` rows.
+
+    ``row_serializer_class`` must provide ``values(queryset)``,
+    ``to_representation(row)`` and ``many(rows)`` (see
+    ``TaskRowSerializer``). Filtering, pagination and object permissions
+    work as for the model-instance actions they replace.
+    """
+    row_serializer_class = None
+
+    def get_row_serializer(self):
+        return self.row_serializer_class()
+
+    def get_list_rows(self, rows):
+        """The ``values()`` queryset ``list`` paginates and serializes."""
+        return rows.values(self.filter_queryset(self.get_queryset()))
+
+    def list(self, request, *args, **kwargs):
+        rows = self.get_row_serializer()
+        queryset = self.get_list_rows(rows)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            with timed('serialize'):
+                data = rows.many(page)
+            return self.get_paginated_response(data)
+        fetched = list(queryset)
+        with timed('serialize'):
+            data = rows.many(fetched)
+        return Response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        rows = self.get_row_serializer()
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = get_object_or_404(
+            rows.values(self.filter_queryset(self.get_queryset())),
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]},
+        )
+        self.check_object_permissions(request, row)
+        with timed('serialize'):
+            data = rows.to_representation(row)
+        return Response(data)
@@ -1,6 +1,16 @@
-from django.db import models
+from django.db import models, router, transaction
+from django.utils import timezone
 from django.contrib.auth.models import User
 
+from .sharding import ShardedQuerySet, assign_ids, shard_aliases
+
+
+class TaskQuerySet(ShardedQuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        assign_ids(self.model, objs)
+        return super().bulk_create(objs, *args, **kwargs)
+
 
 class Task(models.Model):
     """
@@ -10,7 +20,8 @@ class Task(models.Model):
         title: Short description of the task
         description: Detailed description (optional)
         completed: Boolean indicating completion status
-        user: Foreign key to the User who owns this task
+        user: Foreign key to the User who owns this task (no database
+            constraint: the row may live on another shard, see tasks.sharding)
         created_at: Timestamp when task was created
         updated_at: Timestamp when task was last updated
     """
@@ -21,15 +32,260 @@ class Task(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='tasks',
+        db_constraint=False,
         help_text="User who owns this task"
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = TaskQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']  # Most recent tasks first
         verbose_name = 'Task'
         verbose_name_plural = 'Tasks'
+        # Every TaskViewSet query is scoped to one user, optionally filtered
+        # on ``completed`` and sorted by one of its ``ordering_fields``. One
+        # index per (filter, ordering) shape lets the database walk rows in
+        # order instead of sorting the user's whole task set. The trailing
+        # ``id`` keeps ties in a stable, index-ordered sequence.
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='task_user_created_idx'),
+            models.Index(fields=['user', 'completed', '-created_at', '-id'], name='task_user_done_created_idx'),
+            models.Index(fields=['user', '-updated_at', '-id'], name='task_user_updated_idx'),
+            models.Index(fields=['user', 'completed', '-updated_at', '-id'], name='task_user_done_updated_idx'),
+            models.Index(fields=['user', 'title', 'id'], name='task_user_title_idx'),
+            models.Index(fields=['user', 'completed', 'title', 'id'], name='task_user_done_title_idx'),
+            models.Index(fields=['user', 'completed', 'id'], name='task_user_done_idx'),
+            # The admin changelist lists every user's tasks, newest first.
+            models.Index(fields=['-created_at', '-id'], name='task_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {'✓' if self.completed else '✗'}"
+
+    def save(self, *args, **kwargs):
+        # Keep the row and the per-user state updated by the save signals
+        # (see tasks.changes) in one transaction, which also holds the row
+        # lock taken to read the stored completion state (tasks.signals).
+        if self.pk is None and shard_aliases():
+            assign_ids(Task, [self])
+            kwargs['force_insert'] = True
+        using = kwargs.get('using') or router.db_for_write(Task, instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+
+
+class ArchivedTask(models.Model):
+    """
+    A completed task moved out of ``Task`` by ``manage.py archive_tasks``
+    (see tasks.archiving), with the id and timestamps it had.
+
+    Fields:
+        title, description, completed, user, created_at, updated_at: As
+            on ``Task``
+        archived_at: When the task was moved to the archive
+    """
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True)
+    completed = models.BooleanField(default=True)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_tasks',
+        db_constraint=False,
+    )
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    objects = ShardedQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Archived task'
+        verbose_name_plural = 'Archived tasks'
+        # Only read through the list with ?include_archived=true, in the
+        # default order.
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='archived_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.title} (archived)"
+
+
+class UserTaskState(models.Model):
+    """
+    Per-user bookkeeping for a user's task set, kept in one row per user.
+
+    Fields:
+        user: The user whose tasks this row describes
+        version: Incremented by every write to the user's tasks; used for
+            ETags and conditional requests
+        total_count: Number of tasks the user owns
+        completed_count: Number of those tasks that are completed
+        tombstone_horizon: Tombstones deleted before this time have been
+            compacted away; sync cursors older than it must resync
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='task_state',
+        db_constraint=False,
+    )
+    version = models.BigIntegerField(default=0)
+    total_count = models.BigIntegerField(default=0)
+    completed_count = models.BigIntegerField(default=0)
+    tombstone_horizon = models.DateTimeField(null=True, blank=True)
+
+    objects = ShardedQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'User task state'
+        verbose_name_plural = 'User task states'
+
+    def __str__(self):
+        return f"{self.user_id} @ v{self.version}"
+
+
+class TaskTombstone(models.Model):
+    """
+    Record of a deleted task, kept so sync clients can learn about deletes.
+
+    Fields:
+        user_id: Owner of the deleted task (not a foreign key, so tombstones
+            can be written while the owner itself is being deleted)
+        task_id: Primary key the deleted task had
+        deleted_at: When the task was deleted
+    """
+    user_id = models.BigIntegerField()
+    task_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    objects = ShardedQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Task tombstone'
+        verbose_name_plural = 'Task tombstones'
+        indexes = [
+            models.Index(fields=['user_id', 'deleted_at', 'id'], name='tombstone_user_deleted_idx'),
+            models.Index(fields=['deleted_at'], name='tombstone_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"Task {self.task_id} deleted at {self.deleted_at}"
+
+
+class AccountDeletion(models.Model):
+    """
+    A user whose account deletion was requested, and how far the
+    background purge of their rows has got (see tasks.purging). Kept on
+    the default database after the user is gone.
+
+    Fields:
+        user_id: The user being deleted (not a foreign key, so the record
+            outlives the user)
+        username: The username, for the admin
+        requested_at: When the deletion was requested
+        tasks_deleted: Task rows (live and archived) purged so far
+        finished_at: When the user itself was deleted; null while pending
+    """
+    user_id = models.BigIntegerField(unique=True)
+    username = models.CharField(max_length=150)
+    requested_at = models.DateTimeField(default=timezone.now)
+    tasks_deleted = models.BigIntegerField(default=0)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['requested_at']
+        verbose_name = 'Account deletion'
+        verbose_name_plural = 'Account deletions'
+
+    def __str__(self):
+        state = 'done' if self.finished_at else f'{self.tasks_deleted} task(s) purged'
+        return f"{self.username} ({state})"
+
+
+class Job(models.Model):
+    """
+    A unit of background work in the database job queue (see tasks.jobs),
+    run by ``manage.py run_worker``. Kept on the default database.
+
+    Fields:
+        name: The registered handler that runs the job
+        args: Keyword arguments for the handler (JSON)
+        user_id: The user who asked for the job, who may poll its status
+            (null for maintenance jobs)
+        status: queued, running, succeeded or failed
+        priority: Higher runs first
+        attempts: How many times a worker has started the job
+        max_attempts: Attempts before the job is marked failed
+        run_at: Not started before this time (retries back off)
+        worker: The worker that ran the latest attempt
+        result: What the handler returned (JSON)
+        error: The error of the latest failed attempt
+        created_at, started_at, finished_at: Timestamps of the job
+        heartbeat_at: Last sign of life from the worker running the job
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)
+    args = models.JSONField(default=dict, blank=True)
+    user_id = models.BigIntegerField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    priority = models.IntegerField(default=0)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=1)
+    run_at = models.DateTimeField(default=timezone.now)
+    worker = models.CharField(max_length=100, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Job'
+        verbose_name_plural = 'Jobs'
+        indexes = [
+            # The claim query: the next ready job by priority.
+            models.Index(fields=['status', '-priority', 'run_at', 'id'], name='job_claim_idx'),
+            models.Index(fields=['user_id', '-created_at'], name='job_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+class IdSequence(models.Model):
+    """
+    Primary keys reserved for a sharded model, kept on the default database
+    so ids stay unique across shards (see tasks.sharding).
+
+    Fields:
+        name: The model, as ``app_label.model_name``
+        next_id: First id not reserved yet
+    """
+    name = models.CharField(max_length=100, primary_key=True)
+    next_id = models.BigIntegerField()
+
+    class Meta:
+        verbose_name = 'ID sequence'
+        verbose_name_plural = 'ID sequences'
+
+    def __str__(self):
+        return f"{self.name} @ {self.next_id}"
@@ -0,0 +1,263 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.db import connections
+from django.db.models import BooleanField, Q
+from django.db.models.expressions import RawSQL
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Keyset (seek) pagination for any ordering a view allows.
+
+    Unlike ``PageNumberPagination`` this never runs ``COUNT(*)`` and never
+    uses ``OFFSET``: each page is fetched with a ``WHERE (keys) > (position)``
+    predicate that the composite indexes on ``Task`` can seek to directly,
+    so page N costs the same as page 1.
+
+    The ordering comes from the queryset (as set by ``OrderingFilter``) and
+    is always extended with the primary key so that rows sharing a value,
+    e.g. two tasks with the same title, still have a single well-defined
+    position. Cursors are opaque, URL-safe tokens that carry the ordering
+    they were issued for, the position of the boundary row and the
+    direction of travel.
+    """
+    page_size_query_param = None
+    annotations = {}
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.model = queryset.model
+        self.annotations = queryset.query.annotations
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.keys = self.get_keys(self.ordering)
+
+        cursor = self.decode_cursor(request)
+        reverse = cursor is not None and cursor['reverse']
+        keys = [self._flip(key) for key in self.keys] if reverse else self.keys
+
+        queryset = queryset.order_by(*keys)
+        if cursor is not None:
+            queryset = self.filter_after(queryset, keys, cursor['position'])
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_previous, self.has_next = has_more, True
+        else:
+            self.has_previous, self.has_next = cursor is not None, has_more
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def get_ordering(self, request, queryset, view):
+        """
+        Return the ordering already applied to ``queryset``.
+
+        ``OrderingFilter`` runs before pagination, so the queryset carries
+        either the client's ``?ordering=`` or the view's default.
+        """
+        ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+        assert all(isinstance(field, str) for field in ordering), (
+            'KeysetPagination only supports orderings on plain field names.'
+        )
+        return ordering
+
+    def get_keys(self, ordering):
+        """
+        Return ``ordering`` followed by the primary key as a tie-breaker.
+
+        The tie-breaker sorts in the same direction as the last ordering
+        field so the whole key matches the (..., field, id) indexes.
+        """
+        pk_name = self.model._meta.pk.name
+        names = [field.lstrip('-') for field in ordering]
+        if pk_name in names or 'pk' in names:
+            return list(ordering)
+        descending = bool(ordering) and ordering[-1].startswith('-')
+        return list(ordering) + [('-' if descending else '') + pk_name]
+
+    def filter_after(self, queryset, keys, position):
+        """
+        Restrict ``queryset`` to the rows that follow ``position`` in ``keys`` order.
+
+        When every key is a column and sorts in the same direction a
+        row-value comparison is used, which lets the database seek straight
+        to the position in a matching index. Mixed directions and annotated
+        keys (such as a search rank) fall back to the equivalent expanded
+        ``OR`` of prefix comparisons.
+        """
+        directions = {key.startswith('-') for key in keys}
+        annotated = any(key.lstrip('-') in self.annotations for key in keys)
+        if len(directions) == 1 and not annotated:
+            return queryset.filter(self._row_value_after(queryset, keys, position))
+
+        condition = Q()
+        for i, key in enumerate(keys):
+            name = key.lstrip('-')
+            lookup = 'lt' if key.startswith('-') else 'gt'
+            prefix = {keys[j].lstrip('-'): position[j] for j in range(i)}
+            condition |= Q(**prefix, **{f'{name}__{lookup}': position[i]})
+        return queryset.filter(condition)
+
+    def _row_value_after(self, queryset, keys, position):
+        connection = connections[queryset.db]
+        qn = connection.ops.quote_name
+        table = qn(self.model._meta.db_table)
+        columns, params = [], []
+        for key, value in zip(keys, position):
+            field = self._get_field(key)
+            columns.append(f'{table}.{qn(field.column)}')
+            params.append(field.get_db_prep_value(value, connection))
+        operator = '<' if keys[0].startswith('-') else '>'
+        placeholders = ', '.join(['%s'] * len(params))
+        sql = f"({', '.join(columns)}) {operator} ({placeholders})"
+        return RawSQL(sql, params, output_field=BooleanField())
+
+    def _get_field(self, key):
+        name = key.lstrip('-')
+        if name in self.annotations:
+            return self.annotations[name].output_field
+        if name == 'pk':
+            return self.model._meta.pk
+        return self.model._meta.get_field(name)
+
+    @staticmethod
+    def _flip(key):
+        return key[1:] if key.startswith('-') else '-' + key
+
+    def _get_position_from_instance(self, instance, ordering):
+        position = []
+        for key in self.keys:
+            name = key.lstrip('-')
+            if isinstance(instance, dict):
+                value = instance[name]
+            elif name in self.annotations:
+                value = getattr(instance, name)
+            else:
+                value = getattr(instance, self._get_field(key).attname)
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            position.append(value)
+        return position
+
+    def decode_cursor(self, request):
+        """
+        Return the decoded cursor as a dict, or ``None`` for the first page.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            padding = '=' * (-len(encoded) % 4)
+            data = json.loads(urlsafe_b64decode(encoded + padding))
+            ordering, values, reverse = data['o'], data['p'], bool(data['r'])
+            if ordering != self.ordering or len(values) != len(self.keys):
+                raise ValueError('Cursor does not match the requested ordering.')
+            position = [
+                self._get_field(key).to_python(value)
+                for key, value in zip(self.keys, values)
+            ]
+        except (TypeError, ValueError, KeyError, FieldDoesNotExist, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        return {'position': position, 'reverse': reverse}
+
+    def encode_cursor(self, cursor):
+        """
+        Return the current URL with ``cursor`` encoded into the query string.
+        """
+        payload = json.dumps(
+            {'o': self.ordering, 'p': cursor['position'], 'r': int(cursor['reverse'])},
+            separators=(',', ':'),
+        )
+        encoded = urlsafe_b64encode(payload.encode()).decode('ascii').rstrip('=')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        position = self._get_position_from_instance(self.page[-1], self.ordering)
+        return self.encode_cursor({'position': position, 'reverse': False})
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        position = self._get_position_from_instance(self.page[0], self.ordering)
+        return self.encode_cursor({'position': position, 'reverse': True})
+
+
+def estimate_count(queryset, limit):
+    """
+    Count the rows of ``queryset`` without reading more than ``limit + 1``
+    of them. Return ``(count, exact)``: past ``limit``, ``count`` is the
+    planner's row estimate for an unfiltered PostgreSQL table and ``limit``
+    everywhere else.
+    """
+    count = queryset.order_by().values('pk')[:limit + 1].count()
+    if count <= limit:
+        return count, True
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql' and not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        if row and row[0] > limit:
+            return row[0], False
+    return limit, False
+
+
+class _CountedPaginator(Paginator):
+    """``Paginator`` for a count that was already fetched."""
+
+    def __init__(self, count, per_page):
+        super().__init__([], per_page)
+        self.count = count
+
+
+class AsyncPageNumberPagination(PageNumberPagination):
+    """
+    ``PageNumberPagination`` for async views: the count and the page are
+    fetched with the async ORM and the response body is identical.
+    """
+
+    async def apaginate_queryset(self, queryset, request, count_queryset=None):
+        """
+        Return the rows of the requested page of ``queryset``. The total is
+        counted on ``count_queryset`` when given, e.g. the queryset before
+        ``values()`` added joins that do not change the row count.
+        """
+        self.request = request
+        page_size = self.get_page_size(request)
+        count = await (queryset if count_queryset is None else count_queryset).acount()
+        paginator = _CountedPaginator(count, page_size)
+        page_number = self.get_page_number(request, paginator)
+        try:
+            number = paginator.validate_number(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+
+        bottom = (number - 1) * page_size
+        rows = [row async for row in queryset[bottom:bottom + page_size]]
+        self.page = Page(rows, number, paginator)
+        return rows
@@ -0,0 +1,131 @@
+"""
+Account deletion in the background.
+
+``User.delete()`` collects and deletes every row that cascades from the
+user in one transaction, which for a user with millions of tasks holds
+locks for minutes. ``request_account_deletion()`` instead only
+deactivates the user, deletes their token and records an
+``AccountDeletion``; the user can no longer log in or use the API from
+that moment.
+
+An ``accounts.purge`` job (see tasks.jobs) then purges the account in the
+background, and ``manage.py purge_deleted_users`` works through any
+deletion still pending, e.g. after the job ran out of attempts. A purge
+deletes the user's tasks, archived tasks and tombstones
+``ACCOUNT_DELETION_BATCH_SIZE`` rows per transaction, adding each batch to
+``AccountDeletion.tasks_deleted``, and finally deletes the user itself,
+which has little left to cascade to, and sets ``finished_at``. Every batch
+commits on its own, so a purge that is interrupted simply continues where
+it stopped on the next run.
+
+Batches are deleted without model signals: no tombstones, counter updates
+or events are needed for a user who is going away (the state row goes
+with the user). Reactivating the user before their purge starts cancels
+it.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from .jobs import enqueue, job_handler
+from .models import AccountDeletion, ArchivedTask, Task, TaskTombstone
+from .sharding import get_shard
+
+
+def request_account_deletion(user):
+    """
+    Deactivate ``user``, revoke their token and queue the purge of their
+    data. Return the ``AccountDeletion``.
+    """
+    with transaction.atomic():
+        user.is_active = False
+        # Evicts the user's cached token (authentication.signals).
+        user.save(update_fields=['is_active'])
+        Token.objects.filter(user=user).delete()
+        deletion, created = AccountDeletion.objects.get_or_create(
+            user_id=user.pk, defaults={'username': user.get_username()},
+        )
+        if created:
+            enqueue('accounts.purge', {'deletion_id': deletion.pk})
+    return deletion
+
+
+def purge_rows(deletion, batch_size=1000, pause=0):
+    """
+    Delete the task rows of ``deletion``'s user in batches; return how many
+    were deleted.
+    """
+    alias = get_shard(deletion.user_id) or DEFAULT_DB_ALIAS
+    deleted = 0
+    for model, counted in ((Task, True), (ArchivedTask, True), (TaskTombstone, False)):
+        queryset = model._base_manager.using(alias).filter(user_id=deletion.user_id)
+        while True:
+            # The counter is on the default database: committing it last
+            # means it never counts a batch whose delete was rolled back.
+            with transaction.atomic(), transaction.atomic(using=alias):
+                ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+                if not ids:
+                    break
+                # One DELETE, without the collector or signals. That is safe
+                # because no model has a foreign key to these rows, and the
+                # search index is kept up to date by triggers. The post_delete
+                # receivers would only bump the version and counters, write
+                # tombstones and publish events for a user who can no longer
+                # sign in and whose state is deleted with them.
+                model._base_manager.using(alias).filter(pk__in=ids)._raw_delete(alias)
+                if counted:
+                    AccountDeletion.objects.filter(pk=deletion.pk).update(
+                        tasks_deleted=F('tasks_deleted') + len(ids),
+                    )
+            if counted:
+                deleted += len(ids)
+            if pause:
+                time.sleep(pause)
+    return deleted
+
+
+def purge_account(deletion, batch_size=1000, pause=0):
+    """
+    Purge the data of one pending deletion and delete the user. Return
+    False if the deletion was cancelled because the user is active again.
+    """
+    user = User.objects.filter(pk=deletion.user_id).first()
+    if user is not None and user.is_active:
+        deletion.delete()
+        return False
+    purge_rows(deletion, batch_size, pause)
+    with transaction.atomic():
+        if user is not None:
+            user.delete()
+        AccountDeletion.objects.filter(pk=deletion.pk).update(finished_at=timezone.now())
+    return True
+
+
+@job_handler('accounts.purge')
+def purge_account_job(job, deletion_id):
+    deletion = AccountDeletion.objects.filter(pk=deletion_id, finished_at__isnull=True).first()
+    if deletion is None:
+        return {'purged': False}
+    purged = purge_account(deletion, settings.ACCOUNT_DELETION_BATCH_SIZE)
+    deletion.refresh_from_db()
+    return {'purged': purged, 'tasks_deleted': deletion.tasks_deleted}
+
+
+def purge_deleted_users(batch_size=1000, pause=0, progress=None):
+    """
+    Run every pending purge; return how many users were deleted.
+    ``progress`` is called with each ``AccountDeletion`` once it is done.
+    """
+    purged = 0
+    for deletion in AccountDeletion.objects.filter(finished_at__isnull=True):
+        if purge_account(deletion, batch_size, pause):
+            purged += 1
+            if progress:
+                deletion.refresh_from_db()
+                progress(deletion)
+    return purged
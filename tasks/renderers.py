@@ -0,0 +1,86 @@
+import csv
+import io
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    ``JSONRenderer`` that encodes with ``orjson`` when it is installed.
+
+    The output is the same compact UTF-8 JSON; types orjson does not know
+    (lazy strings, ``Decimal``, ...) go through DRF's ``JSONEncoder``.
+    Requests for indented output, and installs without orjson, use the
+    standard renderer.
+    """
+    options = orjson.OPT_NON_STR_KEYS if orjson else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return orjson.dumps(data, default=JSONEncoder().default, option=self.options)
+
+
+class StreamingRenderer(BaseRenderer):
+    """
+    Renderer for export responses. ``render_rows()`` turns an iterable of
+    row dicts into a stream of byte chunks, one per ``chunk_size`` rows, for
+    a ``StreamingHttpResponse``; ``render()`` handles ordinary responses
+    such as errors.
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        return b''.join(self.render_rows(rows, fields=list(rows[0]) if rows else []))
+
+    def render_rows(self, rows, fields, chunk_size=1000):
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield self.render_chunk(chunk, fields)
+                chunk = []
+        if chunk:
+            yield self.render_chunk(chunk, fields)
+
+    def render_chunk(self, rows, fields):
+        raise NotImplementedError
+
+
+class NDJSONRenderer(StreamingRenderer):
+    """One compact JSON object per line (newline-delimited JSON)."""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def __init__(self):
+        self.json = FastJSONRenderer()
+
+    def render_chunk(self, rows, fields):
+        return b''.join(self.json.render(row) + b'\n' for row in rows)
+
+
+class CSVRenderer(StreamingRenderer):
+    """CSV with a header row of ``fields``."""
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def render_rows(self, rows, fields, chunk_size=1000):
+        yield self.render_chunk([dict(zip(fields, fields))], fields)
+        yield from super().render_rows(rows, fields, chunk_size)
+
+    def render_chunk(self, rows, fields):
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fields, extrasaction='ignore')
+        writer.writerows(rows)
+        return buffer.getvalue().encode(self.charset)
@@ -0,0 +1,126 @@
+"""
+Moving users' task rows onto the shard ``get_shard()`` assigns them.
+
+After ``TASK_SHARDS`` changes, ``misplaced_users()`` finds the users whose
+rows are stored on another database and ``move_user()`` copies each one's
+tasks and archived tasks (keeping their ids), tombstones and state to the new shard before
+deleting the originals. The copy commits first, so an interrupted move
+leaves rows on both databases, never on neither, and running it again
+finishes the job. Tasks the user created on the new shard in the meantime
+are kept and counted.
+
+Until a user has been moved their existing tasks are not visible, so run
+``manage.py reshard_tasks`` straight after deploying a new shard list.
+"""
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, Q
+
+from .models import ArchivedTask, Task, TaskTombstone, UserTaskState
+from .search import get_search_backend
+from .sharding import get_shard, task_databases
+
+
+def stored_user_ids(alias):
+    """Ids of the users with any task rows on ``alias``."""
+    user_ids = set()
+    for model in (Task, ArchivedTask, UserTaskState, TaskTombstone):
+        user_ids.update(
+            model._base_manager.using(alias).order_by().values_list('user_id', flat=True).distinct()
+        )
+    return user_ids
+
+
+def misplaced_users(sources=None):
+    """
+    Yield ``(user_id, source, target)`` for every user with rows on a
+    database in ``sources`` (default: every task database) other than the
+    one they belong on.
+    """
+    for source in sources or task_databases():
+        for user_id in sorted(stored_user_ids(source)):
+            target = get_shard(user_id) or DEFAULT_DB_ALIAS
+            if target != source:
+                yield user_id, source, target
+
+
+def move_user(user_id, source, target, batch_size=1000):
+    """Move ``user_id``'s rows from ``source`` to ``target``; return the number of tasks moved."""
+    tasks = Task.objects.using(source).filter(user_id=user_id)
+    archived = ArchivedTask.objects.using(source).filter(user_id=user_id)
+    tombstones = TaskTombstone.objects.using(source).filter(user_id=user_id)
+    states = UserTaskState.objects.using(source).filter(user_id=user_id)
+    moved = 0
+
+    with transaction.atomic(using=target):
+        batch = []
+        for task in tasks.order_by('pk').iterator(chunk_size=batch_size):
+            batch.append(task)
+            if len(batch) >= batch_size:
+                Task.objects.using(target).bulk_create(batch, ignore_conflicts=True)
+                moved += len(batch)
+                batch = []
+        Task.objects.using(target).bulk_create(batch, ignore_conflicts=True)
+        moved += len(batch)
+
+        ArchivedTask.objects.using(target).bulk_create(
+            archived.order_by('pk').iterator(chunk_size=batch_size),
+            batch_size=batch_size,
+            ignore_conflicts=True,
+        )
+
+        # Tombstone ids are per database; only (deleted_at, task_id) matter.
+        TaskTombstone.objects.using(target).bulk_create(
+            (
+                TaskTombstone(user_id=user_id, task_id=tombstone.task_id, deleted_at=tombstone.deleted_at)
+                for tombstone in tombstones.iterator(chunk_size=batch_size)
+            ),
+            batch_size=batch_size,
+        )
+
+        state = states.first() or UserTaskState(user_id=user_id)
+        current = UserTaskState.objects.using(target).filter(user_id=user_id).first()
+        if current is not None:
+            # The user has written to the new shard already: move past both
+            # versions so no ETag from either database stays valid.
+            state.version = max(state.version, current.version) + 1
+            if current.tombstone_horizon and (
+                state.tombstone_horizon is None or current.tombstone_horizon > state.tombstone_horizon
+            ):
+                state.tombstone_horizon = current.tombstone_horizon
+        counts = Task.objects.using(target).filter(user_id=user_id).aggregate(
+            total=Count('id'),
+            completed=Count('id', filter=Q(completed=True)),
+        )
+        state.total_count = counts['total']
+        state.completed_count = counts['completed']
+        state.save(using=target)
+
+    with transaction.atomic(using=source):
+        # No delete signals: the tasks still exist, on the target.
+        tasks._raw_delete(source)
+        archived.delete()
+        tombstones.delete()
+        states.delete()
+    return moved
+
+
+def reshard(sources=None, batch_size=1000, progress=None):
+    """
+    Move every misplaced user and return ``(users, tasks)`` moved.
+    ``progress`` is called with ``(user_id, source, target, tasks)`` after
+    each user.
+    """
+    users = tasks = 0
+    targets = set()
+    for user_id, source, target in misplaced_users(sources):
+        moved = move_user(user_id, source, target, batch_size)
+        users += 1
+        tasks += moved
+        targets.add(target)
+        if progress:
+            progress(user_id, source, target, moved)
+    for alias in targets:
+        backend = get_search_backend(alias)
+        if backend is not None:
+            backend.optimize()
+    return users, tasks
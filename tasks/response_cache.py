@@ -0,0 +1,88 @@
+"""
+Cached task list and detail responses.
+
+Dashboards poll the same ``GET /api/tasks/?...`` over and over. The data of
+every successful list and detail response is kept in the
+``TASK_RESPONSE_CACHE`` cache under a key made of the user, the per-user
+data version (see ``tasks.changes``), the URL with its query parameters
+sorted and the response media type, so:
+
+- a repeated request costs the version lookup the ETag needs anyway and
+  one cache ``get``, instead of the filter, count and serialization;
+- any write to the user's tasks (or a change of their username, which
+  every task shows) bumps the version in the same transaction, so the next
+  request looks for a new key: invalidation is O(1), never a
+  scan of the cache, and works on every backend (locmem, file-based, Redis
+  or memcached). Entries for old versions expire after ``TIMEOUT``.
+
+Responses carry ``X-Cache: hit`` or ``miss``; ``stats()`` counts both for
+the process.
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+class ResponseCache:
+    """Response data of a user's task requests, with hit/miss counters."""
+    key_prefix = 'task-response'
+
+    def __init__(self, alias, timeout):
+        self.cache = caches[alias]
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._counter_lock = threading.Lock()
+
+    def make_key(self, user, tag):
+        # Ids of deleted users can be handed out again; their join time
+        # tells the two apart.
+        return f'{self.key_prefix}:{user.pk}:{user.date_joined.timestamp()}:{tag}'
+
+    def get(self, key):
+        data = self.cache.get(key)
+        with self._counter_lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return data
+
+    def set(self, key, data):
+        self.cache.set(key, data, self.timeout)
+
+    def stats(self):
+        """Return hit/miss counters for this process."""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / total if total else 0.0,
+        }
+
+
+_response_cache = None
+
+
+def get_response_cache():
+    """
+    Return the process-wide response cache configured by
+    ``TASK_RESPONSE_CACHE``, or None when it is turned off.
+    """
+    global _response_cache
+    options = settings.TASK_RESPONSE_CACHE
+    if not options['TIMEOUT']:
+        return None
+    if _response_cache is None:
+        _response_cache = ResponseCache(options['CACHE_ALIAS'], options['TIMEOUT'])
+    return _response_cache
+
+
+@receiver(setting_changed)
+def reset_response_cache(setting, **kwargs):
+    global _response_cache
+    if setting in ('TASK_RESPONSE_CACHE', 'CACHES'):
+        _response_cache = None
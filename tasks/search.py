@@ -0,0 +1,323 @@
+"""
+Full-text search backends for tasks.
+
+``SearchFilter`` turns ``?search=`` into ``ILIKE '%term%'`` on every
+searchable column, which always reads every row the user owns. The backends
+here keep an inverted index of ``Task.title`` and ``Task.description`` in
+the database itself, so it stays in sync with every write path: ``save()``,
+``bulk_create()``, queryset ``update()``/``delete()`` and raw SQL alike.
+
+- SQLite: an external-content FTS5 table maintained by triggers.
+- PostgreSQL: a generated ``tsvector`` column with a GIN index.
+
+``get_search_backend()`` returns ``None`` when no index is installed (or
+search is disabled with ``TASK_SEARCH_BACKEND = 'none'``), and callers fall
+back to the plain ``SearchFilter`` behaviour.
+"""
+import re
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import OperationalError, connections
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from .models import Task
+
+
+SEARCH_RANK = 'search_rank'
+
+
+class SearchBackend:
+    """
+    Base class for task full-text search backends.
+
+    Subclasses set ``vendor`` to the database vendor they support and
+    implement ``install``, ``uninstall``, ``rebuild``, ``is_installed`` and
+    ``search``. ``search`` must annotate ``SEARCH_RANK`` so that higher
+    values mean better matches, unless called with ``rank=False`` by
+    callers that only need the matches. ``count`` reads at most ``limit``
+    matches from the index alone. ``optimize`` compacts the index after
+    large loads or deletes.
+    """
+    vendor = None
+    table = Task._meta.db_table
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def install(self):
+        raise NotImplementedError
+
+    def uninstall(self):
+        raise NotImplementedError
+
+    def rebuild(self):
+        raise NotImplementedError
+
+    def is_installed(self):
+        raise NotImplementedError
+
+    def optimize(self):
+        pass
+
+    def search(self, queryset, terms, rank=True):
+        raise NotImplementedError
+
+    def count(self, terms, limit):
+        raise NotImplementedError
+
+    def execute(self, *statements):
+        with self.connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+    def column(self, name):
+        qn = self.connection.ops.quote_name
+        return f'{qn(self.table)}.{qn(name)}'
+
+
+class SQLiteFTS5Backend(SearchBackend):
+    """
+    SQLite FTS5 index on title and description.
+
+    The FTS table stores only the inverted index (``content=`` points back
+    at ``tasks_task``) and is kept in sync by insert, update and delete
+    triggers. Terms are matched as token prefixes and all terms must match.
+    """
+    vendor = 'sqlite'
+    fts_table = f'{Task._meta.db_table}_fts'
+    # bm25() column weights: a hit in the title counts more than one in the
+    # description.
+    weights = (10.0, 1.0)
+
+    def install(self):
+        fts, table = self.fts_table, self.table
+        self.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+            f"title, description, content='{table}', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts}(rowid, title, description) "
+            f"VALUES (new.id, new.title, new.description); END",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, title, description) "
+            f"VALUES ('delete', old.id, old.title, old.description); END",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF title, description ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, title, description) "
+            f"VALUES ('delete', old.id, old.title, old.description); "
+            f"INSERT INTO {fts}(rowid, title, description) "
+            f"VALUES (new.id, new.title, new.description); END",
+        )
+        self.rebuild()
+
+    def uninstall(self):
+        fts = self.fts_table
+        self.execute(
+            f'DROP TRIGGER IF EXISTS {fts}_ai',
+            f'DROP TRIGGER IF EXISTS {fts}_ad',
+            f'DROP TRIGGER IF EXISTS {fts}_au',
+            f'DROP TABLE IF EXISTS {fts}',
+        )
+
+    def rebuild(self):
+        self.execute(f"INSERT INTO {self.fts_table}({self.fts_table}) VALUES ('rebuild')")
+
+    def optimize(self):
+        # Row-by-row trigger updates leave many small segments and delete
+        # markers behind; queries slow down sharply until they are merged.
+        self.execute(f"INSERT INTO {self.fts_table}({self.fts_table}) VALUES ('optimize')")
+
+    def is_installed(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT COUNT(*) FROM sqlite_master WHERE name IN (%s, %s, %s, %s)",
+                [self.fts_table] + [f'{self.fts_table}_{suffix}' for suffix in ('ai', 'ad', 'au')],
+            )
+            return cursor.fetchone()[0] == 4
+
+    def count(self, terms, limit):
+        fts = self.fts_table
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(*) FROM (SELECT rowid FROM {fts} WHERE {fts} MATCH %s LIMIT %s)',
+                [self.build_query(terms), limit],
+            )
+            return cursor.fetchone()[0]
+
+    def build_query(self, terms):
+        """Quote each term as an FTS5 prefix phrase and require all of them."""
+        return ' AND '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+    def search(self, queryset, terms, rank=True):
+        match = self.build_query(terms)
+        fts, weights = self.fts_table, ', '.join(str(w) for w in self.weights)
+        task_id = self.column('id')
+        queryset = queryset.filter(
+            RawSQL(
+                f'{task_id} IN (SELECT rowid FROM {fts} WHERE {fts} MATCH %s)',
+                [match], output_field=BooleanField(),
+            )
+        )
+        if not rank:
+            return queryset
+        # bm25() runs the match again for every row returned.
+        return queryset.annotate(**{
+            SEARCH_RANK: RawSQL(
+                f'(SELECT -bm25({fts}, {weights}) FROM {fts} '
+                f'WHERE {fts} MATCH %s AND rowid = {task_id})',
+                [match], output_field=FloatField(),
+            )
+        })
+
+
+class PostgresFullTextBackend(SearchBackend):
+    """
+    PostgreSQL ``tsvector`` index on title (weight A) and description (weight B).
+
+    The vector is a stored generated column, so PostgreSQL keeps it current
+    on every write. The ``simple`` configuration is used so matching stays
+    language-agnostic, like the ``icontains`` search it replaces.
+    """
+    vendor = 'postgresql'
+    vector_column = 'search_vector'
+    index_name = 'task_search_vector_idx'
+    config = 'simple'
+
+    def install(self):
+        table, column, config = self.table, self.vector_column, self.config
+        self.execute(
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} tsvector "
+            f"GENERATED ALWAYS AS ("
+            f"setweight(to_tsvector('{config}', coalesce(title, '')), 'A') || "
+            f"setweight(to_tsvector('{config}', coalesce(description, '')), 'B')"
+            f") STORED",
+            f"CREATE INDEX IF NOT EXISTS {self.index_name} ON {table} USING GIN ({column})",
+        )
+
+    def uninstall(self):
+        self.execute(
+            f'DROP INDEX IF EXISTS {self.index_name}',
+            f'ALTER TABLE {self.table} DROP COLUMN IF EXISTS {self.vector_column}',
+        )
+
+    def rebuild(self):
+        # Generated columns are recomputed by PostgreSQL; only the index can
+        # need rebuilding.
+        self.execute(f'REINDEX INDEX {self.index_name}')
+
+    def is_installed(self):
+        with self.connection.cursor() as cursor:
+            columns = self.connection.introspection.get_table_description(cursor, self.table)
+        return any(column.name == self.vector_column for column in columns)
+
+    def count(self, terms, limit):
+        query = self.build_query(terms)
+        if not query:
+            return 0
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(*) FROM (SELECT 1 FROM {self.table} WHERE {self.vector_column} '
+                f"@@ to_tsquery('{self.config}', %s) LIMIT %s) matches",
+                [query, limit],
+            )
+            return cursor.fetchone()[0]
+
+    def build_query(self, terms):
+        """Turn each word of each term into a prefix match and require all of them."""
+        words = [word for term in terms for word in re.findall(r'\w+', term)]
+        return ' & '.join(f'{word}:*' for word in words)
+
+    def search(self, queryset, terms, rank=True):
+        query = self.build_query(terms)
+        if not query:
+            # Terms without a word (e.g. punctuation) match nothing, as on SQLite.
+            return queryset.none()
+        vector = self.column(self.vector_column)
+        tsquery = f"to_tsquery('{self.config}', %s)"
+        queryset = queryset.filter(
+            RawSQL(f'{vector} @@ {tsquery}', [query], output_field=BooleanField())
+        )
+        if not rank:
+            return queryset
+        return queryset.annotate(**{
+            SEARCH_RANK: RawSQL(f'ts_rank({vector}, {tsquery})', [query], output_field=FloatField())
+        })
+
+
+BACKENDS = {
+    backend.vendor: backend
+    for backend in [SQLiteFTS5Backend, PostgresFullTextBackend]
+}
+
+_installed = {}
+
+
+def get_backend_class(connection):
+    """
+    Return the search backend class configured for ``connection``, or None.
+
+    ``TASK_SEARCH_BACKEND`` is ``'auto'`` (pick by database vendor),
+    ``'none'`` (always use the ``icontains`` fallback) or the dotted path
+    of a ``SearchBackend`` subclass.
+    """
+    setting = getattr(settings, 'TASK_SEARCH_BACKEND', 'auto')
+    if setting == 'none':
+        return None
+    if setting == 'auto':
+        return BACKENDS.get(connection.vendor)
+    return import_string(setting)
+
+
+def get_search_backend(using='default'):
+    """
+    Return a ready-to-query search backend for the ``using`` database, or None.
+
+    Whether the index is installed is checked once per database and cached,
+    so this costs nothing on the request path after the first call.
+    """
+    connection = connections[using]
+    backend_class = get_backend_class(connection)
+    if backend_class is None:
+        return None
+
+    key = (backend_class, using, connection.settings_dict['NAME'])
+    if key not in _installed:
+        _installed[key] = backend_class(connection).is_installed()
+    return backend_class(connection) if _installed[key] else None
+
+
+async def aget_search_backend(using='default'):
+    """
+    Async counterpart of ``get_search_backend()``; only the first call per
+    database leaves the event loop.
+    """
+    connection = connections[using]
+    backend_class = get_backend_class(connection)
+    if backend_class is None:
+        return None
+    if (backend_class, using, connection.settings_dict['NAME']) not in _installed:
+        return await sync_to_async(get_search_backend)(using)
+    return get_search_backend(using)
+
+
+def install_search_index(connection):
+    """Create and populate the search index for ``connection`` if its vendor has a backend."""
+    backend_class = BACKENDS.get(connection.vendor)
+    if backend_class is not None:
+        try:
+            backend_class(connection).install()
+        except OperationalError:
+            # SQLite builds without FTS5 keep using the icontains fallback.
+            if connection.vendor != 'sqlite':
+                raise
+    _installed.clear()
+
+
+def uninstall_search_index(connection):
+    """Drop the search index for ``connection`` if its vendor has a backend."""
+    backend_class = BACKENDS.get(connection.vendor)
+    if backend_class is not None:
+        backend_class(connection).uninstall()
+    _installed.clear()
@@ -0,0 +1,161 @@
+"""
+Synthetic data for benchmarks and load tests.
+
+``seed_tasks()`` inserts users, their API tokens, their tasks and their
+``UserTaskState`` counters with ``bulk_create`` only: one password hash for
+every user, no per-row signals, one transaction per batch. The rows are
+indistinguishable from ones created through the API, except that all tasks
+of a run share the same ``created_at``.
+"""
+import random
+import re
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from rest_framework.authtoken.models import Token
+
+from .models import Task, TaskTombstone, UserTaskState
+from .search import get_search_backend, install_search_index, uninstall_search_index
+from .sharding import group_by_shard, task_databases
+
+
+WORDS = (
+    'buy milk call email report review deploy fix bug write docs plan meeting '
+    'book flight pay invoice clean garage update budget read paper water plants '
+    'backup laptop renew passport prepare slides order groceries'
+).split()
+
+
+def seed_tasks(users, tasks_per_user, prefix='seed', password='seed-pass-123',
+               completed_ratio=0.3, batch_size=5000, random_seed=0,
+               defer_search_index=False, progress=None):
+    """
+    Create ``users`` users named ``<prefix><n>`` with ``tasks_per_user``
+    tasks each and return ``(user_ids, tasks_created, seconds)``.
+
+    With ``defer_search_index`` the full-text index is dropped while the
+    tasks are inserted and rebuilt in one pass afterwards, which is faster
+    for large loads but leaves search unindexed in the meantime.
+    ``progress`` is called with the running task count after each batch.
+    """
+    rng = random.Random(random_seed)
+    start = time.perf_counter()
+    names = seeded_users(prefix).values_list('username', flat=True)
+    offset = max((int(name[len(prefix):]) for name in names), default=-1) + 1
+    password = make_password(password)
+
+    with transaction.atomic():
+        created = User.objects.bulk_create(
+            User(username=f'{prefix}{offset + i:06d}', email=f'{prefix}{offset + i}@example.com', password=password)
+            for i in range(users)
+        )
+        if any(user.pk is None for user in created):
+            # Backends that cannot return ids from bulk_create.
+            created = User.objects.filter(username__in=[user.username for user in created])
+        user_ids = [user.pk for user in created]
+        Token.objects.bulk_create(Token(key=Token.generate_key(), user_id=pk) for pk in user_ids)
+
+    # Drawing from pools keeps text generation out of the insert loop.
+    titles = [' '.join(rng.sample(WORDS, 3)).capitalize() for _ in range(1000)]
+    descriptions = [' '.join(rng.choices(WORDS, k=12)) for _ in range(1000)]
+
+    if defer_search_index:
+        for alias in task_databases():
+            uninstall_search_index(connections[alias])
+    try:
+        total, completed = _insert_tasks(
+            rng, user_ids, tasks_per_user, completed_ratio, batch_size, titles, descriptions, progress
+        )
+    finally:
+        if defer_search_index:
+            for alias in task_databases():
+                install_search_index(connections[alias])
+
+    states = [
+        UserTaskState(user_id=pk, version=1, total_count=tasks_per_user, completed_count=completed[pk])
+        for pk in user_ids
+    ]
+    for shard, shard_states in group_by_shard(states).items():
+        UserTaskState.objects.using(shard).bulk_create(shard_states)
+    _optimize_search_index()
+    return user_ids, total, time.perf_counter() - start
+
+
+def seeded_users(prefix):
+    """
+    Return the users ``seed_tasks()`` created with ``prefix``: the prefix
+    followed by at least six digits, so that a real account that merely
+    starts with the prefix (say "seedling") is never included.
+    """
+    return User.objects.filter(username__regex=rf'^{re.escape(prefix)}[0-9]{{6,}}$')
+
+
+def _optimize_search_index():
+    for alias in task_databases():
+        backend = get_search_backend(alias)
+        if backend is not None:
+            backend.optimize()
+
+
+def _insert_tasks(rng, user_ids, tasks_per_user, completed_ratio, batch_size, titles, descriptions, progress):
+    total, completed = 0, {}
+    batch = []
+    for user_id in user_ids:
+        completed[user_id] = 0
+        for _ in range(tasks_per_user):
+            done = rng.random() < completed_ratio
+            completed[user_id] += done
+            batch.append(Task(
+                user_id=user_id,
+                title=rng.choice(titles),
+                description=rng.choice(descriptions),
+                completed=done,
+            ))
+            if len(batch) >= batch_size:
+                total += _insert(batch)
+                batch = []
+                if progress:
+                    progress(total)
+    if batch:
+        total += _insert(batch)
+        if progress:
+            progress(total)
+    return total, completed
+
+
+def _insert(batch):
+    for shard, tasks in group_by_shard(batch).items():
+        with transaction.atomic(using=shard):
+            Task.objects.using(shard).bulk_create(tasks, batch_size=len(tasks))
+    return len(batch)
+
+
+def delete_seeded_users(prefix):
+    """Delete the ``seeded_users()`` of ``prefix``; see ``delete_users()``."""
+    return delete_users(seeded_users(prefix))
+
+
+def delete_users(users):
+    """
+    Delete the ``users`` queryset and everything they own, returning the
+    number of tasks deleted.
+
+    Their tasks are removed with a single DELETE rather than through the
+    collector, which would load every row to send its delete signals; the
+    counters and tombstones those signals maintain go away with the users.
+    """
+    deleted = 0
+    with transaction.atomic():
+        for alias in task_databases():
+            # Other shards cannot run a subquery on the users table.
+            user_ids = users.values('pk') if alias == DEFAULT_DB_ALIAS else list(users.values_list('pk', flat=True))
+            with transaction.atomic(using=alias):
+                tasks = Task.objects.using(alias).filter(user_id__in=user_ids)
+                deleted += tasks._raw_delete(alias)
+                TaskTombstone.objects.using(alias).filter(user_id__in=user_ids).delete()
+        users.delete()
+    if deleted:
+        _optimize_search_index()
+    return deleted
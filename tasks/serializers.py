@@ -1,5 +1,6 @@
+from django.db.models.constants import LOOKUP_SEP
 from rest_framework import serializers
-from .models import Task
+from .models import Job, Task
 
 
 class TaskSerializer(serializers.ModelSerializer):
@@ -37,3 +38,62 @@ class TaskCreateUpdateSerializer(serializers.ModelSerializer):
         if not value or value.strip() == '':
             raise serializers.ValidationError("Title cannot be empty.")
         return value.strip()
+
+
+class TaskRowSerializer:
+    """
+    Read-only stand-in for ``TaskSerializer`` that works on ``values()`` rows.
+
+    Building a ``ModelSerializer`` representation runs every field's
+    ``get_attribute``/``to_representation`` per row and follows
+    ``user.username`` through the related object. This reads the same
+    columns in one ``values()`` query (joining the username) and only
+    converts the fields that need it, producing exactly the JSON
+    ``TaskSerializer`` does.
+
+    When every row belongs to ``owner`` the username is taken from it
+    instead of joining ``auth_user``, which a task shard does not have.
+    """
+
+    def __init__(self, owner=None):
+        fields = TaskSerializer().fields
+        self.columns = {name: LOOKUP_SEP.join(field.source_attrs) for name, field in fields.items()}
+        self.converters = {
+            name: field.to_representation
+            for name, field in fields.items()
+            if isinstance(field, serializers.DateTimeField)
+        }
+        if owner is not None:
+            self.columns['user'] = 'user_id'
+            self.converters['user'] = lambda user_id: owner.username
+
+    def values(self, queryset):
+        """
+        Return ``queryset`` as rows holding the serialized columns and any
+        annotations (which keyset pagination may need).
+        """
+        return queryset.values(*self.columns.values(), *queryset.query.annotations)
+
+    def to_representation(self, row):
+        data = {name: row[column] for name, column in self.columns.items()}
+        for name, convert in self.converters.items():
+            if data[name] is not None:
+                data[name] = convert(data[name])
+        return data
+
+    def many(self, rows):
+        return [self.to_representation(row) for row in rows]
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """
+    Status of a background job (see tasks.jobs), for its owner to poll.
+    """
+
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'name', 'status', 'attempts', 'max_attempts', 'result', 'error',
+            'created_at', 'started_at', 'finished_at',
+        ]
+        read_only_fields = fields
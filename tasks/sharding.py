@@ -0,0 +1,216 @@
+"""
+User-keyed sharding of the task tables.
+
+With ``TASK_SHARDS['ALIASES']`` set, the rows of ``Task``,
+``ArchivedTask``, ``UserTaskState`` and ``TaskTombstone`` live on the
+database alias their user hashes to; users, tokens, sessions and everything else stay on
+``default`` (which is one of the shards). Every task query is scoped to
+one user, so the API works unchanged:
+
+- ``get_shard(user_id)`` places users on a consistent-hash ring with
+  ``VNODES`` points per alias, so adding a shard moves only the users that
+  now hash to it (about 1/N of them); ``manage.py reshard_tasks`` moves
+  their rows (see ``tasks.resharding``);
+- ``Task.objects.for_user(user_id)`` (and the same on the other
+  models) reads the right shard, and ``ShardRouter`` sends saves and
+  deletes of model instances to their user's shard; code that writes by
+  other means passes ``using=get_shard(user_id)``, which is ``None`` (let
+  the routers decide) while sharding is off;
+- task ids come from blocks reserved on ``default`` (``IdSequence``), so
+  they stay unique across shards and survive a move;
+- ``ShardRouter.allow_migrate`` creates only the task tables on the other
+  shards; run ``manage.py migrate --database <alias>`` for each of them.
+
+There are no foreign key constraints from the task tables to ``auth_user``,
+which the other shards do not have; deleting a user removes their rows
+from their shard explicitly (see ``tasks.signals``).
+"""
+import bisect
+import hashlib
+import threading
+
+from django.apps import apps
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import DEFAULT_DB_ALIAS, models, transaction
+from django.db.models import F, Max
+from django.dispatch import receiver
+
+
+SHARDED_MODELS = {'task', 'archivedtask', 'usertaskstate', 'tasktombstone'}
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.md5(str(value).encode()).digest()[:8], 'big')
+
+
+class HashRing:
+    """Consistent hashing of keys onto database aliases."""
+
+    def __init__(self, aliases, vnodes=64):
+        points = sorted((_hash(f'{alias}#{index}'), alias) for alias in aliases for index in range(vnodes))
+        self.hashes = [point for point, _ in points]
+        self.aliases = [alias for _, alias in points]
+
+    def get(self, key):
+        index = bisect.bisect(self.hashes, _hash(key)) % len(self.hashes)
+        return self.aliases[index]
+
+
+_ring = None
+
+
+def shard_aliases():
+    """The shard aliases, or an empty list while sharding is off."""
+    return settings.TASK_SHARDS['ALIASES']
+
+
+def task_databases():
+    """Every alias holding task tables."""
+    return shard_aliases() or [DEFAULT_DB_ALIAS]
+
+
+def get_shard(user_id):
+    """
+    Return the alias holding ``user_id``'s tasks, or None while sharding is
+    off (use the routers' choice, e.g. a read replica).
+    """
+    global _ring
+    aliases = shard_aliases()
+    if not aliases:
+        return None
+    if _ring is None:
+        _ring = HashRing(aliases, settings.TASK_SHARDS['VNODES'])
+    return _ring.get(user_id)
+
+
+def group_by_shard(objs):
+    """Return ``{alias: [obj, ...]}`` for objects with a ``user_id``."""
+    groups = {}
+    for obj in objs:
+        groups.setdefault(get_shard(obj.user_id), []).append(obj)
+    return groups
+
+
+class ShardRouter:
+    """
+    Route instances of the sharded models to their user's shard, and
+    lookups from a sharded row to any other model (e.g. ``task.user``)
+    back to ``default``.
+    """
+
+    def db_for_read(self, model, **hints):
+        aliases = shard_aliases()
+        instance = hints.get('instance')
+        if not aliases or instance is None:
+            return None
+        if model._meta.app_label == 'tasks' and model._meta.model_name in SHARDED_MODELS:
+            # A sharded row, or the user whose rows are being followed.
+            user_id = instance.user_id if hasattr(instance, 'user_id') else instance.pk
+            return get_shard(user_id) if user_id is not None else None
+        if instance._state.db in aliases and instance._state.db != DEFAULT_DB_ALIAS:
+            return DEFAULT_DB_ALIAS
+        return None
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = shard_aliases()
+        if aliases and obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == DEFAULT_DB_ALIAS or db not in shard_aliases():
+            return None
+        return app_label == 'tasks' and (model_name is None or model_name in SHARDED_MODELS)
+
+
+class ShardedQuerySet(models.QuerySet):
+    def for_user(self, user_id):
+        """This user's rows, read from their shard."""
+        return self.using(get_shard(user_id)).filter(user_id=user_id)
+
+    def create(self, **kwargs):
+        # QuerySet.create() saves on self.db, which without using() is the
+        # routers' choice for the model; let them see the instance instead.
+        obj = self.model(**kwargs)
+        self._for_write = True
+        obj.save(force_insert=True, using=self._db)
+        return obj
+
+
+class IdAllocator:
+    """
+    Hand out primary keys for ``model`` from blocks of ``ID_BLOCK_SIZE``
+    reserved in its ``IdSequence`` row on ``default``. Ids are unique but
+    only roughly increasing across processes.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.name = model._meta.label_lower
+        self.lock = threading.Lock()
+        self.next_id = self.end = 0
+        self.floor_checked = False
+
+    def allocate(self, count):
+        ids = []
+        with self.lock:
+            while len(ids) < count:
+                if self.next_id == self.end:
+                    size = max(count - len(ids), settings.TASK_SHARDS['ID_BLOCK_SIZE'])
+                    self.next_id, self.end = self.reserve(size)
+                taken = min(count - len(ids), self.end - self.next_id)
+                ids.extend(range(self.next_id, self.next_id + taken))
+                self.next_id += taken
+        return ids
+
+    def floor(self):
+        """First id above every stored row, e.g. ones inserted before sharding."""
+        return max(
+            (self.model._base_manager.using(alias).aggregate(top=Max('pk'))['top'] or 0)
+            for alias in task_databases()
+        ) + 1
+
+    def reserve(self, size):
+        IdSequence = apps.get_model('tasks', 'IdSequence')
+        floor = 0 if self.floor_checked else self.floor()
+        with transaction.atomic(using=DEFAULT_DB_ALIAS):
+            sequence = IdSequence.objects.using(DEFAULT_DB_ALIAS).filter(name=self.name)
+            # Update first so the transaction holds the write lock.
+            if not sequence.update(next_id=F('next_id') + size):
+                IdSequence.objects.using(DEFAULT_DB_ALIAS).create(name=self.name, next_id=1 + size)
+            end = sequence.values_list('next_id', flat=True).get()
+            if end - size < floor:
+                end = floor + size
+                sequence.update(next_id=end)
+        self.floor_checked = True
+        return end - size, end
+
+
+_allocators = {}
+
+
+def allocate_ids(model, count):
+    """Reserve ``count`` ids of ``model`` that are unique across shards."""
+    allocator = _allocators.get(model)
+    if allocator is None:
+        allocator = _allocators.setdefault(model, IdAllocator(model))
+    return allocator.allocate(count)
+
+
+def assign_ids(model, objs):
+    """While sharding is on, give every object without a primary key one."""
+    missing = [obj for obj in objs if obj.pk is None]
+    if missing and shard_aliases():
+        for obj, pk in zip(missing, allocate_ids(model, len(missing))):
+            obj.pk = pk
+
+
+@receiver(setting_changed)
+def reset_shards(*, setting, **kwargs):
+    global _ring
+    if setting == 'TASK_SHARDS':
+        _ring = None
+        _allocators.clear()
@@ -0,0 +1,99 @@
+from functools import partial
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .changes import apply_change, record_change, task_changes
+from .events import get_broker
+from .models import ArchivedTask, Task, TaskTombstone, UserTaskState
+from .sharding import get_shard
+from .sync import record_tombstones
+
+
+@receiver(pre_save, sender=Task)
+def load_stored_completed(sender, instance, raw, using, update_fields, **kwargs):
+    """
+    Read the stored ``completed`` value of a task about to be updated, with
+    the row locked until ``Task.save()``'s transaction ends, so that two
+    concurrent toggles of the same task see each other's write and adjust
+    the per-user counters once.
+    """
+    instance._stored_completed = None
+    if raw or instance._state.adding or (update_fields is not None and 'completed' not in update_fields):
+        return
+    instance._stored_completed = (
+        Task.objects.using(using).select_for_update().filter(pk=instance.pk)
+        .values_list('completed', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Task)
+def record_saved_task(sender, instance, created, **kwargs):
+    if created:
+        record_change(instance.user_id, created=[instance.pk], total=1, completed=int(instance.completed))
+    else:
+        completed = 0
+        stored = instance._stored_completed
+        if stored is not None:
+            completed = int(instance.completed) - int(stored)
+        record_change(instance.user_id, updated=[instance.pk], completed=completed)
+
+
+@receiver(post_delete, sender=Task)
+def record_deleted_task(sender, instance, **kwargs):
+    record_change(instance.user_id, deleted=[instance.pk], total=-1, completed=-int(instance.completed))
+
+
+@receiver(task_changes, sender=Task)
+def update_task_state(sender, change, **kwargs):
+    apply_change(change)
+
+
+@receiver(task_changes, sender=Task)
+def write_tombstones(sender, change, **kwargs):
+    record_tombstones(change)
+
+
+@receiver(task_changes, sender=Task)
+def publish_task_events(sender, change, **kwargs):
+    transaction.on_commit(partial(get_broker().publish, change.user_id), using=get_shard(change.user_id))
+
+
+@receiver(pre_save, sender=User)
+def load_stored_username(sender, instance, raw, using, update_fields, **kwargs):
+    instance._stored_username = None
+    if raw or instance._state.adding or (update_fields is not None and 'username' not in update_fields):
+        return
+    instance._stored_username = (
+        User.objects.using(using).filter(pk=instance.pk).values_list('username', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=User)
+def record_renamed_user(sender, instance, created, **kwargs):
+    """
+    Every task representation carries its owner's username: a rename
+    updates all of the user's tasks, so their data version moves on and
+    ETags and cached responses from before it no longer match.
+    """
+    stored = getattr(instance, '_stored_username', None)
+    if not created and stored is not None and stored != instance.username:
+        record_change(instance.pk, updated=None)
+
+
+@receiver(pre_delete, sender=User)
+def delete_sharded_rows(sender, instance, using, **kwargs):
+    """
+    The deletion collector only looks for a user's tasks on the user's own
+    database; remove the ones kept on another shard.
+    """
+    shard = get_shard(instance.pk)
+    if shard is None or shard == using:
+        return
+    with transaction.atomic(using=shard):
+        Task.objects.for_user(instance.pk).delete()
+        ArchivedTask.objects.for_user(instance.pk).delete()
+        UserTaskState.objects.for_user(instance.pk).delete()
+        TaskTombstone.objects.for_user(instance.pk).delete()
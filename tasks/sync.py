@@ -0,0 +1,233 @@
+"""
+Delta sync for offline-capable clients.
+
+``GET /api/tasks/changes/?since=<cursor>`` returns the tasks created or
+updated after the cursor, the ids of the tasks deleted after it and a new
+cursor to send next time. Without ``since`` it starts a full sync: every
+task, and only deletes that happen from then on.
+
+Upserts are found through ``Task.updated_at`` (served by the
+``(user, updated_at, id)`` index) and deletes through ``TaskTombstone``
+rows written for every deleted task. The cursor also carries the user's
+data version from ``UserTaskState``, so a poll when nothing has changed is
+answered from a single primary-key lookup.
+
+Rows are stamped before their transaction commits, so a write can become
+visible with a timestamp slightly older than a cursor already handed out.
+Caught-up cursors therefore lag ``now`` by ``TASK_SYNC_OVERLAP_SECONDS``:
+recent changes may be sent twice (clients apply them idempotently by id)
+but writes that commit within that window are never missed.
+
+Tombstones older than ``TASK_TOMBSTONE_RETENTION_DAYS`` are removed by
+``manage.py compact_tombstones``, which moves each user's tombstone horizon
+forward. A cursor from before the horizon can no longer be served and gets
+a 410 response telling the client to resync from scratch.
+"""
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from .models import Task, TaskTombstone, UserTaskState
+from .sharding import get_shard, task_databases
+
+
+class ResyncRequired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = {
+        'detail': 'This sync cursor has expired; discard local data and sync from scratch.',
+        'resync_required': True,
+    }
+    default_code = 'resync_required'
+
+
+@dataclass
+class SyncCursor:
+    """
+    Position of a client in the change stream.
+
+    ``tasks`` and ``tombstones`` are ``(timestamp, id)`` positions in each
+    stream (``tasks`` is ``None`` before the first task was sent).
+    ``version`` is the data version the client has caught up to, or
+    ``None`` while it is still paging through a delta.
+    """
+    version: int = None
+    tasks: tuple = None
+    tombstones: tuple = None
+
+    def encode(self):
+        payload = {
+            'v': self.version,
+            'u': _encode_position(self.tasks),
+            'd': _encode_position(self.tombstones),
+        }
+        data = json.dumps(payload, separators=(',', ':')).encode()
+        return urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+    @classmethod
+    def decode(cls, encoded):
+        try:
+            padding = '=' * (-len(encoded) % 4)
+            data = json.loads(urlsafe_b64decode(encoded + padding))
+            version = data['v']
+            if version is not None and not isinstance(version, int):
+                raise ValueError('Invalid version.')
+            tombstones = _decode_position(data['d'])
+            if tombstones is None:
+                raise ValueError('Missing tombstone position.')
+            return cls(version, _decode_position(data['u']), tombstones)
+        except (TypeError, ValueError, KeyError):
+            raise ValidationError({'since': ['Invalid sync cursor.']})
+
+
+def _encode_position(position):
+    if position is None:
+        return None
+    timestamp, pk = position
+    return [timestamp.isoformat(), pk]
+
+
+def _decode_position(value):
+    if value is None:
+        return None
+    timestamp, pk = value
+    timestamp = parse_datetime(timestamp)
+    if timestamp is None or not isinstance(pk, int):
+        raise ValueError('Invalid position.')
+    return timestamp, pk
+
+
+def _after(queryset, field, position):
+    """
+    Rows after ``position`` in ``(field, id)`` order. The range on ``field``
+    seeks into the index; the exclusion only drops rows sharing its value.
+    """
+    if position is None:
+        return queryset
+    timestamp, pk = position
+    return queryset.filter(**{f'{field}__gte': timestamp}).exclude(
+        **{field: timestamp, 'id__lte': pk}
+    )
+
+
+def _read_stream(queryset, field, position, limit):
+    """
+    Return up to ``limit`` rows after ``position``, whether more follow and
+    the position of the last row returned.
+    """
+    rows = list(_after(queryset, field, position).order_by(field, 'id')[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if rows:
+        position = (getattr(rows[-1], field), rows[-1].id)
+    return rows, has_more, position
+
+
+def get_changes(user, cursor=None, limit=None, now=None):
+    """
+    Return ``(tasks, deleted_ids, next_cursor, has_more)`` for ``user``
+    since ``cursor`` (``None`` starts a full sync).
+
+    At most ``limit`` upserts and ``limit`` deletes are returned; while
+    ``has_more`` is true the client should call again straight away with
+    the new cursor.
+    """
+    now = now or timezone.now()
+    limit = min(limit or settings.TASK_SYNC_MAX_CHANGES, settings.TASK_SYNC_MAX_CHANGES)
+    version, horizon = (
+        UserTaskState.objects.for_user(user.pk)
+        .values_list('version', 'tombstone_horizon')
+        .first()
+    ) or (0, None)
+
+    if cursor is None:
+        # A fresh client has nothing to delete yet.
+        cursor = SyncCursor(tombstones=(now, 0))
+    elif (cursor.version is not None and cursor.version > version) or (
+        horizon is not None and cursor.tombstones[0] < horizon
+    ):
+        raise ResyncRequired()
+    elif cursor.version == version:
+        return [], [], cursor, False
+
+    tasks, more_tasks, task_position = _read_stream(
+        Task.objects.for_user(user.pk), 'updated_at', cursor.tasks, limit,
+    )
+    for task in tasks:
+        # Every row is the user's: no join (the tasks may be on a shard).
+        task.user = user
+    tombstones, more_tombstones, tombstone_position = _read_stream(
+        TaskTombstone.objects.for_user(user.pk), 'deleted_at', cursor.tombstones, limit,
+    )
+
+    # Caught-up streams restart slightly in the past so that writes still
+    # committing are picked up next time (see the module docstring).
+    safe = (now - timedelta(seconds=settings.TASK_SYNC_OVERLAP_SECONDS), 0)
+    if not more_tasks:
+        task_position = min(task_position, safe) if task_position else safe
+    if not more_tombstones:
+        tombstone_position = min(tombstone_position, safe)
+
+    has_more = more_tasks or more_tombstones
+    next_cursor = SyncCursor(
+        version=None if has_more else version,
+        tasks=task_position,
+        tombstones=tombstone_position,
+    )
+    return tasks, [tombstone.task_id for tombstone in tombstones], next_cursor, has_more
+
+
+def current_cursor(user, now=None):
+    """
+    Return a caught-up cursor for ``user`` without reading any tasks, for
+    clients that already hold the current data (e.g. from the task list).
+    """
+    now = now or timezone.now()
+    version = (
+        UserTaskState.objects.for_user(user.pk).values_list('version', flat=True).first()
+    ) or 0
+    safe = (now - timedelta(seconds=settings.TASK_SYNC_OVERLAP_SECONDS), 0)
+    return SyncCursor(version=version, tasks=safe, tombstones=safe)
+
+
+def record_tombstones(change):
+    """
+    Write a tombstone for every task deleted by ``change``.
+    """
+    if not change.deleted:
+        return
+    now = timezone.now()
+    TaskTombstone.objects.using(get_shard(change.user_id)).bulk_create(
+        TaskTombstone(user_id=change.user_id, task_id=task_id, deleted_at=now)
+        for task_id in change.deleted
+    )
+
+
+def compact_tombstones(before, batch_size=10000):
+    """
+    Delete tombstones older than ``before`` and move every user's horizon up
+    to it, so cursors that would need them are told to resync. Returns the
+    number of tombstones deleted.
+    """
+    deleted = 0
+    for alias in task_databases():
+        with transaction.atomic(using=alias):
+            UserTaskState.objects.using(alias).filter(
+                Q(tombstone_horizon__isnull=True) | Q(tombstone_horizon__lt=before)
+            ).update(tombstone_horizon=before)
+
+        expired = TaskTombstone.objects.using(alias).filter(deleted_at__lt=before)
+        while True:
+            ids = list(expired.order_by('deleted_at').values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            deleted += TaskTombstone.objects.using(alias).filter(id__in=ids).delete()[0]
+    return deleted
@@ -1,9 +1,52 @@
-from django.test import TestCase
+import asyncio
+import csv
+import json
+import os
+import re
+import tempfile
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import DatabaseError, OperationalError, connection, connections, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.utils import load_backend
+from django.http import HttpResponse
+from django.test import AsyncClient, AsyncRequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.contrib.auth.models import User
-from rest_framework.test import APITestCase, APIClient
+from rest_framework.test import APITestCase, APITransactionTestCase, APIClient
 from rest_framework import status
 from rest_framework.authtoken.models import Token
-from .models import Task
+from rest_framework.renderers import JSONRenderer
+from authentication.authentication import get_token_cache
+from todo_project.performance import PerformanceMiddleware, normalize_sql
+from todo_project.throttling import LoadShedder, TokenBuckets, get_load_shedder
+from .archiving import archive_batch
+from .async_views import AsyncTaskView
+from .benchmark import percentile
+from .changes import aget_task_version, get_task_stats, get_task_version, record_change
+from .jobs import Worker, beat, claim, enqueue, job_handler, run_job
+from .events import CacheBroker, LocalBroker, event_stream, get_broker
+from .management.commands.check_query_plans import find_plan_problems
+from .models import AccountDeletion, ArchivedTask, Job, Task, TaskTombstone, UserTaskState
+from .purging import purge_deleted_users
+from .renderers import FastJSONRenderer
+from .response_cache import get_response_cache
+from .search import PostgresFullTextBackend, get_search_backend
+from .seeding import seeded_users
+from .serializers import TaskSerializer
+from .sharding import HashRing, get_shard
+from .sync import current_cursor
+from .urls import router
 
 
 class TaskModelTest(TestCase):
@@ -193,3 +236,1824 @@ class TaskAPITest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data['results']), 1)
         self.assertEqual(response.data['results'][0]['title'], 'Task 1')
+
+
+class TaskQueryPlanTest(TestCase):
+    """Test that every task list query shape is served by an index"""
+
+    def test_all_query_shapes_use_an_index(self):
+        """Test check_query_plans passes against the migrated schema"""
+        out = StringIO()
+        call_command('check_query_plans', stdout=out)
+        self.assertIn('All task query shapes use an index.', out.getvalue())
+
+    def test_scan_is_reported(self):
+        """Test that scans and sorts in a plan are detected"""
+        plan = '3 0 0 SCAN tasks_task\n18 0 0 USE TEMP B-TREE FOR ORDER BY'
+        self.assertEqual(len(find_plan_problems(plan, 'sqlite')), 2)
+        plan = '4 0 0 SEARCH tasks_task USING INDEX task_user_created_idx (user_id=?)'
+        self.assertEqual(find_plan_problems(plan, 'sqlite'), [])
+
+
+class TaskCursorPaginationTest(APITestCase):
+    """Test keyset (cursor) pagination of the task list"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='pager', password='pass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        for i in range(25):
+            Task.objects.create(title=f'Task {i % 5}', user=self.user, completed=i % 3 == 0)
+        # Force ties on created_at so the id tie-breaker is exercised
+        Task.objects.filter(user=self.user, id__lte=Task.objects.order_by('id')[12].id).update(
+            created_at=Task.objects.order_by('id').first().created_at
+        )
+
+    def walk(self, url):
+        ids, pages = [], []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            ids.extend(task['id'] for task in response.data['results'])
+            pages.append(response.data)
+            url = response.data['next']
+        return ids, pages
+
+    def test_walk_matches_full_ordering(self):
+        """Test that following next links visits every task once, in order"""
+        orderings = ['-created_at', 'created_at', 'title', '-title', 'completed', '-updated_at', 'completed,-title']
+        for ordering in orderings:
+            ids, pages = self.walk(f'/api/tasks/?pagination=cursor&ordering={ordering}')
+            fields = ordering.split(',')
+            tie = '-id' if fields[-1].startswith('-') else 'id'
+            expected = list(
+                Task.objects.filter(user=self.user)
+                .order_by(*fields, tie)
+                .values_list('id', flat=True)
+            )
+            self.assertEqual(ids, expected, ordering)
+            self.assertEqual(len(pages), 3)
+            self.assertIsNone(pages[0]['previous'])
+
+    def test_previous_link_returns_prior_page(self):
+        """Test that the previous cursor returns the page before"""
+        first = self.client.get('/api/tasks/?pagination=cursor&completed=false').data
+        second = self.client.get(first['next']).data
+        back = self.client.get(second['previous']).data
+        self.assertEqual(
+            [task['id'] for task in back['results']],
+            [task['id'] for task in first['results']],
+        )
+        self.assertIsNone(back['previous'])
+
+    def test_cursor_param_selects_cursor_mode(self):
+        """Test that a cursor link works without the pagination parameter"""
+        first = self.client.get('/api/tasks/?pagination=cursor').data
+        next_url = first['next'].replace('pagination=cursor&', '')
+        response = self.client.get(next_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_invalid_cursor(self):
+        """Test that malformed or mismatched cursors are rejected"""
+        response = self.client.get('/api/tasks/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        next_url = self.client.get('/api/tasks/?pagination=cursor').data['next']
+        response = self.client.get(next_url + '&ordering=title')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_page_mode_is_default(self):
+        """Test that numbered pages remain the default"""
+        response = self.client.get('/api/tasks/')
+        self.assertEqual(response.data['count'], 25)
+
+
+class TaskSearchTest(APITestCase):
+    """Test full-text search on the task list"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='searcher', password='pass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.milk = Task.objects.create(title='Buy milk', description='From the corner store', user=self.user)
+        self.note = Task.objects.create(title='Shopping list', description='milk, eggs, bread', user=self.user)
+        self.other = Task.objects.create(title='Call the plumber', user=self.user)
+
+    def search(self, query, **params):
+        response = self.client.get('/api/tasks/', {'search': query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [task['id'] for task in response.data['results']]
+
+    def test_index_is_installed(self):
+        """Test that the migration installed a search index"""
+        self.assertIsNotNone(get_search_backend())
+
+    def test_multi_term_and_prefix(self):
+        """Test that every term must match, as a word prefix, in any field"""
+        self.assertEqual(self.search('milk store'), [self.milk.id])
+        self.assertEqual(self.search('plumb'), [self.other.id])
+        self.assertEqual(self.search('milk plumber'), [])
+
+    def test_terms_without_words_match_nothing(self):
+        """Test that punctuation-only searches return no tasks on every backend"""
+        self.assertEqual(self.search('!!'), [])
+        backend = PostgresFullTextBackend(connection)
+        self.assertFalse(backend.search(Task.objects.all(), ['!!']).exists())
+        self.assertEqual(backend.count(['!!', '--'], 10), 0)
+
+    def test_results_ranked_by_relevance(self):
+        """Test that title matches outrank description matches"""
+        self.assertEqual(self.search('milk'), [self.milk.id, self.note.id])
+        self.assertEqual(self.search('milk', ordering='title'), [self.milk.id, self.note.id])
+        self.assertEqual(self.search('milk', ordering='-title'), [self.note.id, self.milk.id])
+
+    def test_ranked_results_with_cursor_pagination(self):
+        """Test that relevance ordering works with keyset pagination"""
+        response = self.client.get('/api/tasks/', {'search': 'milk', 'pagination': 'cursor'})
+        self.assertEqual([task['id'] for task in response.data['results']], [self.milk.id, self.note.id])
+
+    def test_index_follows_writes(self):
+        """Test that updates, queryset updates and deletes reach the index"""
+        self.milk.title = 'Buy oat drink'
+        self.milk.save()
+        self.assertEqual(self.search('oat'), [self.milk.id])
+        self.assertEqual(self.search('milk'), [self.note.id])
+
+        Task.objects.filter(pk=self.other.pk).update(description='fix the sink')
+        self.assertEqual(self.search('sink'), [self.other.id])
+
+        self.note.delete()
+        self.assertEqual(self.search('milk'), [])
+
+    @override_settings(TASK_SEARCH_BACKEND='none')
+    def test_fallback_to_icontains(self):
+        """Test that search falls back to substring matching without an index"""
+        self.assertIsNone(get_search_backend())
+        self.assertEqual(self.search('ilk'), [self.note.id, self.milk.id])
+
+
+class TaskBulkAPITest(APITestCase):
+    """Test bulk create / update / delete endpoints"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='bulk', password='pass123')
+        self.other = User.objects.create_user(username='other', password='pass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.tasks = [Task.objects.create(title=f'Task {i}', user=self.user) for i in range(3)]
+        self.foreign = Task.objects.create(title='Not mine', user=self.other)
+
+    def test_bulk_create(self):
+        """Test creating many tasks in one request with per-item errors"""
+        data = [{'title': 'A'}, {'title': '   '}, {'title': 'B', 'completed': True}]
+        response = self.client.post('/api/tasks/bulk/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        results = response.data['results']
+        self.assertEqual([r['status'] for r in results], ['created', 'invalid', 'created'])
+        self.assertIn('title', results[1]['errors'])
+        created = Task.objects.get(id=results[2]['id'])
+        self.assertEqual((created.title, created.completed, created.user), ('B', True, self.user))
+
+    def test_bulk_create_query_count_is_constant(self):
+        """Test that a fully valid batch returns 201 with one INSERT"""
+        self.client.post('/api/tasks/bulk/', [{'title': 'A'}], format='json')
+        with CaptureQueriesContext(connection) as small:
+            self.client.post('/api/tasks/bulk/', [{'title': 'A'}], format='json')
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.post('/api/tasks/bulk/', [{'title': 'A'}] * 50, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(large), len(small))
+
+    def test_bulk_create_limit(self):
+        """Test that oversized batches are rejected"""
+        with self.settings(TASK_BULK_MAX_ITEMS=2):
+            response = self.client.post('/api/tasks/bulk/', [{'title': 'A'}] * 3, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_update(self):
+        """Test patching several tasks by id"""
+        before = self.tasks[0].updated_at
+        data = [
+            {'id': self.tasks[0].id, 'completed': True},
+            {'id': self.tasks[1].id, 'title': 'Renamed'},
+            {'id': self.foreign.id, 'completed': True},
+            {'id': self.tasks[2].id, 'title': ''},
+        ]
+        response = self.client.patch('/api/tasks/bulk/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(
+            [r['status'] for r in response.data['results']],
+            ['updated', 'updated', 'not_found', 'invalid'],
+        )
+        self.tasks[0].refresh_from_db()
+        self.tasks[1].refresh_from_db()
+        self.foreign.refresh_from_db()
+        self.assertTrue(self.tasks[0].completed)
+        self.assertGreater(self.tasks[0].updated_at, before)
+        self.assertEqual(self.tasks[1].title, 'Renamed')
+        self.assertFalse(self.tasks[1].completed)
+        self.assertFalse(self.foreign.completed)
+
+    def test_bulk_destroy(self):
+        """Test deleting several tasks by id without touching other users' tasks"""
+        ids = [self.tasks[0].id, self.tasks[1].id, self.foreign.id]
+        response = self.client.delete('/api/tasks/bulk/', {'ids': ids}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(
+            [r['status'] for r in response.data['results']],
+            ['deleted', 'deleted', 'not_found'],
+        )
+        self.assertEqual(Task.objects.filter(user=self.user).count(), 1)
+        self.assertTrue(Task.objects.filter(id=self.foreign.id).exists())
+
+    def test_bulk_update_filtered(self):
+        """Test applying a patch to every task matching the filters"""
+        self.tasks[0].completed = True
+        self.tasks[0].save()
+        response = self.client.patch(
+            '/api/tasks/bulk/filter/?completed=false', {'completed': True}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(Task.objects.filter(user=self.user, completed=True).count(), 3)
+        self.foreign.refresh_from_db()
+        self.assertFalse(self.foreign.completed)
+
+        response = self.client.patch('/api/tasks/bulk/filter/?search=Task 1', {'title': 'Found'}, format='json')
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual(Task.objects.get(id=self.tasks[1].id).title, 'Found')
+
+    def test_bulk_update_filtered_counts_flipped_tasks_once(self):
+        """Test that flipping tasks without a completed filter counts each task once"""
+        self.tasks[0].completed = True
+        self.tasks[0].save()
+        response = self.client.patch('/api/tasks/bulk/filter/', {'completed': True}, format='json')
+        self.assertEqual(response.data['updated'], 3)
+        response = self.client.patch('/api/tasks/bulk/filter/?search=Task 1', {'completed': False}, format='json')
+        self.assertEqual(response.data['updated'], 1)
+        stats = self.client.get('/api/tasks/stats/').data
+        self.assertEqual((stats['total'], stats['completed']), (3, 2))
+
+    def test_bulk_update_filtered_requires_fields(self):
+        """Test that an empty patch is rejected"""
+        response = self.client.patch('/api/tasks/bulk/filter/', {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TaskETagTest(APITestCase):
+    """Test ETags and conditional requests on the task API"""
+
+    def setUp(self):
+        get_token_cache().clear()
+        self.user = User.objects.create_user(username='etag', password='pass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.task = Task.objects.create(title='Cached', user=self.user)
+
+    def test_list_not_modified_skips_list_query(self):
+        """Test that a matching If-None-Match returns 304 after one query"""
+        response = self.client.get('/api/tasks/')
+        etag = response['ETag']
+        self.assertIn('no-cache', response['Cache-Control'])
+        with self.assertNumQueries(1):  # the version lookup; the token is cached
+            response = self.client.get('/api/tasks/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_writes_change_the_etag(self):
+        """Test that single and bulk writes invalidate the list ETag"""
+        etag = self.client.get('/api/tasks/')['ETag']
+        self.client.patch(f'/api/tasks/{self.task.id}/', {'completed': True})
+        response = self.client.get('/api/tasks/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        etag = response['ETag']
+        version = get_task_version(self.user.id)
+        self.client.post('/api/tasks/bulk/', [{'title': 'A'}, {'title': 'B'}], format='json')
+        self.assertEqual(get_task_version(self.user.id), version + 1)
+        response = self.client.get('/api/tasks/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_username_change_changes_the_etag(self):
+        """Test that renaming the owner invalidates the ETags of their tasks"""
+        etag = self.client.get(f'/api/tasks/{self.task.id}/')['ETag']
+        self.client.patch('/api/auth/profile/', {'first_name': 'Same'}, format='json')
+        response = self.client.get(f'/api/tasks/{self.task.id}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.patch('/api/auth/profile/', {'username': 'renamed'}, format='json')
+        response = self.client.get(f'/api/tasks/{self.task.id}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['user'], 'renamed')
+
+    def test_etag_depends_on_query_and_user(self):
+        """Test that different representations get different ETags"""
+        etag = self.client.get('/api/tasks/')['ETag']
+        self.assertNotEqual(etag, self.client.get('/api/tasks/?completed=true')['ETag'])
+
+        other = User.objects.create_user(username='other', password='pass123')
+        Task.objects.create(title='Other', user=other)
+        self.assertEqual(get_task_version(other.id), get_task_version(self.user.id))
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=other).key)
+        response = self.client.get('/api/tasks/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_detail_if_none_match(self):
+        """Test conditional GET on a single task"""
+        etag = self.client.get(f'/api/tasks/{self.task.id}/')['ETag']
+        response = self.client.get(f'/api/tasks/{self.task.id}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_if_match_on_writes(self):
+        """Test that stale If-Match headers are rejected with 412"""
+        etag = self.client.get(f'/api/tasks/{self.task.id}/')['ETag']
+        response = self.client.patch(f'/api/tasks/{self.task.id}/', {'title': 'First'}, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        fresh = response['ETag']
+
+        response = self.client.patch(f'/api/tasks/{self.task.id}/', {'title': 'Stale'}, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        response = self.client.delete(f'/api/tasks/{self.task.id}/', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.title, 'First')
+
+        response = self.client.delete(f'/api/tasks/{self.task.id}/', HTTP_IF_MATCH=fresh)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_user_deletion_with_tasks(self):
+        """Test that deleting a user cascades cleanly through the state row"""
+        self.user.delete()
+        self.assertFalse(Task.objects.filter(id=self.task.id).exists())
+
+
+class TaskStatsTest(APITestCase):
+    """Test the denormalized per-user task counters"""
+
+    def setUp(self):
+        get_token_cache().clear()
+        self.user = User.objects.create_user(username='stats', password='pass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def assertStatsMatchRows(self):
+        tasks = Task.objects.filter(user=self.user)
+        completed = tasks.filter(completed=True).count()
+        self.assertEqual(self.client.get('/api/tasks/stats/').data, {
+            'total': tasks.count(),
+            'active': tasks.count() - completed,
+            'completed': completed,
+        })
+
+    def test_counters_follow_single_writes(self):
+        """Test counters through create, toggle and delete"""
+        self.assertStatsMatchRows()
+        first = self.client.post('/api/tasks/', {'title': 'One'}).data['id']
+        self.client.post('/api/tasks/', {'title': 'Two', 'completed': True})
+        self.assertStatsMatchRows()
+        self.client.patch(f'/api/tasks/{first}/', {'completed': True})
+        self.client.patch(f'/api/tasks/{first}/', {'title': 'Still done'})
+        self.assertStatsMatchRows()
+        self.client.delete(f'/api/tasks/{first}/')
+        self.assertStatsMatchRows()
+
+        task = Task.objects.only('id', 'title', 'user').get(user=self.user)
+        task.completed = False
+        task.save()
+        self.assertStatsMatchRows()
+
+    def test_counters_follow_concurrent_toggles(self):
+        """Test that two stale copies toggling one task count it once"""
+        task = Task.objects.create(title='Shared', user=self.user)
+        first, second = Task.objects.get(pk=task.pk), Task.objects.get(pk=task.pk)
+        first.completed = second.completed = True
+        first.save()
+        second.save()
+        self.assertStatsMatchRows()
+
+    def test_counters_follow_bulk_writes(self):
+        """Test counters through every bulk endpoint"""
+        data = [{'title': f'T{i}', 'completed': i % 2 == 0} for i in range(6)]
+        ids = [r['id'] for r in self.client.post('/api/tasks/bulk/', data, format='json').data['results']]
+        self.assertStatsMatchRows()
+        self.client.patch(
+            '/api/tasks/bulk/', [{'id': ids[0], 'completed': False}, {'id': ids[1], 'completed': True}], format='json',
+        )
+        self.assertStatsMatchRows()
+        self.client.patch('/api/tasks/bulk/filter/?search=T1', {'completed': False}, format='json')
+        self.assertStatsMatchRows()
+        self.client.patch('/api/tasks/bulk/filter/', {'completed': True}, format='json')
+        self.assertStatsMatchRows()
+        self.client.delete('/api/tasks/bulk/', {'ids': ids[:3]}, format='json')
+        self.assertStatsMatchRows()
+
+    def test_stats_never_counts_tasks(self):
+        """Test that reading stats is a single primary-key lookup"""
+        Task.objects.create(title='One', user=self.user)
+        self.client.get('/api/tasks/stats/')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/tasks/stats/')
+        self.assertEqual(response.data['total'], 1)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('COUNT(', queries[0]['sql'].upper())
+
+    def test_rebuild_command_repairs_counters(self):
+        """Test that rebuild_task_stats recounts drifted counters"""
+        Task.objects.create(title='One', user=self.user, completed=True)
+        UserTaskState.objects.filter(user=self.user).update(total_count=42, completed_count=7)
+        out = StringIO()
+        call_command('rebuild_task_stats', '--user', str(self.user.pk), stdout=out)
+        self.assertIn('repaired 1', out.getvalue())
+        self.assertStatsMatchRows()
+
+
+@override_settings(TASK_SYNC_OVERLAP_SECONDS=0)
+class TaskSyncTest(APITestCase):
+    """Test the /api/tasks/changes/ delta sync endpoint"""
+
+    def setUp(self):
+        get_token_cache().clear()
+        self.user = User.objects.create_user(username='sync', password='pass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def sync(self, cursor=None, **params):
+        if cursor:
+            params['since'] = cursor
+        response = self.client.get('/api/tasks/changes/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_full_then_delta_sync(self):
+        """Test that a delta returns only upserts and tombstones after the cursor"""
+        first = Task.objects.create(title='First', user=self.user)
+        second = Task.objects.create(title='Second', user=self.user)
+        Task.objects.create(title='Not mine', user=User.objects.create_user(username='other'))
+        data = self.sync()
+        self.assertEqual([t['title'] for t in data['changes']], ['First', 'Second'])
+        self.assertEqual(data['deleted'], [])
+        self.assertFalse(data['has_more'])
+
+        third = Task.objects.create(title='Third', user=self.user)
+        self.client.patch(f'/api/tasks/{first.id}/', {'completed': True})
+        self.client.delete(f'/api/tasks/{second.id}/')
+        data = self.sync(data['cursor'])
+        self.assertEqual([t['id'] for t in data['changes']], [third.id, first.id])
+        self.assertTrue(data['changes'][1]['completed'])
+        self.assertEqual(data['deleted'], [second.id])
+
+        self.client.delete('/api/tasks/bulk/', {'ids': [third.id]}, format='json')
+        data = self.sync(data['cursor'])
+        self.assertEqual((data['changes'], data['deleted']), ([], [third.id]))
+
+    def test_empty_delta_is_one_lookup(self):
+        """Test that polling without changes only reads the user's version"""
+        Task.objects.create(title='One', user=self.user)
+        cursor = self.sync()['cursor']
+        with CaptureQueriesContext(connection) as queries:
+            data = self.sync(cursor)
+        self.assertEqual((data['changes'], data['deleted']), ([], []))
+        self.assertEqual(data['cursor'], cursor)
+        self.assertEqual(len(queries), 1)
+
+    def test_large_delta_is_paged(self):
+        """Test that ?limit= pages through a delta with has_more"""
+        created = [Task.objects.create(title=f'T{i}', user=self.user).id for i in range(5)]
+        seen, cursor, has_more = [], None, True
+        while has_more:
+            data = self.sync(cursor, limit=2)
+            self.assertLessEqual(len(data['changes']), 2)
+            seen += [t['id'] for t in data['changes']]
+            cursor, has_more = data['cursor'], data['has_more']
+        self.assertEqual(seen, created)
+
+    def test_compacted_tombstones_require_resync(self):
+        """Test that cursors older than the tombstone horizon get a 410"""
+        task = Task.objects.create(title='Gone', user=self.user)
+        cursor = self.sync()['cursor']
+        task.delete()
+        out = StringIO()
+        call_command('compact_tombstones', '--days', '0', stdout=out)
+        self.assertIn('Deleted 1 tombstone(s)', out.getvalue())
+
+        response = self.client.get('/api/tasks/changes/', {'since': cursor})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+        self.assertTrue(response.data['resync_required'])
+        # A fresh full sync works again.
+        self.assertEqual(self.sync()['changes'], [])
+
+    def test_invalid_cursor(self):
+        """Test that a malformed cursor is rejected"""
+        response = self.client.get('/api/tasks/changes/', {'since': 'garbage'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TaskArchiveTest(APITestCase):
+    """Test archiving old completed tasks and listing them"""
+
+    def setUp(self):
+        cache.clear()
+        get_token_cache().clear()
+        self.user = User.objects.create_user(username='archivist', password='pass123')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user).key}')
+        old = timezone.now() - timedelta(days=100)
+        self.done = [Task.objects.create(title=f'Done {i}', completed=True, user=self.user) for i in range(3)]
+        self.recent = Task.objects.create(title='Done recently', completed=True, user=self.user)
+        self.open = Task.objects.create(title='Still open', user=self.user)
+        Task.objects.filter(pk__in=[task.pk for task in self.done] + [self.open.pk]).update(updated_at=old)
+
+    def archive(self, *args):
+        out = StringIO()
+        call_command('archive_tasks', *args, stdout=out)
+        return out.getvalue()
+
+    def test_moves_old_completed_tasks(self):
+        cursor = self.client.get('/api/tasks/changes/').data['cursor']
+        version = get_task_version(self.user.pk)
+        self.assertIn('Archived 3 task(s)', self.archive('--batch-size', '2'))
+
+        self.assertEqual(set(Task.objects.values_list('pk', flat=True)), {self.recent.pk, self.open.pk})
+        archived = ArchivedTask.objects.order_by('pk')
+        self.assertEqual([task.pk for task in archived], [task.pk for task in self.done])
+        self.assertEqual(archived[0].created_at, self.done[0].created_at)
+        self.assertEqual(get_task_stats(self.user.pk), {'total': 2, 'active': 1, 'completed': 1})
+        self.assertGreater(get_task_version(self.user.pk), version)
+        data = self.client.get('/api/tasks/changes/', {'since': cursor}).data
+        self.assertEqual(sorted(data['deleted']), [task.pk for task in self.done])
+        # Nothing is left to move.
+        self.assertIn('Archived 0 task(s)', self.archive())
+
+    def test_batches_resume_after_the_last_id(self):
+        before = timezone.now() - timedelta(days=90)
+        ids = archive_batch('default', before, batch_size=2)
+        self.assertEqual(ids, [task.pk for task in self.done[:2]])
+        self.assertEqual(archive_batch('default', before, after_id=ids[-1]), [self.done[2].pk])
+        self.assertEqual(archive_batch('default', before), [])
+
+    def test_list_includes_archived_on_request(self):
+        self.archive()
+        self.assertEqual(self.client.get('/api/tasks/').data['count'], 2)
+
+        response = self.client.get('/api/tasks/', {'include_archived': 'true', 'ordering': 'title'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [task['title'] for task in response.data['results']],
+            ['Done 0', 'Done 1', 'Done 2', 'Done recently', 'Still open'],
+        )
+        self.assertEqual(response.data['results'][0]['user'], self.user.username)
+        self.assertEqual(response.data['results'][0]['created_at'], TaskSerializer(self.done[0]).data['created_at'])
+
+        # Filters apply to both tables; cursor mode falls back to pages.
+        response = self.client.get('/api/tasks/', {'include_archived': 'true', 'search': 'done 1'})
+        self.assertEqual([task['id'] for task in response.data['results']], [self.done[1].pk])
+        response = self.client.get('/api/tasks/', {'include_archived': 'true', 'search': 'done'})
+        self.assertEqual(response.data['count'], 4)
+        response = self.client.get('/api/tasks/', {'include_archived': 'true', 'completed': 'false'})
+        self.assertEqual(response.data['count'], 1)
+        response = self.client.get('/api/tasks/', {'include_archived': '1', 'pagination': 'cursor'})
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(response.data['results'][0]['id'], self.open.pk)
+
+
+class AccountDeletionTest(APITestCase):
+    """Test deleting accounts with their tasks in the background"""
+
+    def setUp(self):
+        get_token_cache().clear()
+        self.user = User.objects.create_user(username='leaving', password='pass123')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user).key}')
+        Task.objects.bulk_create([Task(title=f'Task {i}', user=self.user) for i in range(5)])
+        ArchivedTask.objects.create(
+            id=10**9, title='Archived', user=self.user, created_at=timezone.now(), updated_at=timezone.now(),
+        )
+        self.other = Task.objects.create(title='Not mine', user=User.objects.create_user(username='staying'))
+
+    def test_request_deactivates_at_once(self):
+        response = self.client.delete('/api/auth/profile/')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertFalse(Token.objects.filter(user=self.user).exists())
+        self.assertEqual(self.client.get('/api/tasks/').status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(AccountDeletion.objects.get().user_id, self.user.pk)
+        # Nothing is purged in the request.
+        self.assertEqual(Task.objects.filter(user=self.user).count(), 5)
+
+    def test_purge_in_batches(self):
+        self.client.delete('/api/auth/profile/')
+        out = StringIO()
+        call_command('purge_deleted_users', '--batch-size', '2', stdout=out)
+        self.assertIn('Deleted 1 user(s)', out.getvalue())
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(Task.objects.filter(user_id=self.user.pk).exists())
+        self.assertFalse(ArchivedTask.objects.exists())
+        self.assertFalse(UserTaskState.objects.filter(user_id=self.user.pk).exists())
+        deletion = AccountDeletion.objects.get()
+        self.assertEqual(deletion.tasks_deleted, 6)
+        self.assertIsNotNone(deletion.finished_at)
+        self.assertTrue(Task.objects.filter(pk=self.other.pk).exists())
+        self.assertEqual(purge_deleted_users(), 0)
+
+    def test_interrupted_purge_resumes(self):
+        self.client.delete('/api/auth/profile/')
+        with mock.patch('tasks.purging.time.sleep', side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                purge_deleted_users(batch_size=2, pause=1)
+        self.assertEqual(Task.objects.filter(user_id=self.user.pk).count(), 3)
+        self.assertEqual(AccountDeletion.objects.get().tasks_deleted, 2)
+        self.assertTrue(User.objects.filter(pk=self.user.pk).exists())
+
+        self.assertEqual(purge_deleted_users(batch_size=2), 1)
+        self.assertEqual(AccountDeletion.objects.get().tasks_deleted, 6)
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+
+    def test_counter_commits_with_its_batch(self):
+        """Test that a batch whose counter update fails is not deleted either"""
+        self.client.delete('/api/auth/profile/')
+        with mock.patch('tasks.purging.F', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                purge_deleted_users(batch_size=2)
+        self.assertEqual(Task.objects.filter(user_id=self.user.pk).count(), 5)
+        self.assertEqual(AccountDeletion.objects.get().tasks_deleted, 0)
+
+    def test_reactivation_cancels(self):
+        self.client.delete('/api/auth/profile/')
+        User.objects.filter(pk=self.user.pk).update(is_active=True)
+        self.assertEqual(purge_deleted_users(), 0)
+        self.assertFalse(AccountDeletion.objects.exists())
+        self.assertEqual(Task.objects.filter(user=self.user).count(), 5)
+
+
+class TaskReadPathTest(APITestCase):
+    """Test that list/retrieve from values() rows match TaskSerializer"""
+
+    def setUp(self):
+        get_token_cache().clear()
+        self.user = User.objects.create_user(username='reader', password='pass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        for i in range(3):
+            Task.objects.create(title=f'Milk {i}', description='Ünïcode', completed=i == 1, user=self.user)
+
+    def expected(self, queryset):
+        return json.loads(JSONRenderer().render(TaskSerializer(queryset, many=True).data))
+
+    def test_list_and_retrieve_match_serializer(self):
+        """Test that the JSON is identical to TaskSerializer's"""
+        tasks = Task.objects.filter(user=self.user).order_by('-created_at')
+        response = self.client.get('/api/tasks/')
+        self.assertEqual(json.loads(response.content)['results'], self.expected(tasks))
+
+        response = self.client.get('/api/tasks/', {'pagination': 'cursor', 'search': 'milk'})
+        self.assertEqual(len(json.loads(response.content)['results']), 3)
+
+        task = tasks.first()
+        response = self.client.get(f'/api/tasks/{task.id}/')
+        self.assertEqual(json.loads(response.content), self.expected([task])[0])
+        other = Task.objects.create(title='Other', user=User.objects.create_user(username='x'))
+        self.assertEqual(self.client.get(f'/api/tasks/{other.id}/').status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(TASK_RESPONSE_CACHE={'TIMEOUT': 0, 'CACHE_ALIAS': 'default'})
+    def test_list_query_count_is_constant(self):
+        """Test that listing does not query per row"""
+        def count_queries():
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get('/api/tasks/')
+            return len(queries)
+
+        self.client.get('/api/tasks/')  # warm the token cache
+        few = count_queries()
+        for i in range(20):
+            Task.objects.create(title=f'More {i}', user=self.user)
+        self.assertEqual(count_queries(), few)
+
+    def test_fast_renderer_matches_json_renderer(self):
+        """Test FastJSONRenderer output against JSONRenderer"""
+        data = {'a': [1, 2.5, None, True], 'b': 'Ünïcode', 'c': Decimal('1.50'), 1: 'x'}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+
+class AsyncTaskViewTest(APITestCase):
+    """Test that the native async views answer like TaskViewSet"""
+
+    def setUp(self):
+        get_token_cache().clear()
+        self.user = User.objects.create_user(username='async', password='pass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.tasks = [Task.objects.create(title=f'Async {i}', completed=i == 1, user=self.user) for i in range(3)]
+        sync_views = {pattern.name: pattern.callback for pattern in router.urls}
+        self.list_view = AsyncTaskView.as_view(sync_view=sync_views['task-list'])
+        self.detail_view = AsyncTaskView.as_view(sync_view=sync_views['task-detail'], detail=True)
+        self.factory = AsyncRequestFactory()
+        self.headers = {'Authorization': 'Token ' + self.token.key}
+
+    def get(self, path, query=None, **headers):
+        return self.factory.get(path, query, headers={**self.headers, **headers})
+
+    def json_request(self, method, path, data):
+        return getattr(self.factory, method)(
+            path, json.dumps(data), content_type='application/json', headers=self.headers
+        )
+
+    async def test_reads_match_sync_views(self):
+        """Test that list and retrieve return the sync bodies and ETags"""
+        for path, query in [('/api/tasks/', {}), ('/api/tasks/', {'completed': 'true', 'ordering': 'title'})]:
+            expected = await self.async_get(path, query)
+            response = await self.list_view(self.get(path, query))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(json.loads(response.content), json.loads(expected.content))
+            self.assertEqual(response['ETag'], expected['ETag'])
+
+        task = self.tasks[0]
+        path = f'/api/tasks/{task.id}/'
+        expected = await self.async_get(path)
+        response = await self.detail_view(self.get(path), pk=str(task.id))
+        self.assertEqual(json.loads(response.content), json.loads(expected.content))
+
+        etag = (await self.list_view(self.get('/api/tasks/')))['ETag']
+        response = await self.list_view(self.get('/api/tasks/', **{'If-None-Match': etag}))
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def async_get(self, path, query=None):
+        return await sync_to_async(self.client.get)(path, query or {})
+
+    async def test_reads_use_response_cache(self):
+        """Test that repeated list and retrieve requests are answered from the response cache"""
+        await sync_to_async(cache.clear)()
+        task = self.tasks[0]
+        for view, path, kwargs in [
+            (self.list_view, '/api/tasks/', {}),
+            (self.detail_view, f'/api/tasks/{task.id}/', {'pk': str(task.id)}),
+        ]:
+            first = await view(self.get(path), **kwargs)
+            self.assertEqual(first['X-Cache'], 'miss')
+            response = await view(self.get(path), **kwargs)
+            self.assertEqual(response['X-Cache'], 'hit')
+            self.assertEqual(response.content, first.content)
+            self.assertEqual(response['ETag'], first['ETag'])
+
+        await self.list_view(self.json_request('post', '/api/tasks/', {'title': 'New'}))
+        self.assertEqual((await self.list_view(self.get('/api/tasks/')))['X-Cache'], 'miss')
+
+    async def test_writes_record_changes(self):
+        """Test create, update and delete, including counters and versions"""
+        version = await aget_task_version(self.user.pk)
+        response = await self.list_view(self.json_request('post', '/api/tasks/', {'title': 'New'}))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        created = json.loads(response.content)
+        self.assertEqual(created['title'], 'New')
+
+        path = f"/api/tasks/{created['id']}/"
+        response = await self.detail_view(self.json_request('patch', path, {'completed': True}), pk=str(created['id']))
+        self.assertTrue(json.loads(response.content)['completed'])
+        response = await self.detail_view(self.json_request('put', path, {'title': ''}), pk=str(created['id']))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('title', json.loads(response.content))
+
+        response = await self.detail_view(self.factory.delete(path, headers=self.headers), pk=str(created['id']))
+        self.assertEqual(json.loads(response.content), {'message': 'Task deleted successfully'})
+        self.assertGreater(await aget_task_version(self.user.pk), version)
+        stats = await sync_to_async(get_task_stats)(self.user.pk)
+        self.assertEqual(stats['total'], 3)
+        self.assertEqual(stats['completed'], 1)
+
+    async def test_errors(self):
+        """Test 401, 404 and parse errors"""
+        request = AsyncRequestFactory().get('/api/tasks/', headers={'Authorization': 'Token nope'})
+        response = await self.list_view(request)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response['WWW-Authenticate'], 'Token')
+
+        other = await Task.objects.acreate(title='Other', user=await User.objects.acreate(username='other'))
+        response = await self.detail_view(self.get(f'/api/tasks/{other.id}/'), pk=str(other.id))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = await self.detail_view(self.get('/api/tasks/abc/'), pk='abc')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        request = self.factory.post('/api/tasks/', '{"title":', content_type='application/json', headers=self.headers)
+        response = await self.list_view(request)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    async def test_falls_back_to_sync_view(self):
+        """Test that requests the async view does not handle reach TaskViewSet"""
+        view = AsyncTaskView(sync_view=None)
+        self.assertFalse(view.handles(self.get('/api/tasks/', {'pagination': 'cursor'})))
+        self.assertFalse(view.handles(self.get('/api/tasks/', Accept='text/html')))
+        self.assertFalse(view.handles(self.factory.post('/api/tasks/', {'title': 'Form'}, headers=self.headers)))
+        self.assertFalse(view.handles(AsyncRequestFactory().get('/api/tasks/')))
+        self.assertTrue(view.handles(self.get('/api/tasks/')))
+
+        response = await self.list_view(self.get('/api/tasks/', {'pagination': 'cursor'}))
+        response.render()
+        self.assertIn('next', json.loads(response.content))
+        self.assertNotIn('count', json.loads(response.content))
+
+
+class TaskExportTest(APITestCase):
+    """Test the streaming NDJSON/CSV export"""
+
+    def setUp(self):
+        get_token_cache().clear()
+        self.user = User.objects.create_user(username='exporter', password='pass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        for i in range(5):
+            Task.objects.create(
+                title=f'Task {i}, "quoted"', description='Ünïcode\nline', completed=i % 2 == 0, user=self.user,
+            )
+        Task.objects.create(title='Not mine', user=User.objects.create_user(username='other'))
+
+    def export(self, **params):
+        response = self.client.get('/api/tasks/export/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    @override_settings(TASK_EXPORT_CHUNK_SIZE=2)
+    def test_ndjson_matches_list(self):
+        """Test that NDJSON lines equal the list representation, in order"""
+        response, body = self.export()
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        rows = [json.loads(line) for line in body.splitlines()]
+        expected = self.client.get('/api/tasks/', {'page_size': 100}).json()['results']
+        self.assertEqual(rows, expected)
+
+        _, body = self.export(completed='true', ordering='title')
+        self.assertEqual([json.loads(line)['title'] for line in body.splitlines()],
+                         ['Task 0, "quoted"', 'Task 2, "quoted"', 'Task 4, "quoted"'])
+
+    def test_csv(self):
+        """Test the CSV header, quoting and the filters"""
+        response, body = self.export(format='csv', search='task')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="tasks.csv"')
+        rows = list(csv.DictReader(StringIO(body)))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(list(rows[0]), ['id', 'title', 'description', 'completed', 'user', 'created_at', 'updated_at'])
+        self.assertEqual({row['description'] for row in rows}, {'Ünïcode\nline'})
+        self.assertEqual(rows[0]['user'], 'exporter')
+
+    def test_requires_authentication_and_known_format(self):
+        """Test 401 without a token and 404 for an unknown ?format="""
+        response = self.client.get('/api/tasks/export/', {'format': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get('/api/tasks/export/', HTTP_ACCEPT='text/html')
+        self.assertEqual(response.status_code, status.HTTP_406_NOT_ACCEPTABLE)
+        self.client.credentials()
+        self.assertEqual(self.client.get('/api/tasks/export/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TaskImportTest(APITestCase):
+    """Test the streaming NDJSON/CSV import"""
+
+    def setUp(self):
+        get_token_cache().clear()
+        self.user = User.objects.create_user(username='importer', password='pass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def upload(self, body, content_type='application/x-ndjson', **params):
+        path = '/api/tasks/import/'
+        if params:
+            path += '?' + '&'.join(f'{key}={value}' for key, value in params.items())
+        return self.client.generic('POST', path, body, content_type=content_type)
+
+    @override_settings(TASK_IMPORT_BATCH_SIZE=2)
+    def test_ndjson_import_in_batches(self):
+        """Test that valid NDJSON rows are created in batches with counters"""
+        body = '\n'.join(json.dumps({'title': f'Imported {i}', 'completed': i == 0}) for i in range(5))
+        response = self.upload(body + '\n\n')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 5)
+        self.assertEqual(response.data['batches'], 3)
+        self.assertEqual(get_task_stats(self.user.pk), {'total': 5, 'active': 4, 'completed': 1})
+        self.assertEqual(self.client.get('/api/tasks/', {'search': 'imported'}).data['count'], 5)
+
+    def test_commit_modes(self):
+        """Test all-or-nothing by default and skipping bad rows per batch"""
+        body = '{"title": "Good"}\n{"title": "  "}\nnot json\n[1]\n{"title": "Also good"}\n'
+        response = self.upload(body)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(response.data['committed'])
+        self.assertEqual([error['line'] for error in response.data['errors']], [2, 3, 4])
+        self.assertIn('title', response.data['errors'][0]['errors'])
+        self.assertFalse(Task.objects.exists())
+
+        response = self.upload(body, commit='batch')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual((response.data['created'], response.data['invalid']), (2, 3))
+        self.assertEqual(get_task_stats(self.user.pk)['total'], 2)
+
+    def test_csv_import_and_errors(self):
+        """Test CSV rows with quoting, empty cells and an unsupported type"""
+        body = 'title,description,completed\r\n"Milk, 2L","multi\nline",true\nBread,,\n'
+        response = self.upload(body.encode(), content_type='text/csv; charset=utf-8')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        milk = Task.objects.get(title='Milk, 2L')
+        self.assertEqual((milk.description, milk.completed), ('multi\nline', True))
+        self.assertEqual(Task.objects.get(title='Bread').description, '')
+
+        response = self.upload('x', content_type='text/plain')
+        self.assertEqual(response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        self.assertEqual(self.upload('', commit='maybe').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_unreadable_csv_stops_import(self):
+        """Test that a CSV read error fails the import at the line it happened"""
+        body = b'title\nFirst\nBad \xff byte\nNever read\n'
+        response = self.upload(body, content_type='text/csv')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual((response.data['committed'], response.data['stopped_at']), (False, 3))
+        self.assertFalse(Task.objects.exists())
+
+        response = self.upload(body, content_type='text/csv', commit='batch')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual((response.data['rows'], response.data['created'], response.data['stopped_at']), (2, 1, 3))
+        self.assertIn('not read', response.data['errors'][0]['errors']['non_field_errors'][0])
+        self.assertEqual(list(Task.objects.values_list('title', flat=True)), ['First'])
+
+    def test_import_command(self):
+        """Test import_tasks from a file"""
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write('title,completed\nOne,false\nTwo,1\n')
+        self.addCleanup(os.unlink, f.name)
+        out = StringIO()
+        call_command('import_tasks', f.name, '--user', 'importer', '--commit', 'batch', stdout=out)
+        self.assertIn('Imported 2 task(s)', out.getvalue())
+        self.assertEqual(get_task_stats(self.user.pk), {'total': 2, 'active': 1, 'completed': 1})
+
+
+@job_handler('tests.flaky', max_attempts=2)
+def flaky_job(job, fail=True):
+    if fail:
+        raise RuntimeError('boom')
+    return {'attempts': job.attempts}
+
+
+@job_handler('tests.once', max_attempts=1)
+def once_job(job):
+    return None
+
+
+class JobQueueTest(APITestCase):
+    """Test the database job queue and the job API"""
+
+    def setUp(self):
+        get_token_cache().clear()
+        self.user = User.objects.create_user(username='jobs', password='pass123')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user).key}')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        media = override_settings(MEDIA_ROOT=directory.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.media_root = directory.name
+
+    def run_jobs(self):
+        while (job := claim('test')) is not None:
+            run_job(job)
+
+    def test_priority_and_claims(self):
+        low = enqueue('tests.flaky', {'fail': False}, priority=-1)
+        high = enqueue('tests.flaky', {'fail': False}, priority=5)
+        later = enqueue('tests.flaky', {'fail': False}, run_at=timezone.now() + timedelta(hours=1))
+        self.assertEqual(claim('a').pk, high.pk)
+        self.assertEqual(claim('b').pk, low.pk)
+        self.assertIsNone(claim('c'))
+        self.assertEqual(Job.objects.get(pk=later.pk).status, Job.QUEUED)
+
+        self.assertIsNone(claim('d', now=timezone.now() + timedelta(minutes=2)))
+
+        # A job whose worker died is claimed again after LOCK_TIMEOUT.
+        job = claim('e', now=timezone.now() + timedelta(minutes=10))
+        self.assertEqual((job.pk, job.attempts, job.worker), (high.pk, 2, 'e'))
+
+    def test_heartbeats_keep_long_jobs_claimed(self):
+        enqueue('tests.flaky', {'fail': False})
+        job = claim('a')
+        beat([job], now=timezone.now() + timedelta(minutes=4))
+        self.assertIsNone(claim('b', now=timezone.now() + timedelta(minutes=6)))
+        self.assertEqual(claim('c', now=timezone.now() + timedelta(minutes=10)).worker, 'c')
+
+    def test_lost_job_without_attempts_left_fails(self):
+        job = enqueue('tests.once')
+        claim('a')
+        self.assertIsNone(claim('b', now=timezone.now() + timedelta(minutes=10)))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.worker), (Job.FAILED, 1, 'a'))
+        self.assertIn('stopped responding', job.error)
+
+    @override_settings(JOB_QUEUE={**settings.JOB_QUEUE, 'BACKOFF_SECONDS': 60})
+    def test_retries_with_backoff_then_fails(self):
+        job = enqueue('tests.flaky')
+        with self.assertLogs('tasks.jobs', 'ERROR'):
+            self.assertFalse(run_job(claim('w')))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), (Job.QUEUED, 'RuntimeError: boom'))
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=50))
+        self.assertIsNone(claim('w'))
+
+        with self.assertLogs('tasks.jobs', 'ERROR'):
+            run_job(claim('w', now=job.run_at))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_background_export(self):
+        Task.objects.create(title='Open', user=self.user)
+        Task.objects.create(title='Done', completed=True, user=self.user)
+        response = self.client.post('/api/tasks/export/background/?completed=true', {'format': 'csv'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], Job.QUEUED)
+        location = response['Location']
+        self.assertEqual(self.client.get(f"{location}download/").status_code, status.HTTP_404_NOT_FOUND)
+
+        self.run_jobs()
+        job = self.client.get(location).data
+        self.assertEqual(job['status'], Job.SUCCEEDED)
+        self.assertEqual(job['result']['rows'], 1)
+        response = self.client.get(f"{location}download/")
+        rows = list(csv.DictReader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual([row['title'] for row in rows], ['Done'])
+
+        # Jobs are private to their owner.
+        other = User.objects.create_user(username='other')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=other).key}')
+        self.assertEqual(self.client.get(location).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get('/api/jobs/').data['count'], 0)
+
+    def test_background_import(self):
+        body = '{"title": "One"}\n{"title": "Two"}\n'
+        response = self.client.generic(
+            'POST', '/api/tasks/import/?background=true', body, content_type='application/x-ndjson',
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertFalse(Task.objects.exists())
+        self.run_jobs()
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.result['created']), (Job.SUCCEEDED, 2))
+        self.assertEqual(get_task_stats(self.user.pk)['total'], 2)
+        # The upload is removed once imported.
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'imports', str(self.user.pk))), [])
+
+
+class JobWorkerTest(APITransactionTestCase):
+    """Test run_worker against committed jobs"""
+
+    def test_worker_runs_jobs_and_account_purges(self):
+        user = User.objects.create_user(username='leaving', password='pass123')
+        Task.objects.bulk_create([Task(title=f'Task {i}', user=user) for i in range(3)])
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}')
+        self.assertEqual(self.client.delete('/api/auth/profile/').status_code, status.HTTP_202_ACCEPTED)
+        for _ in range(4):
+            enqueue('tests.flaky', {'fail': False})
+
+        out = StringIO()
+        # The threads share an in-memory SQLite database, which reports
+        # contention as errors instead of waiting: quiet the retries.
+        with mock.patch('tasks.jobs.logger'):
+            call_command('run_worker', '--burst', '--concurrency', '2', stdout=out, stderr=StringIO())
+        self.assertIn('Ran 5 job(s)', out.getvalue())
+        self.assertEqual(set(Job.objects.values_list('status', flat=True)), {Job.SUCCEEDED})
+        self.assertFalse(User.objects.filter(pk=user.pk).exists())
+        self.assertEqual(AccountDeletion.objects.get().tasks_deleted, 3)
+
+    @override_settings(JOB_QUEUE={**settings.JOB_QUEUE, 'HEARTBEAT_INTERVAL': 0.01})
+    def test_worker_sends_heartbeats_for_running_jobs(self):
+        enqueue('tests.once')
+        job = claim('w:0')
+        worker = Worker(name='w')
+        worker.running['w:0'] = job
+        with mock.patch('tasks.jobs.beat', wraps=beat) as patched:
+            heartbeat = threading.Thread(target=worker.heartbeat)
+            heartbeat.start()
+            for _ in range(500):
+                if patched.called:
+                    break
+                threading.Event().wait(0.01)
+            worker.finished.set()
+            heartbeat.join()
+        patched.assert_called_with([job])
+        job.refresh_from_db()
+        self.assertGreater(job.heartbeat_at, job.started_at)
+
+
+class TaskAdminTest(TestCase):
+    """Test the task admin changelist on large tables"""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', password='pass123')
+        self.owner = User.objects.create_user(username='owner', password='pass123')
+        self.other = User.objects.create_user(username='other', password='pass123')
+        for i in range(25):
+            Task.objects.create(title=f'Task {i}', user=self.owner if i % 2 else self.other)
+        Task.objects.create(title='Water the plants', user=self.owner)
+        self.client.force_login(self.admin)
+
+    def walk(self, params):
+        ids, url = [], '/admin/tasks/task/'
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(task.pk for task in response.context['cl'].result_list)
+            url, params = response.context['cl'].keyset.get_next_link(), None
+        return ids
+
+    @mock.patch('tasks.admin.TaskAdmin.list_per_page', 10)
+    def test_changelist_walks_pages_by_keyset(self):
+        """Test that the next links visit every task once, in order"""
+        ids = list(Task.objects.order_by('created_at', 'id').values_list('id', flat=True))
+        self.assertEqual(self.walk({}), ids[::-1])
+        self.assertEqual(self.walk({'o': '3'}), ids)
+
+    def test_changelist_counts_are_capped(self):
+        """Test that no query counts or lists every task or user"""
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get('/admin/tasks/task/')
+        self.assertContains(response, '26 Tasks')
+        for query in captured:
+            if 'COUNT(' in query['sql'] and 'tasks_task' in query['sql']:
+                self.assertIn('LIMIT', query['sql'])
+            self.assertNotIn('FROM "auth_user" ORDER BY', query['sql'])
+        with mock.patch('tasks.admin.TaskAdmin.count_limit', 10):
+            self.assertContains(self.client.get('/admin/tasks/task/'), 'more than 10 Tasks')
+
+    def test_user_filter_and_search(self):
+        """Test the autocomplete user filter and the full-text search"""
+        response = self.client.get('/admin/tasks/task/', {'user__id__exact': self.owner.pk})
+        self.assertEqual({task.user_id for task in response.context['cl'].result_list}, {self.owner.pk})
+        self.assertContains(response, 'data-ajax--url="/admin/autocomplete/"')
+        self.assertContains(response, 'js/admin_user_filter.js')
+        self.assertContains(response, f'<option value="{self.owner.pk}" selected>owner</option>', html=True)
+        response = self.client.get('/admin/autocomplete/', {
+            'app_label': 'tasks', 'model_name': 'task', 'field_name': 'user', 'term': 'own',
+        })
+        self.assertEqual([user['text'] for user in response.json()['results']], ['owner'])
+        self.assertRedirects(
+            self.client.get('/admin/tasks/task/', {'user__id__exact': 'x'}), '/admin/tasks/task/?e=1',
+            fetch_redirect_response=False,
+        )
+        response = self.client.get('/admin/tasks/task/', {'q': 'plant'})
+        self.assertEqual([task.title for task in response.context['cl'].result_list], ['Water the plants'])
+        # Terms in more tasks than count_limit are searched with LIKE.
+        with mock.patch('tasks.admin.TaskAdmin.count_limit', 10), CaptureQueriesContext(connection) as captured:
+            response = self.client.get('/admin/tasks/task/', {'q': 'task'})
+        self.assertEqual(len(response.context['cl'].result_list), 25)
+        self.assertTrue(any('LIKE' in query['sql'] for query in captured))
+
+
+class RecordingBroker(LocalBroker):
+    published = []
+
+    def publish(self, user_id):
+        self.published.append(user_id)
+        super().publish(user_id)
+
+
+@override_settings(TASK_SYNC_OVERLAP_SECONDS=0)
+class TaskEventsTest(APITestCase):
+    """Test the server-sent events stream of task changes"""
+
+    def setUp(self):
+        get_token_cache().clear()
+        self.user = User.objects.create_user(username='listener', password='pass123')
+        self.token = Token.objects.create(user=self.user)
+        self.task = Task.objects.create(title='Existing', user=self.user)
+
+    def ticket(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        response = client.post('/api/tasks/events/ticket/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['ticket']
+
+    def events(self, **headers):
+        response = self.client.get('/api/tasks/events/', {'ticket': self.ticket()}, **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return parse_events(response.content)
+
+    def test_resume_from_last_event_id(self):
+        """Test that a reconnect receives exactly the changes it missed"""
+        first = self.events()
+        self.assertEqual(first[0], {'retry': '3000'})
+        self.assertEqual([event.get('event') for event in first[1:]], ['cursor'])
+        last_id = first[-1]['id']
+
+        created = Task.objects.create(title='Created', user=self.user)
+        deleted_id = self.task.id
+        self.task.delete()
+        events = self.events(HTTP_LAST_EVENT_ID=last_id)
+        self.assertEqual(
+            [(event['event'], json.loads(event['data']).get('id')) for event in events if 'event' in event],
+            [('upsert', created.id), ('delete', deleted_id), ('cursor', None)],
+        )
+        self.assertEqual(json.loads(events[1]['data'])['title'], 'Created')
+
+        # Nothing new: only the cursor again, also accepted as ?since=.
+        response = self.client.get('/api/tasks/events/', {'ticket': self.ticket(), 'since': events[-1]['id']})
+        again = parse_events(response.content)
+        self.assertEqual([event.get('event') for event in again[1:]], ['cursor'])
+
+    def test_authentication_and_reset(self):
+        """Test ticket handling and the reset event for unusable cursors"""
+        self.assertEqual(self.client.get('/api/tasks/events/').status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.client.post('/api/tasks/events/ticket/').status_code, status.HTTP_401_UNAUTHORIZED)
+        for params in ({'token': self.token.key}, {'ticket': 'nope'}, {'ticket': self.token.key}):
+            response = self.client.get('/api/tasks/events/', params)
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        # Tickets open one stream, within TICKET_MAX_AGE.
+        ticket = self.ticket()
+        self.assertEqual(self.client.get('/api/tasks/events/', {'ticket': ticket}).status_code, status.HTTP_200_OK)
+        response = self.client.get('/api/tasks/events/', {'ticket': ticket})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        ticket = self.ticket()
+        with override_settings(TASK_EVENTS={**settings.TASK_EVENTS, 'TICKET_MAX_AGE': -1}):
+            response = self.client.get('/api/tasks/events/', {'ticket': ticket})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        response = self.client.get('/api/tasks/events/', HTTP_LAST_EVENT_ID='garbage')
+        self.assertEqual(parse_events(response.content)[1], {'event': 'reset', 'data': '{}'})
+
+    @override_settings(TASK_EVENTS={**settings.TASK_EVENTS, 'BROKER': 'tasks.tests.RecordingBroker'})
+    def test_writes_publish_on_commit(self):
+        """Test that committed writes wake the user's streams"""
+        RecordingBroker.published = []
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(title='Published', user=self.user)
+        self.assertEqual(RecordingBroker.published, [self.user.pk])
+
+    async def test_stream_wakes_on_publish(self):
+        """Test that an open stream pushes a change as soon as it is published"""
+        cursor = await sync_to_async(current_cursor)(self.user)
+        stream = event_stream(self.user, cursor)
+        try:
+            self.assertIn(b'retry:', await stream.__anext__())
+            self.assertIn(b'id: ', await stream.__anext__())
+            pending = asyncio.ensure_future(stream.__anext__())
+            await asyncio.sleep(0.05)
+            self.assertFalse(pending.done())
+            task = await Task.objects.acreate(title='Live', user=self.user)
+            get_broker().publish(self.user.pk)
+            chunk = await asyncio.wait_for(pending, 5)
+            self.assertIn(f'"id":{task.id}'.encode(), chunk)
+        finally:
+            await stream.aclose()
+
+    async def test_cache_broker(self):
+        """Test that the cache broker wakes subscriptions from a counter"""
+        broker = CacheBroker('default', poll_interval=0.01)
+        async with broker.subscribe(self.user.pk) as subscription:
+            self.assertFalse(await subscription.wait(0.05))
+            await sync_to_async(broker.publish)(self.user.pk)
+            self.assertTrue(await subscription.wait(5))
+
+
+def parse_events(content):
+    """Split a text/event-stream body into a list of {field: value} dicts."""
+    events = []
+    for block in content.decode().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if line and not line.startswith(':'))
+        if fields:
+            events.append(fields)
+    return events
+
+
+@override_settings(READ_REPLICAS={'ALIASES': ['replica'], 'LAG_TOLERANCE': 5, 'CACHE_ALIAS': 'default'})
+class ReplicaRoutingTest(APITransactionTestCase):
+    """Test read replica routing with read-your-writes"""
+
+    def setUp(self):
+        cache.clear()
+        get_token_cache().clear()
+        self.user = User.objects.create_user(username='reader', password='pass123')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user).key}')
+        Task.objects.create(title='Replicated', user=self.user)
+
+        # A snapshot of the primary stands in for a lagging replica. SQLite
+        # cannot copy a database inside a transaction, hence the
+        # TransactionTestCase.
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        replica = load_backend('django.db.backends.sqlite3').DatabaseWrapper(
+            {**connection.settings_dict, 'NAME': os.path.join(directory.name, 'replica.sqlite3')}, alias='replica',
+        )
+        connection.ensure_connection()
+        replica.ensure_connection()
+        connection.connection.backup(replica.connection)
+        connections['replica'] = replica
+        self.addCleanup(replica.close)
+        self.addCleanup(delattr, connections._connections, 'replica')
+
+        self.unreplicated = Task.objects.create(title='Not replicated yet', user=self.user)
+
+    def count(self):
+        response = self.client.get('/api/tasks/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['count']
+
+    def test_reads_use_replica(self):
+        self.assertEqual(self.count(), 1)
+        response = self.client.get(f'/api/tasks/{self.unreplicated.id}/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get('/api/auth/profile/').status_code, status.HTTP_200_OK)
+        # Outside a routed request reads stay on the primary.
+        self.assertEqual(Task.objects.filter(user=self.user).count(), 2)
+
+    def test_read_your_writes(self):
+        response = self.client.post('/api/tasks/', {'title': 'Mine'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Task.objects.using('default').filter(title='Mine').exists())
+        self.assertEqual(self.count(), 3)
+        response = self.client.get(f'/api/tasks/{response.data["id"]}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Once the lag tolerance has passed the replica is used again.
+        cache.clear()
+        self.assertEqual(self.count(), 1)
+
+        # Profile updates pin too.
+        response = self.client.patch('/api/auth/profile/', {'first_name': 'Ada'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.count(), 3)
+
+    def test_no_replicas(self):
+        with override_settings(READ_REPLICAS={'ALIASES': [], 'LAG_TOLERANCE': 5, 'CACHE_ALIAS': 'default'}):
+            self.assertEqual(self.count(), 2)
+
+    async def test_async_views(self):
+        view = AsyncTaskView.as_view(sync_view=None)
+        factory = AsyncRequestFactory()
+        headers = {'Authorization': self.client._credentials['HTTP_AUTHORIZATION']}
+        response = await view(factory.get('/api/tasks/', headers=headers))
+        self.assertEqual(json.loads(response.content)['count'], 1)
+        request = factory.post('/api/tasks/', {'title': 'Async'}, content_type='application/json', headers=headers)
+        self.assertEqual((await view(request)).status_code, status.HTTP_201_CREATED)
+        response = await view(factory.get('/api/tasks/', headers=headers))
+        self.assertEqual(json.loads(response.content)['count'], 3)
+
+
+SHARDS = {'ALIASES': ['default', 'shard1', 'shard2'], 'VNODES': 64, 'ID_BLOCK_SIZE': 1000}
+
+
+@override_settings(TASK_SHARDS=SHARDS)
+class ShardingTest(APITransactionTestCase):
+    """Test sharding the task tables by user"""
+
+    def setUp(self):
+        cache.clear()
+        get_token_cache().clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for alias in SHARDS['ALIASES'][1:]:
+            shard = load_backend('django.db.backends.sqlite3').DatabaseWrapper(
+                {**connection.settings_dict, 'NAME': os.path.join(directory.name, f'{alias}.sqlite3')}, alias=alias,
+            )
+            connections[alias] = shard
+            self.addCleanup(delattr, connections._connections, alias)
+            self.addCleanup(shard.close)
+            executor = MigrationExecutor(shard)
+            executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def user_on(self, alias):
+        index = 0
+        while True:
+            index += 1
+            user = User.objects.create_user(username=f'{alias}-{index}', password='pass123')
+            if get_shard(user.pk) == alias:
+                return user
+
+    def login(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}')
+
+    def test_ring_moves_a_share_of_keys_to_a_new_shard(self):
+        before = HashRing(['a', 'b', 'c'])
+        after = HashRing(['a', 'b', 'c', 'd'])
+        moved = [key for key in range(4000) if before.get(key) != after.get(key)]
+        self.assertTrue({after.get(key) for key in moved} <= {'d'})
+        self.assertLess(abs(len(moved) / 4000 - 0.25), 0.1)
+        self.assertEqual({before.get(key) for key in range(4000)}, {'a', 'b', 'c'})
+
+    def test_api_reads_and_writes_the_users_shard(self):
+        user = self.user_on('shard1')
+        self.login(user)
+        response = self.client.post('/api/tasks/', {'title': 'One'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        task_id = response.data['id']
+        response = self.client.post('/api/tasks/bulk/', [{'title': 'Two'}, {'title': 'Three'}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Task.objects.using('shard1').filter(user_id=user.pk).count(), 3)
+        self.assertFalse(Task.objects.using('default').filter(user_id=user.pk).exists())
+
+        self.assertEqual(self.client.get('/api/tasks/').data['count'], 3)
+        response = self.client.patch(f'/api/tasks/{task_id}/', {'completed': True}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(f'/api/tasks/{task_id}/').data['user'], user.username)
+        self.assertEqual(self.client.get('/api/tasks/stats/').data, {'total': 3, 'active': 2, 'completed': 1})
+        self.assertEqual(self.client.delete(f'/api/tasks/{task_id}/').status_code, status.HTTP_200_OK)
+        data = self.client.get('/api/tasks/changes/').data
+        self.assertEqual(len(data['changes']), 2)
+        self.assertEqual(TaskTombstone.objects.using('shard1').filter(task_id=task_id).count(), 1)
+
+        # Ids are unique across shards, and other users' tasks stay hidden.
+        other = self.user_on('shard2')
+        foreign = Task.objects.create(title='Theirs', user=other)
+        self.assertEqual(foreign._state.db, 'shard2')
+        self.assertNotIn(foreign.id, Task.objects.using('shard1').values_list('id', flat=True))
+        self.assertEqual(self.client.get(f'/api/tasks/{foreign.id}/').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_reshard_moves_rows_and_keeps_ids(self):
+        with override_settings(TASK_SHARDS={**SHARDS, 'ALIASES': []}):
+            users = [User.objects.create_user(username=f'user{i}') for i in range(6)]
+            tasks = [Task.objects.create(title=f'Task {user.pk}', user=user) for user in users]
+            Task.objects.filter(pk=tasks[0].pk).delete()
+        call_command('reshard_tasks', stdout=StringIO(), stderr=StringIO())
+        for user, task in zip(users[1:], tasks[1:]):
+            moved = Task.objects.for_user(user.pk).get()
+            self.assertEqual((moved.pk, moved.title), (task.pk, task.title))
+            self.assertEqual(get_task_stats(user.pk)['total'], 1)
+        self.assertTrue(TaskTombstone.objects.for_user(users[0].pk).exists())
+        for alias in SHARDS['ALIASES']:
+            stored = set(Task.objects.using(alias).values_list('user_id', flat=True))
+            self.assertTrue(all(get_shard(user_id) == alias for user_id in stored))
+        out = StringIO()
+        call_command('reshard_tasks', '--dry-run', stdout=out, stderr=StringIO())
+        self.assertIn('0 user(s) would move', out.getvalue())
+
+    def test_admin_finds_tasks_on_any_shard(self):
+        task = Task.objects.create(title='Sharded', user=self.user_on('shard2'))
+        self.client.force_login(User.objects.create_superuser(username='admin', password='pass123'))
+        response = self.client.get(f'/admin/tasks/task/{task.pk}/change/')
+        self.assertContains(response, 'Sharded')
+        self.assertContains(self.client.get('/admin/tasks/task/', {'shard': 'shard2'}), 'Sharded')
+        self.assertNotContains(self.client.get('/admin/tasks/task/', {'shard': 'shard1'}), 'Sharded')
+
+    def test_deleting_a_user_deletes_their_shard_rows(self):
+        user = self.user_on('shard1')
+        Task.objects.create(title='Gone', user=user)
+        ArchivedTask.objects.using('shard1').create(
+            id=1, title='Archived', user=user, created_at=timezone.now(), updated_at=timezone.now(),
+        )
+        user.delete()
+        self.assertFalse(Task.objects.using('shard1').exists())
+        self.assertFalse(ArchivedTask.objects.using('shard1').exists())
+        self.assertFalse(UserTaskState.objects.using('shard1').exists())
+
+
+class ResponseCacheTest(APITestCase):
+    """Test the per-user task response cache"""
+
+    def setUp(self):
+        cache.clear()
+        get_token_cache().clear()
+        self.user = User.objects.create_user(username='poller', password='pass123')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user).key}')
+        self.task = Task.objects.create(title='Cached', user=self.user)
+
+    def get(self, path='/api/tasks/', **params):
+        response = self.client.get(path, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_repeated_requests_hit(self):
+        self.assertEqual(self.get(completed='false', ordering='-created_at')['X-Cache'], 'miss')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/tasks/?ordering=-created_at&completed=false')
+        self.assertEqual(response['X-Cache'], 'hit')
+        self.assertEqual(len(queries), 1)  # the data version
+        self.assertEqual(response.data['results'][0]['title'], 'Cached')
+        self.assertEqual(self.get(f'/api/tasks/{self.task.id}/')['X-Cache'], 'miss')
+        self.assertEqual(self.get(f'/api/tasks/{self.task.id}/')['X-Cache'], 'hit')
+        self.assertEqual(get_response_cache().stats()['hit_ratio'], 0.5)
+
+    def test_writes_invalidate(self):
+        self.get()
+        self.client.patch(f'/api/tasks/{self.task.id}/', {'title': 'Renamed'}, format='json')
+        response = self.get()
+        self.assertEqual(response['X-Cache'], 'miss')
+        self.assertEqual(response.data['results'][0]['title'], 'Renamed')
+        Task.objects.bulk_create([Task(title='Bulk', user=self.user)])
+        record_change(self.user.pk, total=1)
+        self.assertEqual(self.get().data['count'], 2)
+
+        # Other users never share an entry.
+        other = User.objects.create_user(username='other', password='pass123')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=other).key}')
+        self.assertEqual(self.get().data['count'], 0)
+
+    def test_username_change_invalidates(self):
+        self.get()
+        self.client.patch('/api/auth/profile/', {'username': 'renamed'}, format='json')
+        response = self.get()
+        self.assertEqual(response['X-Cache'], 'miss')
+        self.assertEqual(response.data['results'][0]['user'], 'renamed')
+
+    def test_file_based_cache(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        caches = {
+            'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory.name},
+        }
+        with override_settings(CACHES=caches):
+            self.assertEqual(self.get()['X-Cache'], 'miss')
+            self.assertEqual(self.get()['X-Cache'], 'hit')
+
+    def test_disabled(self):
+        with override_settings(TASK_RESPONSE_CACHE={'TIMEOUT': 0, 'CACHE_ALIAS': 'default'}):
+            self.assertFalse(self.get().has_header('X-Cache'))
+
+
+class ThrottlingTest(APITestCase):
+    """Test token-bucket throttling and load shedding"""
+
+    def setUp(self):
+        get_token_cache().clear()
+        self.user = User.objects.create_user(username='throttled', password='pass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def rates(self, **rates):
+        return override_settings(THROTTLING={'RATES': rates, 'MAX_ENTRIES': 100})
+
+    def test_token_bucket(self):
+        now = [0.0]
+        buckets = TokenBuckets(max_entries=1, clock=lambda: now[0])
+        self.assertEqual([buckets.take('a', 2, 1.0) for _ in range(3)], [0, 0, 1.0])
+        now[0] = 0.5
+        self.assertEqual(buckets.take('a', 2, 1.0), 0.5)
+        now[0] = 1.0
+        self.assertEqual(buckets.take('a', 2, 1.0), 0)
+        buckets.take('b', 2, 1.0)  # evicts 'a', whose bucket starts full again
+        self.assertEqual(buckets.take('a', 2, 1.0), 0)
+
+    def test_read_and_write_scopes(self):
+        with self.rates(read='2/min', write='1/min'):
+            self.assertEqual(self.client.get('/api/tasks/').status_code, status.HTTP_200_OK)
+            self.assertEqual(self.client.get('/api/tasks/stats/').status_code, status.HTTP_200_OK)
+            response = self.client.get('/api/tasks/')
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            self.assertEqual(response['Retry-After'], '30')
+
+            response = self.client.post('/api/tasks/', {'title': 'Write'}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            response = self.client.post('/api/tasks/', {'title': 'Write'}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+            # Each user has their own buckets.
+            other = User.objects.create_user(username='other', password='pass123')
+            self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=other).key}')
+            self.assertEqual(self.client.get('/api/tasks/').status_code, status.HTTP_200_OK)
+
+    def test_login_and_ip_scopes(self):
+        self.client.credentials()
+        credentials = {'username': 'throttled', 'password': 'pass123'}
+        with self.rates(login='1/min'):
+            self.assertEqual(self.client.post('/api/auth/login/', credentials).status_code, status.HTTP_200_OK)
+            response = self.client.post('/api/auth/login/', credentials)
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        with self.rates(ip='1/min'):
+            self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+            self.assertEqual(self.client.get('/api/tasks/').status_code, status.HTTP_200_OK)
+            response = self.client.get('/api/tasks/', REMOTE_ADDR='10.0.0.2')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            response = self.client.get('/api/auth/profile/')
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    async def test_async_views_are_throttled(self):
+        sync_views = {pattern.name: pattern.callback for pattern in router.urls}
+        view = AsyncTaskView.as_view(sync_view=sync_views['task-list'])
+        request = AsyncRequestFactory().get('/api/tasks/', headers={'Authorization': 'Token ' + self.token.key})
+        with self.rates(read='1/min'):
+            self.assertEqual((await view(request)).status_code, status.HTTP_200_OK)
+            response = await view(request)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '60')
+
+    def test_load_shedder(self):
+        now = [0.0]
+        shedder = LoadShedder(max_in_flight=2, target_latency=0.5, interval=1.0, clock=lambda: now[0])
+        self.assertTrue(shedder.admit())
+        self.assertTrue(shedder.admit())
+        self.assertFalse(shedder.admit())  # queue depth
+        shedder.done(0.8)
+        shedder.done(0.9)
+
+        # Even the fastest request of the last interval was too slow.
+        now[0] = 1.0
+        self.assertTrue(shedder.admit())  # alone, so not queued
+        self.assertFalse(shedder.admit())
+        shedder.done(0.1)
+        now[0] = 2.0
+        self.assertTrue(shedder.admit())
+        self.assertTrue(shedder.admit())
+        self.assertEqual(shedder.shed, 2)
+
+    def test_middleware_sheds_task_requests(self):
+        options = {
+            'PATHS': ['/api/tasks/'], 'MAX_IN_FLIGHT': 1, 'TARGET_LATENCY_MS': 0, 'INTERVAL_MS': 1000, 'RETRY_AFTER': 2,
+        }
+        with override_settings(LOAD_SHEDDING=options):
+            shedder = get_load_shedder()
+            shedder.in_flight = 1
+            with self.assertNumQueries(0):
+                response = self.client.get('/api/tasks/')
+            self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+            self.assertEqual(response['Retry-After'], '2')
+            self.assertEqual(self.client.get('/api/auth/profile/').status_code, status.HTTP_200_OK)
+            shedder.in_flight = 0
+            self.assertEqual(self.client.get('/api/tasks/').status_code, status.HTTP_200_OK)
+
+
+class SQLiteBackendTest(TestCase):
+    """Test the production SQLite backend in todo_project.sqlite"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'stress.sqlite3')
+
+    def wrapper(self, **options):
+        settings_dict = {
+            **connection.settings_dict, 'ENGINE': 'todo_project.sqlite', 'NAME': self.path,
+            'OPTIONS': options, 'CONN_MAX_AGE': 0,
+        }
+        return load_backend('todo_project.sqlite').DatabaseWrapper(settings_dict, alias='stress')
+
+    def test_pragmas(self):
+        db = self.wrapper(pragmas={'journal_mode': 'wal', 'busy_timeout': 1234, 'cache_size': -2000})
+        with db.cursor() as cursor:
+            for name, value in [('journal_mode', 'wal'), ('busy_timeout', 1234), ('cache_size', -2000)]:
+                cursor.execute(f'PRAGMA {name}')
+                self.assertEqual(cursor.fetchone()[0], value)
+        db.close()
+        with self.assertRaises(ImproperlyConfigured):
+            self.wrapper(pragmas={'journal_mode; DROP TABLE x': 'wal'})
+        with self.assertRaises(ImproperlyConfigured):
+            self.wrapper(transaction_mode='LAZY')
+
+    def test_concurrent_writers_are_serialized(self):
+        """Test that read-then-write transactions neither fail nor lose updates"""
+        options = {'transaction_mode': 'IMMEDIATE', 'pragmas': {'journal_mode': 'wal', 'busy_timeout': 10000}}
+        setup = self.wrapper(**options)
+        with setup.cursor() as cursor:
+            cursor.execute('CREATE TABLE counter (value INTEGER)')
+            cursor.execute('INSERT INTO counter VALUES (0)')
+        setup.close()
+
+        errors = []
+
+        def work():
+            connections['stress'] = self.wrapper(**options)
+            try:
+                for _ in range(50):
+                    with transaction.atomic(using='stress'), connections['stress'].cursor() as cursor:
+                        cursor.execute('SELECT value FROM counter')
+                        value = cursor.fetchone()[0]
+                        cursor.execute('UPDATE counter SET value = %s', [value + 1])
+            except OperationalError as exc:
+                errors.append(exc)
+            finally:
+                connections['stress'].close()
+                del connections['stress']
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        check = self.wrapper()
+        with check.cursor() as cursor:
+            cursor.execute('SELECT value FROM counter')
+            self.assertEqual(cursor.fetchone()[0], 8 * 50)
+        check.close()
+
+
+class SeedTasksTest(TestCase):
+    """Test the seed_tasks command and the benchmark helpers"""
+
+    def test_seed_creates_consistent_rows(self):
+        """Test that seeded users get tokens, tasks and matching counters"""
+        out = StringIO()
+        call_command(
+            'seed_tasks', '--users', '3', '--tasks', '25', '--batch-size', '10', '--prefix', 'load', stdout=out,
+        )
+        self.assertIn('Created 3 user(s) and 75 task(s)', out.getvalue())
+        users = User.objects.filter(username__startswith='load')
+        self.assertEqual(users.count(), 3)
+        self.assertEqual(Token.objects.filter(user__in=users).count(), 3)
+        for user in users:
+            tasks = Task.objects.filter(user=user)
+            self.assertEqual(get_task_stats(user.pk), {
+                'total': 25,
+                'active': tasks.filter(completed=False).count(),
+                'completed': tasks.filter(completed=True).count(),
+            })
+        self.assertTrue(users.first().check_password('seed-pass-123'))
+
+        call_command('seed_tasks', '--users', '1', '--tasks', '1', '--prefix', 'load', '--clear', stdout=out)
+        self.assertEqual(Task.objects.filter(user__username__startswith='load').count(), 1)
+
+    def test_clear_keeps_real_users_with_the_prefix(self):
+        """Test that --clear only deletes users named like seeded ones"""
+        seedling = User.objects.create_user(username='seedling', password='pass123')
+        Task.objects.create(title='Mine', user=seedling)
+        call_command('seed_tasks', '--users', '2', '--tasks', '1', stdout=StringIO())
+        call_command('seed_tasks', '--users', '1', '--tasks', '1', '--clear', stdout=StringIO())
+        self.assertTrue(Task.objects.filter(user=seedling).exists())
+        self.assertEqual(list(seeded_users('seed').values_list('username', flat=True)), ['seed000000'])
+
+    def test_numbering_continues_after_gaps(self):
+        """Test that new seeded users are numbered after the highest existing one"""
+        User.objects.create_user(username='seedling')
+        User.objects.create_user(username='seed000004')
+        call_command('seed_tasks', '--users', '1', '--tasks', '0', stdout=StringIO())
+        self.assertTrue(User.objects.filter(username='seed000005').exists())
+
+    def test_stress_db_deletes_only_its_own_users(self):
+        """Test that stress_db removes its users but keeps earlier ones unless --clear is given"""
+        User.objects.create_user(username='stress000000')
+
+        def run(*args):
+            with mock.patch.object(connection, 'is_in_memory_db', return_value=False):
+                with mock.patch('tasks.management.commands.stress_db.stress', return_value={}) as stress:
+                    call_command('stress_db', '--workers', '2', *args, stdout=StringIO())
+            return list(User.objects.filter(pk__in=stress.call_args.args[0]).values_list('username', flat=True))
+
+        self.assertEqual(run(), [])
+        self.assertEqual(list(seeded_users('stress').values_list('username', flat=True)), ['stress000000'])
+        self.assertEqual(run('--keep'), ['stress000001', 'stress000002'])
+        self.assertEqual(run('--clear'), [])
+        self.assertFalse(seeded_users('stress').exists())
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles"""
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 95), 7)
+        self.assertIsNone(percentile([], 50))
+
+
+class PerformanceMiddlewareTest(APITestCase):
+    """Test the Server-Timing header and the slow-request log"""
+
+    def setUp(self):
+        get_token_cache().clear()
+        self.user = User.objects.create_user(username='timed', password='pass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        Task.objects.create(title='One', user=self.user)
+
+    def test_server_timing_header(self):
+        """Test that list responses report db, view, serialize and render times"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/tasks/')
+        header = response['Server-Timing']
+        self.assertIn('db;dur=', header)
+        self.assertIn(f'desc="{len(queries)} queries"', header)
+        for metric in ('view', 'serialize', 'render', 'total'):
+            self.assertIn(f'{metric};dur=', header)
+
+    def assertCountsQueries(self, response):
+        match = re.search(r'db;dur=[\d.]+;desc="(\d+) queries"', response['Server-Timing'])
+        self.assertGreater(int(match.group(1)), 0)
+
+    async def test_server_timing_under_asgi(self):
+        """Test that queries run on sync_to_async threads are counted"""
+        response = await AsyncClient().get('/api/tasks/', headers={'Authorization': 'Token ' + self.token.key})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertCountsQueries(response)
+
+        async def view(request):
+            return HttpResponse(str(await Task.objects.acount()))
+
+        response = await PerformanceMiddleware(view)(AsyncRequestFactory().get('/'))
+        self.assertCountsQueries(response)
+
+    @override_settings(SERVER_TIMING=False)
+    def test_header_can_be_disabled(self):
+        self.assertNotIn('Server-Timing', self.client.get('/api/tasks/'))
+
+    @override_settings(SLOW_REQUEST_THRESHOLD_MS=0.001)
+    def test_slow_request_log_groups_sql(self):
+        """Test that slow requests are logged with normalized, grouped SQL"""
+        with self.assertLogs('todo_project.performance.slow', 'WARNING') as logs:
+            self.client.get('/api/tasks/')
+        record = logs.records[0].slow_request
+        self.assertEqual(record['path'], '/api/tasks/')
+        self.assertEqual(record['user_id'], self.user.pk)
+        self.assertEqual(record['queries'], sum(group['count'] for group in record['sql']))
+        self.assertTrue(all('%s' not in group['sql'] for group in record['sql']))
+
+    def test_normalize_sql(self):
+        """Test that statements differing only in values normalize equal"""
+        self.assertEqual(
+            normalize_sql("SELECT * FROM t WHERE id IN (1, 2, 3) AND name = 'x''y'"),
+            normalize_sql('SELECT *  FROM t WHERE id IN (%s, %s) AND name = %s'),
+        )
+        self.assertEqual(normalize_sql('SELECT "t"."col1" FROM t LIMIT 21'), 'SELECT "t"."col1" FROM t LIMIT ?')
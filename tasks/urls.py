@@ -1,12 +1,37 @@
-from django.urls import path, include
+from django.conf import settings
+from django.urls import URLPattern, path, include
 from rest_framework.routers import DefaultRouter
-from .views import TaskViewSet
+from .async_views import AsyncTaskView, task_events
+from .views import JobViewSet, TaskViewSet
 
 # Create a router and register our viewsets with it
 router = DefaultRouter()
 router.register(r'tasks', TaskViewSet, basename='task')
+router.register(r'jobs', JobViewSet, basename='job')
+
+
+def async_task_urls(urls):
+    """
+    Swap the list and detail routes (but not their format-suffix variants
+    or the extra actions) for the native async views, which fall back to
+    the router's views for requests they do not handle.
+    """
+    details = {'task-list': False, 'task-detail': True}
+    return [
+        URLPattern(
+            url.pattern,
+            AsyncTaskView.as_view(sync_view=url.callback, detail=details[url.name]),
+            url.default_args,
+            url.name,
+        )
+        if url.name in details and 'format' not in url.pattern.regex.groupindex else url
+        for url in urls
+    ]
+
 
 # The API URLs are now determined automatically by the router
 urlpatterns = [
-    path('', include(router.urls)),
+    # Before the router, whose detail route would take 'events' as a pk.
+    path('tasks/events/', task_events, name='task-events'),
+    path('', include(async_task_urls(router.urls) if settings.TASK_ASYNC_VIEWS else router.urls)),
 ]
@@ -1,12 +1,42 @@
-from rest_framework import viewsets, filters, status
+import io
+import os
+import shutil
+import tempfile
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import filters, viewsets, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, UnsupportedMediaType, ValidationError
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Task
-from .serializers import TaskSerializer, TaskCreateUpdateSerializer
+from todo_project.performance import timed
+from todo_project.replicas import ReplicaReadMixin
+from .archiving import with_archived
+from .changes import batch_changes, get_task_stats, record_change
+from .events import issue_ticket
+from .exporting import EXPORT_RENDERERS
+from .filters import TaskOrderingFilter, TaskSearchFilter
+from .importing import format_for_content_type, import_tasks, read_rows
+from .jobs import enqueue
+from .mixins import ConditionalTaskMixin, RowReadMixin
+from .models import ArchivedTask, Job, Task
+from .pagination import KeysetPagination
+from .renderers import CSVRenderer, FastJSONRenderer, NDJSONRenderer
+from .serializers import JobSerializer, TaskRowSerializer, TaskSerializer, TaskCreateUpdateSerializer
+from .sharding import get_shard
+from .sync import SyncCursor, get_changes
 
 
-class TaskViewSet(viewsets.ModelViewSet):
+class TaskViewSet(ReplicaReadMixin, ConditionalTaskMixin, RowReadMixin, viewsets.ModelViewSet):
     """
     ViewSet for Task model.
     
@@ -17,29 +47,136 @@ class TaskViewSet(viewsets.ModelViewSet):
     - update: PUT /api/tasks/{id}/
     - partial_update: PATCH /api/tasks/{id}/
     - destroy: DELETE /api/tasks/{id}/
+
+    Bulk operations (one transaction each, results reported per item):
+    - bulk_create: POST /api/tasks/bulk/ with a list of tasks
+    - bulk_update: PATCH /api/tasks/bulk/ with a list of {"id": ..., fields}
+    - bulk_destroy: DELETE /api/tasks/bulk/ with {"ids": [...]}
+    - bulk_update_filtered: PATCH /api/tasks/bulk/filter/?<filters> with
+      the fields to set on every matching task
     
     Filtering:
     - ?completed=true - Get completed tasks
     - ?completed=false - Get incomplete tasks
-    - ?search=keyword - Search in title and description
+    - ?search=keyword - Search in title and description (full-text index
+      when available, ranked by relevance unless ?ordering= is given)
     
     Ordering:
     - ?ordering=created_at - Order by creation date (oldest first)
     - ?ordering=-created_at - Order by creation date (newest first)
     - ?ordering=title - Order alphabetically by title
+
+    Pagination:
+    - ?page=N - Numbered pages (default)
+    - ?pagination=cursor - Keyset pages with opaque next/previous cursors;
+      following a ``cursor`` link keeps cursor mode. The default mode is
+      set by ``TASK_PAGINATION_MODE``.
+
+    Archive:
+    - ?include_archived=true - Also list the tasks moved to the archive by
+      ``manage.py archive_tasks`` (see tasks.archiving); always numbered
+      pages, and search results are not ranked
+
+    Statistics:
+    - stats: GET /api/tasks/stats/ - total, active and completed counts,
+      read from counters maintained on every write
+
+    Delta sync:
+    - changes: GET /api/tasks/changes/?since=<cursor> - tasks upserted and
+      ids deleted since the cursor, plus the cursor for the next call;
+      410 when the cursor predates compacted tombstones (see tasks.sync)
+
+    Export:
+    - export: GET /api/tasks/export/?format=ndjson|csv - every matching task,
+      streamed; takes the list filters and ordering but is not paginated
+    - import_tasks: POST /api/tasks/import/ with an NDJSON or CSV body;
+      ?commit=end (default, all or nothing) or ?commit=batch
+
+    Background jobs (202 with the job; poll GET /api/jobs/{id}/, see
+    tasks.jobs):
+    - export_background: POST /api/tasks/export/background/ with
+      {"format": "ndjson"|"csv"} and the list filters in the query string;
+      the file is downloaded from GET /api/jobs/{id}/download/
+    - import_tasks with ?background=true
+
+    list and retrieve read ``values()`` rows through ``TaskRowSerializer``
+    (same JSON as ``TaskSerializer``, a constant number of queries).
+
+    Conditional requests:
+    - GET list/detail return an ETag and answer If-None-Match with 304
+    - PUT/PATCH/DELETE honour If-Match and fail with 412 when stale
+
+    Safe requests read from a replica when ``DATABASE_REPLICAS`` is set,
+    except right after the user wrote (see todo_project.replicas). With
+    ``TASK_SHARDS`` set every query runs on the user's shard
+    (see tasks.sharding).
     """
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    row_serializer_class = TaskRowSerializer
+    filter_backends = [DjangoFilterBackend, TaskSearchFilter, TaskOrderingFilter]
     filterset_fields = ['completed']
     search_fields = ['title', 'description']
     ordering_fields = ['created_at', 'updated_at', 'title', 'completed']
     ordering = ['-created_at']  # Default ordering
+    pagination_classes = {
+        'page': viewsets.ModelViewSet.pagination_class,
+        'cursor': KeysetPagination,
+    }
+    pagination_query_param = 'pagination'
+
+    @property
+    def paginator(self):
+        """
+        Pick the paginator per request: ``?pagination=`` wins, a ``cursor``
+        parameter implies cursor mode, otherwise ``TASK_PAGINATION_MODE``.
+        """
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            mode = params.get(self.pagination_query_param)
+            if self.include_archived:
+                # Keyset pages cannot seek into a UNION.
+                mode = 'page'
+            elif mode not in self.pagination_classes:
+                mode = 'cursor' if KeysetPagination.cursor_query_param in params else settings.TASK_PAGINATION_MODE
+            pagination_class = self.pagination_classes[mode]
+            self._paginator = pagination_class() if pagination_class else None
+        return self._paginator
 
     def get_queryset(self):
         """
         Return only tasks belonging to the authenticated user.
         """
-        return Task.objects.filter(user=self.request.user)
+        return Task.objects.for_user(self.request.user.pk)
+
+    def get_row_serializer(self):
+        return self.row_serializer_class(owner=self.request.user)
+
+    @property
+    def include_archived(self):
+        return (
+            self.action == 'list'
+            and self.request.query_params.get('include_archived', '').lower() in ('true', '1')
+        )
+
+    def get_list_rows(self, rows):
+        """
+        With ``?include_archived=true``, union the archived tasks matching
+        the same filters into the list.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        if not self.include_archived:
+            return rows.values(queryset)
+        archived = ArchivedTask.objects.for_user(self.request.user.pk)
+        # The full-text index only covers live tasks.
+        for backend in (DjangoFilterBackend, filters.SearchFilter):
+            archived = backend().filter_queryset(self.request, archived, self)
+        return with_archived(rows, queryset, archived)
+
+    @property
+    def shard(self):
+        """The database holding the user's tasks (None: the default routing)."""
+        return get_shard(self.request.user.pk)
 
     def get_serializer_class(self):
         """
@@ -65,9 +202,333 @@ class TaskViewSet(viewsets.ModelViewSet):
         """
         Delete a task with custom response.
         """
-        instance = self.get_object()
-        self.perform_destroy(instance)
-        return Response(
+        with self.write_precondition(request):
+            instance = self.get_object()
+            self.perform_destroy(instance)
+        response = Response(
             {"message": "Task deleted successfully"},
             status=status.HTTP_200_OK
         )
+        return self.set_write_etag(request, response)
+
+    def enqueue_job(self, name, args):
+        """
+        Queue a background job for the user and answer ``202 Accepted``
+        with its status and URL.
+        """
+        job = enqueue(name, args, user_id=self.request.user.pk)
+        response = Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+        response['Location'] = reverse('job-detail', args=[job.pk], request=self.request)
+        return response
+
+    def get_bulk_items(self, request):
+        """
+        Return the JSON list posted to a bulk endpoint, enforcing
+        ``TASK_BULK_MAX_ITEMS``.
+        """
+        items = request.data
+        if not isinstance(items, list):
+            raise ValidationError({'detail': 'Expected a list of items.'})
+        if len(items) > settings.TASK_BULK_MAX_ITEMS:
+            raise ValidationError({
+                'detail': f'At most {settings.TASK_BULK_MAX_ITEMS} items can be sent at once.'
+            })
+        return items
+
+    def bulk_response(self, results, success_status=status.HTTP_200_OK):
+        """
+        Wrap per-item results: ``success_status`` when every item succeeded,
+        400 when none did and 207 Multi-Status for a mix.
+        """
+        failed = sum(1 for result in results if result['status'] not in ('created', 'updated', 'deleted'))
+        if not failed:
+            response_status = success_status
+        elif failed == len(results):
+            response_status = status.HTTP_400_BAD_REQUEST
+        else:
+            response_status = status.HTTP_207_MULTI_STATUS
+        return Response({'results': results}, status=response_status)
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk_create(self, request):
+        """
+        Create a list of tasks with one ``bulk_create``.
+
+        Invalid items are reported with their serializer errors and skipped;
+        the valid ones are inserted together.
+        """
+        results, tasks = [], []
+        for index, item in enumerate(self.get_bulk_items(request)):
+            serializer = TaskCreateUpdateSerializer(data=item)
+            if serializer.is_valid():
+                tasks.append(Task(user=request.user, **serializer.validated_data))
+                results.append({'index': index, 'status': 'created'})
+            else:
+                results.append({'index': index, 'status': 'invalid', 'errors': serializer.errors})
+
+        with transaction.atomic(using=self.shard), batch_changes():
+            created = Task.objects.using(self.shard).bulk_create(tasks)
+            record_change(
+                request.user.pk,
+                created=[task.pk for task in created],
+                total=len(created),
+                completed=sum(task.completed for task in created),
+            )
+        created = iter(created)
+        for result in results:
+            if result['status'] == 'created':
+                result['id'] = next(created).id
+        return self.bulk_response(results, status.HTTP_201_CREATED)
+
+    @bulk_create.mapping.patch
+    def bulk_update(self, request):
+        """
+        Partially update a list of tasks, identified by ``id``, with one
+        ``bulk_update``.
+        """
+        items = self.get_bulk_items(request)
+        results, changed, fields = [], [], {'updated_at'}
+        completed_delta = 0
+        now = timezone.now()
+
+        with transaction.atomic(using=self.shard), batch_changes():
+            ids = [item.get('id') for item in items if isinstance(item, dict)]
+            tasks = self.get_queryset().select_for_update().in_bulk(
+                [task_id for task_id in ids if isinstance(task_id, int)]
+            )
+            seen = set()
+            for index, item in enumerate(items):
+                task_id = item.get('id') if isinstance(item, dict) else None
+                if not isinstance(task_id, int) or task_id in seen:
+                    error = 'Duplicate id.' if task_id in seen else 'A valid integer is required.'
+                    results.append({'index': index, 'status': 'invalid', 'errors': {'id': [error]}})
+                    continue
+                seen.add(task_id)
+                task = tasks.get(task_id)
+                if task is None:
+                    results.append({'index': index, 'id': task_id, 'status': 'not_found'})
+                    continue
+                serializer = TaskCreateUpdateSerializer(task, data=item, partial=True)
+                if not serializer.is_valid():
+                    results.append({'index': index, 'id': task_id, 'status': 'invalid', 'errors': serializer.errors})
+                    continue
+                completed_delta -= task.completed
+                for attr, value in serializer.validated_data.items():
+                    setattr(task, attr, value)
+                    fields.add(attr)
+                completed_delta += task.completed
+                # bulk_update() does not apply auto_now
+                task.updated_at = now
+                changed.append(task)
+                results.append({'index': index, 'id': task_id, 'status': 'updated'})
+
+            Task.objects.using(self.shard).bulk_update(changed, sorted(fields))
+            record_change(
+                request.user.pk,
+                updated=[task.pk for task in changed],
+                completed=completed_delta,
+            )
+        return self.bulk_response(results)
+
+    @bulk_create.mapping.delete
+    def bulk_destroy(self, request):
+        """
+        Delete the tasks whose ids are listed in ``{"ids": [...]}`` with one
+        queryset ``delete()``.
+        """
+        ids = request.data.get('ids') if isinstance(request.data, dict) else None
+        if not isinstance(ids, list) or not all(isinstance(task_id, int) for task_id in ids):
+            raise ValidationError({'ids': ['Expected a list of task ids.']})
+        if len(ids) > settings.TASK_BULK_MAX_ITEMS:
+            raise ValidationError({
+                'ids': [f'At most {settings.TASK_BULK_MAX_ITEMS} ids can be sent at once.']
+            })
+
+        with transaction.atomic(using=self.shard), batch_changes():
+            queryset = self.get_queryset().filter(id__in=ids)
+            existing = set(queryset.values_list('id', flat=True))
+            # Sends post_delete per task; batch_changes() merges them.
+            queryset.delete()
+
+        results = [
+            {'id': task_id, 'status': 'deleted' if task_id in existing else 'not_found'}
+            for task_id in dict.fromkeys(ids)
+        ]
+        return self.bulk_response(results)
+
+    @action(detail=False, methods=['patch'], url_path='bulk/filter')
+    def bulk_update_filtered(self, request):
+        """
+        Apply the fields in the request body to every task matching the
+        list filters (``?completed=``, ``?search=``) with one queryset
+        ``update()``.
+        """
+        serializer = TaskCreateUpdateSerializer(data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        if not serializer.validated_data:
+            raise ValidationError({'detail': 'No fields to update.'})
+
+        values = {**serializer.validated_data, 'updated_at': timezone.now()}
+        with transaction.atomic(using=self.shard):
+            queryset = self.filter_queryset(self.get_queryset()).order_by()
+            if 'completed' in values:
+                # Update the rows that flip separately so the completed
+                # counter can be adjusted without a COUNT. The others go
+                # first: once flipped, a row would match their filter too.
+                unchanged = queryset.filter(completed=values['completed']).update(**values)
+                flipped = queryset.exclude(completed=values['completed']).update(**values)
+                updated = unchanged + flipped
+                completed_delta = flipped if values['completed'] else -flipped
+            else:
+                updated = queryset.update(**values)
+                completed_delta = 0
+            if updated:
+                record_change(request.user.pk, updated=None, completed=completed_delta)
+        return Response({'updated': updated}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """
+        Return the user's task counts from the denormalized counters.
+        """
+        return Response(get_task_stats(request.user.pk))
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        Return what changed since ``?since=`` (omit it for a full sync).
+        """
+        since = request.query_params.get('since')
+        cursor = SyncCursor.decode(since) if since else None
+        try:
+            limit = int(request.query_params.get('limit', 0))
+        except ValueError:
+            raise ValidationError({'limit': ['A valid integer is required.']})
+
+        tasks, deleted, cursor, has_more = get_changes(request.user, cursor, limit)
+        with timed('serialize'):
+            changes = TaskSerializer(tasks, many=True).data
+        return Response({
+            'changes': changes,
+            'deleted': deleted,
+            'cursor': cursor.encode(),
+            'has_more': has_more,
+        })
+
+    @action(detail=False, methods=['post'], url_path='events/ticket')
+    def events_ticket(self, request):
+        """
+        Issue a ticket that opens one ``/api/tasks/events/`` stream (see
+        ``tasks.events``).
+        """
+        return Response({
+            'ticket': issue_ticket(request.user),
+            'expires_in': settings.TASK_EVENTS['TICKET_MAX_AGE'],
+        })
+
+    @action(detail=False, methods=['get'], renderer_classes=[NDJSONRenderer, CSVRenderer])
+    def export(self, request):
+        """
+        Stream every task matching the list filters as NDJSON (default) or
+        CSV, chosen with ``?format=`` or the Accept header. Rows are read
+        with ``iterator()`` in chunks of ``TASK_EXPORT_CHUNK_SIZE`` so
+        memory use does not grow with the number of tasks.
+        """
+        rows = self.get_row_serializer()
+        queryset = rows.values(self.filter_queryset(self.get_queryset()))
+        chunk_size = settings.TASK_EXPORT_CHUNK_SIZE
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.render_rows(
+                map(rows.to_representation, queryset.iterator(chunk_size=chunk_size)),
+                fields=list(rows.columns),
+                chunk_size=chunk_size,
+            ),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}',
+        )
+        response['Content-Disposition'] = f'attachment; filename="tasks.{renderer.format}"'
+        return response
+
+    @action(detail=False, methods=['post'], url_path='export/background')
+    def export_background(self, request):
+        """
+        Export every task matching the list filters to a file in the
+        background (see ``tasks.exporting``).
+        """
+        data_format = request.data.get('format', 'ndjson') if isinstance(request.data, dict) else None
+        if data_format not in EXPORT_RENDERERS:
+            raise ValidationError({'format': ['Expected "ndjson" or "csv".']})
+        return self.enqueue_job('tasks.export', {
+            'format': data_format,
+            'query': request.query_params.urlencode(),
+        })
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[])
+    def import_tasks(self, request):
+        """
+        Create tasks from an NDJSON (``application/x-ndjson``) or CSV
+        (``text/csv``, with a header row) body, read line by line. See
+        ``tasks.importing`` for the commit modes.
+
+        With ``?background=true`` the body is saved and imported by a job.
+        """
+        data_format = format_for_content_type(request.content_type)
+        if data_format is None:
+            raise UnsupportedMediaType(request.content_type)
+        commit = request.query_params.get('commit', 'end')
+        if commit not in ('end', 'batch'):
+            raise ValidationError({'commit': ['Expected "end" or "batch".']})
+
+        if request.query_params.get('background', '').lower() in ('true', '1'):
+            upload = default_storage.save(
+                f'imports/{request.user.pk}/{uuid4().hex}.{data_format}', File(request.stream or io.BytesIO()),
+            )
+            return self.enqueue_job('tasks.import', {'file': upload, 'format': data_format, 'commit': commit})
+
+        lines = request.stream or io.BytesIO()
+        with tempfile.SpooledTemporaryFile(max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE) as spooled:
+            if commit == 'end':
+                # The whole import is one transaction: receive the upload
+                # first (on disk past FILE_UPLOAD_MAX_MEMORY_SIZE) so a slow
+                # client cannot hold the transaction open.
+                shutil.copyfileobj(lines, spooled)
+                spooled.seek(0)
+                lines = spooled
+            result = import_tasks(
+                request.user,
+                read_rows(lines, data_format),
+                batch_size=settings.TASK_IMPORT_BATCH_SIZE,
+                atomic=commit == 'end',
+                max_errors=settings.TASK_IMPORT_MAX_ERRORS,
+            )
+        if not result.committed or result.stopped_at or (result.invalid and not result.created):
+            response_status = status.HTTP_400_BAD_REQUEST
+        elif result.invalid:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_201_CREATED
+        return Response(result.as_dict(), status=response_status)
+
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    The user's background jobs (see tasks.jobs), newest first:
+    - list: GET /api/jobs/
+    - retrieve: GET /api/jobs/{id}/ - poll until ``status`` is
+      ``succeeded`` or ``failed``
+    - download: GET /api/jobs/{id}/download/ - the file a succeeded export
+      wrote
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = JobSerializer
+
+    def get_queryset(self):
+        return Job.objects.filter(user_id=self.request.user.pk)
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        job = self.get_object()
+        name = (job.result or {}).get('file') if job.status == Job.SUCCEEDED else None
+        if not name or not default_storage.exists(name):
+            raise NotFound('This job has no file to download.')
+        return FileResponse(default_storage.open(name, 'rb'), as_attachment=True, filename=os.path.basename(name))
@@ -0,0 +1,234 @@
+"""
+Per-request performance instrumentation.
+
+``PerformanceMiddleware`` measures every request and reports the numbers in
+a ``Server-Timing`` header, which browsers show in their network panel:
+
+- ``db``: number of SQL queries and the time spent executing them, on every
+  database connection, captured by an execute wrapper (see
+  ``record_query()``);
+- ``view``: time spent in the view, up to the response being returned;
+- ``serialize``: time spent turning rows into response data, for the code
+  paths wrapped in ``timed('serialize')``;
+- ``render``: time spent rendering the response body (DRF renderers);
+- ``total``: time spent in the rest of the middleware stack and the view.
+
+Requests slower than ``SLOW_REQUEST_THRESHOLD_MS`` are logged as a
+structured record on the ``todo_project.performance.slow`` logger,
+including their SQL with literals normalized and identical statements
+grouped, so an N+1 shows up as one statement with a large count.
+"""
+import json
+import logging
+import re
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger('todo_project.performance.slow')
+
+_current = ContextVar('request_timing', default=None)
+
+
+class RequestTiming:
+    """Timings and SQL collected for one request."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.view_start = self.view_end = self.render_end = None
+        self.spans = defaultdict(float)
+        self.queries = defaultdict(lambda: [0, 0.0])
+        self.query_count = 0
+        self.query_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.query_count += 1
+            self.query_time += elapsed
+            entry = self.queries[sql]
+            entry[0] += 1
+            entry[1] += elapsed
+
+    def metrics(self, end):
+        """Return ``{name: (milliseconds, description)}`` for Server-Timing."""
+        metrics = {'db': (self.query_time * 1000, f'{self.query_count} queries')}
+        if self.view_start is not None:
+            view_end = self.view_end or end
+            metrics['view'] = ((view_end - self.view_start) * 1000, None)
+            if self.view_end is not None and self.render_end is not None:
+                metrics['render'] = ((self.render_end - self.view_end) * 1000, None)
+        for name, seconds in self.spans.items():
+            metrics[name] = (seconds * 1000, None)
+        metrics['total'] = ((end - self.start) * 1000, None)
+        return metrics
+
+    def grouped_queries(self):
+        """
+        Return the request's SQL grouped by normalized statement, slowest
+        group first, as ``[{'sql', 'count', 'time_ms'}]``.
+        """
+        groups = defaultdict(lambda: [0, 0.0])
+        for sql, (count, seconds) in self.queries.items():
+            group = groups[normalize_sql(sql)]
+            group[0] += count
+            group[1] += seconds
+        return [
+            {'sql': sql, 'count': count, 'time_ms': round(seconds * 1000, 3)}
+            for sql, (count, seconds) in sorted(groups.items(), key=lambda item: -item[1][1])
+        ]
+
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w"])-?\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    """
+    Replace literals and placeholders with ``?`` and collapse ``IN`` lists,
+    so statements that differ only in their values compare equal.
+    """
+    sql = _STRING.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _NUMBER.sub('?', sql)
+    sql = _PLACEHOLDER_LIST.sub('(...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Execute wrapper that adds the query to the current request's timing.
+
+    Connections belong to a thread, and under ASGI the queries run on a
+    ``sync_to_async`` thread rather than where the request started. The
+    wrapper therefore stays installed on each connection and finds the
+    request through ``_current``, which asgiref copies into that thread.
+    """
+    timing = _current.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    return timing(execute, sql, params, many, context)
+
+
+def install_query_recorder():
+    """Add ``record_query()`` to the calling thread's connections, once."""
+    for connection in connections.all():
+        if record_query not in connection.execute_wrappers:
+            connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def timed(name):
+    """
+    Add the time spent in the block to the current request's ``name``
+    metric. Does nothing outside an instrumented request.
+    """
+    timing = _current.get()
+    if timing is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.spans[name] += time.perf_counter() - start
+
+
+class PerformanceMiddleware:
+    """
+    Time each request and add a ``Server-Timing`` header; log slow ones.
+
+    Place it first in ``MIDDLEWARE`` so ``total`` covers the whole stack.
+    ``SERVER_TIMING`` turns the header off (the slow-request log still
+    works) and ``SLOW_REQUEST_THRESHOLD_MS = 0`` disables the log.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        install_query_recorder()
+        timing = RequestTiming()
+        token = _current.set(timing)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timing)
+
+    async def __acall__(self, request):
+        # The async ORM and the sync views run on the request's
+        # thread-sensitive thread: install the recorder there.
+        await sync_to_async(install_query_recorder)()
+        timing = RequestTiming()
+        token = _current.set(timing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timing)
+
+    def finish(self, request, response, timing):
+        end = time.perf_counter()
+        metrics = timing.metrics(end)
+        if getattr(settings, 'SERVER_TIMING', True):
+            response['Server-Timing'] = ', '.join(
+                f'{name};dur={ms:.2f}' + (f';desc="{desc}"' if desc else '')
+                for name, (ms, desc) in metrics.items()
+            )
+        threshold = getattr(settings, 'SLOW_REQUEST_THRESHOLD_MS', 0)
+        if threshold and metrics['total'][0] >= threshold:
+            self.log_slow_request(request, response, timing, metrics)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timing = _current.get()
+        if timing is not None:
+            timing.view_start = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns; split the two.
+        timing = _current.get()
+        if timing is not None:
+            timing.view_end = time.perf_counter()
+            response.add_post_render_callback(lambda response: self._rendered(timing))
+        return response
+
+    @staticmethod
+    def _rendered(timing):
+        timing.render_end = time.perf_counter()
+
+    def log_slow_request(self, request, response, timing, metrics):
+        queries = timing.grouped_queries()
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'user_id': getattr(getattr(request, 'user', None), 'pk', None),
+            **{f'{name}_ms': round(ms, 3) for name, (ms, _) in metrics.items()},
+            'queries': timing.query_count,
+            'duplicate_queries': sum(group['count'] - 1 for group in queries),
+            'sql': queries,
+        }
+        logger.warning(
+            'Slow request: %s %s took %.0fms', request.method, request.path, metrics['total'][0],
+            extra={'slow_request': record, 'structured': json.dumps(record)},
+        )
@@ -0,0 +1,123 @@
+"""
+Read replica routing with read-your-writes.
+
+``ReplicaRouter`` sends reads to a replica only while a request has opted
+in with ``use_replica()``, which ``ReplicaReadMixin`` does for the safe
+(GET/HEAD/OPTIONS) requests of a DRF view; everything else, including
+every write, stays on ``default``. One replica is picked per request so
+its queries (e.g. a page and its count) see the same snapshot.
+
+Replicas lag behind the primary, so a user who has just written would not
+see the change on one. Every unsafe request pins its user to the primary
+for ``READ_REPLICAS['LAG_TOLERANCE']`` seconds; set it above the replicas'
+worst lag. Pins are kept in the ``READ_REPLICAS['CACHE_ALIAS']`` cache,
+which must be shared when several processes serve the API.
+"""
+import math
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+
+
+_replica = ContextVar('read_replica', default=None)
+
+
+def replica_aliases():
+    return settings.READ_REPLICAS['ALIASES']
+
+
+def _pin_key(user_id):
+    return f'replicas:pinned:{user_id}'
+
+
+def _pins():
+    return caches[settings.READ_REPLICAS['CACHE_ALIAS']]
+
+
+def _pin_timeout():
+    """Seconds to pin a writer for, or None when pins are not needed."""
+    tolerance = settings.READ_REPLICAS['LAG_TOLERANCE']
+    return math.ceil(tolerance) if replica_aliases() and tolerance > 0 else None
+
+
+def pin_to_primary(user_id):
+    """Keep ``user_id``'s reads on the primary for the lag tolerance."""
+    timeout = _pin_timeout()
+    if timeout:
+        _pins().set(_pin_key(user_id), True, timeout)
+
+
+async def apin_to_primary(user_id):
+    timeout = _pin_timeout()
+    if timeout:
+        await _pins().aset(_pin_key(user_id), True, timeout)
+
+
+def use_replica(user_id):
+    """
+    Route the current context's reads to a replica, unless there are none
+    or ``user_id`` wrote recently. Return a token for ``release_replica()``,
+    or None if reads stay on the primary.
+    """
+    aliases = replica_aliases()
+    if not aliases or _pins().get(_pin_key(user_id), False):
+        return None
+    return _replica.set(random.choice(aliases))
+
+
+async def ause_replica(user_id):
+    aliases = replica_aliases()
+    if not aliases or await _pins().aget(_pin_key(user_id), False):
+        return None
+    return _replica.set(random.choice(aliases))
+
+
+def release_replica(token):
+    _replica.reset(token)
+
+
+class ReplicaRouter:
+    """Reads go to the replica chosen by ``use_replica()``, if any."""
+
+    def db_for_read(self, model, **hints):
+        return _replica.get()
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Replicas get their schema from the primary.
+        return False if db in replica_aliases() else None
+
+
+class ReplicaReadMixin:
+    """
+    Serve a DRF view's safe requests from a read replica and pin the user
+    to the primary after any other request.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        self.replica_token = self.writer_id = None
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            if self.replica_token is not None:
+                release_replica(self.replica_token)
+            if self.writer_id is not None:
+                pin_to_primary(self.writer_id)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Authentication and permissions have run on the primary.
+        if request.user.is_authenticated:
+            if request.method in SAFE_METHODS:
+                self.replica_token = use_replica(request.user.pk)
+            else:
+                self.writer_id = request.user.pk
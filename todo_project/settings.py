@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from decouple import config
 
@@ -49,6 +50,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "todo_project.performance.PerformanceMiddleware",
+    "todo_project.throttling.LoadSheddingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -90,6 +93,74 @@ DATABASES = {
     }
 }
 
+# DATABASE_PROFILE=production switches to the tuned SQLite backend in
+# todo_project.sqlite: WAL (readers never wait for the writer), writers
+# queued on busy_timeout behind short BEGIN IMMEDIATE transactions instead
+# of failing with "database is locked", a 64 MB page cache, 256 MB of
+# memory-mapped I/O and connections kept for CONN_MAX_AGE seconds.
+DATABASE_PROFILE = config('DATABASE_PROFILE', default='development')
+
+if DATABASE_PROFILE == 'production':
+    DATABASES["default"].update({
+        "ENGINE": "todo_project.sqlite",
+        "CONN_MAX_AGE": config('CONN_MAX_AGE', default=600, cast=int),
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            "transaction_mode": "IMMEDIATE",
+            "pragmas": {
+                "journal_mode": "wal",
+                "synchronous": "normal",
+                "busy_timeout": config('SQLITE_BUSY_TIMEOUT_MS', default=10000, cast=int),
+                "cache_size": -64000,
+                "mmap_size": 268435456,
+                "temp_store": "memory",
+            },
+        },
+    })
+
+# Read replicas: DATABASE_REPLICAS is a comma-separated list of database
+# files kept in sync with the primary (locally, `manage.py sync_replicas`
+# copies it), added as replica1, replica2, ... Safe requests to the task
+# and profile endpoints read from a replica; writes and everything else use
+# "default". After a write, the user's reads stay on the primary for
+# LAG_TOLERANCE seconds, which must exceed the replicas' worst lag. Pins are
+# kept in the CACHE_ALIAS cache; share it between processes.
+DATABASE_REPLICAS = [name for name in config('DATABASE_REPLICAS', default='').split(',') if name]
+
+for index, name in enumerate(DATABASE_REPLICAS, 1):
+    DATABASES[f"replica{index}"] = {**DATABASES["default"], "NAME": name, "TEST": {"MIRROR": "default"}}
+
+READ_REPLICAS = {
+    'ALIASES': [f'replica{index}' for index in range(1, len(DATABASE_REPLICAS) + 1)],
+    'LAG_TOLERANCE': config('DATABASE_REPLICA_LAG_TOLERANCE', default=5, cast=float),
+    'CACHE_ALIAS': 'default',
+}
+
+# Task sharding: TASK_SHARDS is a comma-separated list of database files
+# added as shard1, shard2, ... Each user's tasks then live on one of
+# "default" and those shards, chosen by consistent hashing of the user id
+# (VNODES ring points per shard), so adding a shard moves about 1/N of the
+# users. Run `manage.py migrate --database shardN` for every shard and
+# `manage.py reshard_tasks` after changing the list. Task ids are reserved
+# from "default" ID_BLOCK_SIZE at a time per process. With sharding on,
+# task reads go to the shards rather than the read replicas.
+TASK_SHARD_FILES = [name for name in config('TASK_SHARDS', default='').split(',') if name]
+
+TASK_SHARDS = {
+    'ALIASES': [],
+    'VNODES': config('TASK_SHARD_VNODES', default=64, cast=int),
+    'ID_BLOCK_SIZE': config('TASK_SHARD_ID_BLOCK_SIZE', default=1000, cast=int),
+}
+
+for index, name in enumerate(TASK_SHARD_FILES, 1):
+    DATABASES[f"shard{index}"] = {**DATABASES["default"], "NAME": name}
+    TASK_SHARDS['ALIASES'].append(f"shard{index}")
+
+if TASK_SHARDS['ALIASES']:
+    TASK_SHARDS['ALIASES'].insert(0, "default")
+
+DATABASE_ROUTERS = ['tasks.sharding.ShardRouter', 'todo_project.replicas.ReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -109,6 +180,31 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing (authentication.hashers, authentication.hashing). HASHER
+# is what new and rehashed passwords use: 'pbkdf2' (PBKDF2-SHA256) or
+# 'scrypt' (hashlib.scrypt). PBKDF2_ITERATIONS and SCRYPT_WORK_FACTOR set
+# the cost. A password stored with the other hasher, or another cost, is
+# rehashed when its user next logs in. Login and registration hash on a pool
+# of WORKERS threads (at most that many cores busy hashing) with QUEUE_SIZE
+# more requests waiting; beyond that they are answered 503.
+PASSWORD_HASHING = {
+    'HASHER': config('PASSWORD_HASHER', default='pbkdf2'),
+    'PBKDF2_ITERATIONS': config('PASSWORD_HASHER_PBKDF2_ITERATIONS', default=600000, cast=int),
+    'SCRYPT_WORK_FACTOR': config('PASSWORD_HASHER_SCRYPT_WORK_FACTOR', default=2**14, cast=int),
+    'WORKERS': config('PASSWORD_HASHING_WORKERS', default=max(1, (os.cpu_count() or 1) // 2), cast=int),
+    'QUEUE_SIZE': config('PASSWORD_HASHING_QUEUE_SIZE', default=64, cast=int),
+}
+
+PASSWORD_HASHERS = {
+    'pbkdf2': ['authentication.hashers.PBKDF2PasswordHasher', 'authentication.hashers.ScryptPasswordHasher'],
+    'scrypt': ['authentication.hashers.ScryptPasswordHasher', 'authentication.hashers.PBKDF2PasswordHasher'],
+}[PASSWORD_HASHING['HASHER']] + [
+    # Still verify hashes made with Django's other default hashers.
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+]
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
@@ -136,7 +232,7 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # Django REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'authentication.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -149,6 +245,186 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'todo_project.throttling.ScopedTokenBucketThrottle',
+        'todo_project.throttling.IPTokenBucketThrottle',
+    ],
+}
+
+# Token-bucket throttling of the API (todo_project.throttling), kept in
+# process memory. A rate of "N/s", "N/min", "N/hour" or "N/day" allows
+# bursts of N requests refilled over the period; an empty rate turns the
+# scope off. 'login' limits logins per client IP, 'read' and 'write' each
+# user's safe and unsafe requests (per IP when anonymous), and 'ip' every
+# API request from one IP. MAX_ENTRIES bounds the buckets kept per process.
+THROTTLING = {
+    'RATES': {
+        'login': config('THROTTLE_RATE_LOGIN', default='20/min'),
+        'read': config('THROTTLE_RATE_READ', default='1200/min'),
+        'write': config('THROTTLE_RATE_WRITE', default='600/min'),
+        'ip': config('THROTTLE_RATE_IP', default='6000/min'),
+    },
+    'MAX_ENTRIES': config('THROTTLE_MAX_ENTRIES', default=100000, cast=int),
+}
+
+# Load shedding (todo_project.throttling.LoadSheddingMiddleware): requests
+# to PATHS are answered 503 with Retry-After: RETRY_AFTER seconds while the
+# process has MAX_IN_FLIGHT requests in flight, or while the fastest request
+# of the last INTERVAL_MS took longer than TARGET_LATENCY_MS and others are
+# in flight (a standing queue). 0 turns either check off.
+LOAD_SHEDDING = {
+    'PATHS': ['/api/tasks/'],
+    'MAX_IN_FLIGHT': config('LOAD_SHEDDING_MAX_IN_FLIGHT', default=100, cast=int),
+    'TARGET_LATENCY_MS': config('LOAD_SHEDDING_TARGET_LATENCY_MS', default=500, cast=int),
+    'INTERVAL_MS': config('LOAD_SHEDDING_INTERVAL_MS', default=1000, cast=int),
+    'RETRY_AFTER': config('LOAD_SHEDDING_RETRY_AFTER', default=1, cast=int),
+}
+
+# The cache behind every CACHE_ALIAS below. The default is local to each
+# process; set CACHE_BACKEND to e.g.
+# django.core.cache.backends.filebased.FileBasedCache or
+# django.core.cache.backends.redis.RedisCache, and CACHE_LOCATION to its
+# directory or URL, to share it between processes.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    }
+}
+
+# Token -> user lookups made by CachedTokenAuthentication are cached so most
+# requests authenticate without a database round trip. BACKEND is 'django'
+# (the CACHE_ALIAS cache) or 'local' (per-process LRU of MAX_ENTRIES tokens).
+# Revocations (logout, token deletion, deactivation) evict the token from
+# the cache of the process that handled them: other processes only see them
+# at once through a shared CACHE_BACKEND, and otherwise within TIMEOUT, the
+# TTL in seconds, which is kept short for that reason.
+TOKEN_AUTH_CACHE = {
+    'BACKEND': config('TOKEN_AUTH_CACHE_BACKEND', default='django'),
+    'TIMEOUT': config('TOKEN_AUTH_CACHE_TIMEOUT', default=5, cast=int),
+    'MAX_ENTRIES': config('TOKEN_AUTH_CACHE_MAX_ENTRIES', default=10000, cast=int),
+    'CACHE_ALIAS': 'default',
+}
+
+# Task list pagination: 'page' (numbered pages with a total count) or
+# 'cursor' (keyset pages, constant cost at any depth). Clients can override
+# it per request with ?pagination=page|cursor.
+TASK_PAGINATION_MODE = config('TASK_PAGINATION_MODE', default='page')
+
+# Task list and detail response data is cached in the CACHE_ALIAS cache,
+# keyed by the user's data version so any write to their tasks invalidates
+# it at once (see tasks.response_cache). TIMEOUT is how long entries are
+# kept, in seconds; 0 turns the cache off.
+TASK_RESPONSE_CACHE = {
+    'TIMEOUT': config('TASK_RESPONSE_CACHE_TIMEOUT', default=300, cast=int),
+    'CACHE_ALIAS': 'default',
+}
+
+# Maximum number of items accepted by one /api/tasks/bulk/ request.
+TASK_BULK_MAX_ITEMS = config('TASK_BULK_MAX_ITEMS', default=1000, cast=int)
+
+# Task full-text search: 'auto' uses SQLite FTS5 or a PostgreSQL tsvector
+# index when the migration installed one, 'none' always uses the plain
+# icontains search, anything else is the dotted path of a
+# tasks.search.SearchBackend subclass.
+TASK_SEARCH_BACKEND = config('TASK_SEARCH_BACKEND', default='auto')
+
+# Delta sync (/api/tasks/changes/): the most upserts and deletes returned
+# per call, how far behind 'now' a caught-up cursor restarts so writes still
+# committing are not missed, and how long tombstones of deleted tasks are
+# kept before compact_tombstones removes them (older cursors must resync).
+TASK_SYNC_MAX_CHANGES = config('TASK_SYNC_MAX_CHANGES', default=500, cast=int)
+TASK_SYNC_OVERLAP_SECONDS = config('TASK_SYNC_OVERLAP_SECONDS', default=5, cast=int)
+TASK_TOMBSTONE_RETENTION_DAYS = config('TASK_TOMBSTONE_RETENTION_DAYS', default=30, cast=int)
+
+# Server-sent task events (/api/tasks/events/). BROKER is 'local' (wakes
+# streams for writes made in the same process), 'cache' (a counter in the
+# CACHE_ALIAS cache polled every POLL_INTERVAL seconds, for several
+# processes) or the dotted path of a tasks.events.Broker subclass. Idle
+# streams recheck the user's data version and send a keep-alive every
+# KEEPALIVE seconds; RETRY_MS is the browser's reconnect delay. Browsers
+# open streams with single-use tickets valid for TICKET_MAX_AGE seconds.
+TASK_EVENTS = {
+    'BROKER': config('TASK_EVENTS_BROKER', default='local'),
+    'CACHE_ALIAS': 'default',
+    'POLL_INTERVAL': config('TASK_EVENTS_POLL_INTERVAL', default=1.0, cast=float),
+    'KEEPALIVE': config('TASK_EVENTS_KEEPALIVE', default=15, cast=int),
+    'RETRY_MS': config('TASK_EVENTS_RETRY_MS', default=3000, cast=int),
+    'TICKET_MAX_AGE': config('TASK_EVENTS_TICKET_MAX_AGE', default=30, cast=int),
+}
+
+# archive_tasks moves completed tasks last updated more than AFTER_DAYS days
+# ago from the task table to the archive (see tasks.archiving), BATCH_SIZE
+# tasks per transaction.
+TASK_ARCHIVE = {
+    'AFTER_DAYS': config('TASK_ARCHIVE_AFTER_DAYS', default=90, cast=int),
+    'BATCH_SIZE': config('TASK_ARCHIVE_BATCH_SIZE', default=500, cast=int),
+}
+
+# Rows deleted per transaction by purge_deleted_users, which removes the
+# data of users who deleted their account (see tasks.purging).
+ACCOUNT_DELETION_BATCH_SIZE = config('ACCOUNT_DELETION_BATCH_SIZE', default=1000, cast=int)
+
+# Background jobs (tasks.jobs), run by manage.py run_worker: worker threads
+# per process, seconds between polls of an empty queue, attempts before a
+# job fails (retries wait BACKOFF_SECONDS, doubling each time), seconds
+# between heartbeats of a running job and seconds without a heartbeat after
+# which its worker is taken for dead (the job is run again or failed).
+JOB_QUEUE = {
+    'CONCURRENCY': config('JOB_QUEUE_CONCURRENCY', default=2, cast=int),
+    'POLL_INTERVAL': config('JOB_QUEUE_POLL_INTERVAL', default=1.0, cast=float),
+    'MAX_ATTEMPTS': config('JOB_QUEUE_MAX_ATTEMPTS', default=3, cast=int),
+    'BACKOFF_SECONDS': config('JOB_QUEUE_BACKOFF_SECONDS', default=10, cast=int),
+    'HEARTBEAT_INTERVAL': config('JOB_QUEUE_HEARTBEAT_INTERVAL', default=30, cast=float),
+    'LOCK_TIMEOUT': config('JOB_QUEUE_LOCK_TIMEOUT', default=300, cast=int),
+}
+
+# Files written and read by background jobs: export results and uploads
+# waiting to be imported. Must be shared by the web and worker processes.
+MEDIA_ROOT = config('MEDIA_ROOT', default=str(BASE_DIR / 'media'))
+
+# Rows fetched from the database, and rendered, per chunk of a streamed
+# /api/tasks/export/ response.
+TASK_EXPORT_CHUNK_SIZE = config('TASK_EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
+# /api/tasks/import/ and import_tasks: rows inserted per bulk_create batch
+# and the most row errors included in the report.
+TASK_IMPORT_BATCH_SIZE = config('TASK_IMPORT_BATCH_SIZE', default=1000, cast=int)
+TASK_IMPORT_MAX_ERRORS = config('TASK_IMPORT_MAX_ERRORS', default=100, cast=int)
+
+# Serve task list/detail requests with the native async views in
+# tasks.async_views. Only worth enabling when running under ASGI
+# (todo_project.asgi); under WSGI every request would start an event loop.
+TASK_ASYNC_VIEWS = config('TASK_ASYNC_VIEWS', default=False, cast=bool)
+
+# Serve JSON login and registration requests with the native async views in
+# authentication.async_views, which wait for the password hashing pool
+# without holding a thread. Same caveat as TASK_ASYNC_VIEWS.
+AUTH_ASYNC_VIEWS = config('AUTH_ASYNC_VIEWS', default=TASK_ASYNC_VIEWS, cast=bool)
+
+# Request instrumentation (todo_project.performance): SERVER_TIMING adds a
+# Server-Timing header with db/view/serialize/render/total times, and
+# requests slower than SLOW_REQUEST_THRESHOLD_MS (0 disables) are logged
+# with their grouped SQL to the todo_project.performance.slow logger.
+SERVER_TIMING = config('SERVER_TIMING', default=True, cast=bool)
+SLOW_REQUEST_THRESHOLD_MS = config('SLOW_REQUEST_THRESHOLD_MS', default=500, cast=int)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'slow_request': {'format': '%(asctime)s %(levelname)s %(message)s %(structured)s'},
+    },
+    'handlers': {
+        'slow_request': {'class': 'logging.StreamHandler', 'formatter': 'slow_request'},
+    },
+    'loggers': {
+        'todo_project.performance.slow': {
+            'handlers': ['slow_request'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
 }
 
 # CORS Settings (for frontend development)
@@ -0,0 +1,59 @@
+"""
+SQLite backend tuned for serving concurrent requests.
+
+Django's SQLite backend opens transactions with a plain ``BEGIN``, which is
+``DEFERRED``: the transaction starts as a reader and upgrades to a writer
+at its first write. When two such transactions both read and then write,
+the upgrade cannot wait for the other one (that would deadlock), so SQLite
+fails immediately with "database is locked" whatever the busy timeout.
+``BEGIN IMMEDIATE`` takes the write lock up front, so concurrent writers
+queue on ``busy_timeout`` instead and writes are serialized.
+
+Two extra ``OPTIONS`` are understood, everything else is passed to
+``sqlite3.connect()`` as usual:
+
+- ``transaction_mode``: ``'DEFERRED'`` (the default), ``'IMMEDIATE'`` or
+  ``'EXCLUSIVE'``, the mode of every transaction Django starts;
+- ``pragmas``: ``{name: value}`` run on every new connection, e.g.
+  ``{'journal_mode': 'wal', 'busy_timeout': 5000}``.
+"""
+import re
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+
+PRAGMA_NAME = re.compile(r'^[a-z_]+$')
+PRAGMA_VALUE = re.compile(r'^-?[\w.]+$')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    transaction_modes = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+    def __init__(self, settings_dict, *args, **kwargs):
+        super().__init__(settings_dict, *args, **kwargs)
+        options = self.settings_dict['OPTIONS']
+        self.transaction_mode = options.get('transaction_mode', 'DEFERRED').upper()
+        if self.transaction_mode not in self.transaction_modes:
+            raise ImproperlyConfigured(
+                f"transaction_mode must be one of {', '.join(self.transaction_modes)}."
+            )
+        self.pragmas = options.get('pragmas', {})
+        for name, value in self.pragmas.items():
+            if not PRAGMA_NAME.match(name) or not PRAGMA_VALUE.match(str(value)):
+                raise ImproperlyConfigured(f'Invalid SQLite pragma: {name} = {value!r}')
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        kwargs.pop('transaction_mode', None)
+        kwargs.pop('pragmas', None)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.transaction_mode}')
@@ -0,0 +1,259 @@
+"""
+Per-client throttling and load shedding, in process memory.
+
+Two layers keep one runaway client, or a traffic spike, from tying up
+every worker:
+
+- ``ScopedTokenBucketThrottle`` and ``IPTokenBucketThrottle`` are DRF
+  throttles backed by token buckets (``THROTTLING['RATES']``): a rate of
+  ``"N/min"`` allows a burst of N requests, refilled at N per minute.
+  Scopes are ``login`` (``LoginView``), ``read`` and ``write`` (safe and
+  unsafe requests of every other view) per user, or per client IP when
+  anonymous, and ``ip`` for everything from one IP. A throttled request
+  gets ``429`` with ``Retry-After``.
+- ``LoadSheddingMiddleware`` answers ``503`` with ``Retry-After`` before
+  any authentication or view code runs when the process is overloaded
+  (``LOAD_SHEDDING``): too many requests in flight, or a standing queue,
+  i.e. even the fastest request of the last interval took longer than the
+  target latency while others were still waiting.
+
+Buckets and counters live in a bounded dict per process: O(1) per request
+and no database or cache round trip. With several processes every one
+enforces the rates on its own share of the traffic.
+"""
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import JsonResponse
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+
+PERIODS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """
+    Return ``(capacity, tokens per second)`` for a rate like ``"100/min"``,
+    or None for no limit.
+    """
+    if not rate:
+        return None
+    count, period = rate.split('/')
+    return int(count), int(count) / PERIODS[period]
+
+
+class TokenBuckets:
+    """Token buckets by key, least recently used ones forgotten past ``max_entries``."""
+
+    def __init__(self, max_entries, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, per_second):
+        """
+        Take a token from ``key``'s bucket. Return 0, or the seconds until a
+        token is available if the bucket is empty.
+        """
+        now = self.clock()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * per_second)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0
+            else:
+                wait = (1 - tokens) / per_second
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+_buckets = None
+
+
+def get_buckets():
+    """Return the process-wide buckets."""
+    global _buckets
+    if _buckets is None:
+        _buckets = TokenBuckets(settings.THROTTLING['MAX_ENTRIES'])
+    return _buckets
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Base throttle: one bucket per ``get_scope()`` and ``get_key()``."""
+
+    def get_scope(self, request, view):
+        raise NotImplementedError
+
+    def get_key(self, request, view):
+        return self.get_ident(request)
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(request, view)
+        rate = parse_rate(settings.THROTTLING['RATES'].get(scope))
+        if rate is None:
+            return True
+        self.delay = get_buckets().take(f'{scope}:{self.get_key(request, view)}', *rate)
+        return not self.delay
+
+    def wait(self):
+        return self.delay
+
+
+class ScopedTokenBucketThrottle(TokenBucketThrottle):
+    """
+    Per-user buckets (per IP for anonymous requests) in the view's
+    ``throttle_scope``, else ``read`` or ``write`` by request method.
+    """
+
+    def get_scope(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if scope:
+            return scope
+        return 'read' if request.method in SAFE_METHODS else 'write'
+
+    def get_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return f'ip:{self.get_ident(request)}'
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    """One bucket per client IP for every request, in the ``ip`` scope."""
+
+    def get_scope(self, request, view):
+        return 'ip'
+
+
+class LoadShedder:
+    """
+    In-flight counter and CoDel-style standing queue detection: an interval
+    whose fastest request took longer than ``target_latency`` marks the
+    next interval as overloaded.
+    """
+
+    def __init__(self, max_in_flight, target_latency, interval, clock=time.monotonic):
+        self.max_in_flight = max_in_flight
+        self.target_latency = target_latency
+        self.interval = interval
+        self.clock = clock
+        self.in_flight = 0
+        self.overloaded = False
+        self.window_start = clock()
+        self.window_min = None
+        self.shed = 0
+        self._lock = threading.Lock()
+
+    def admit(self):
+        """Count a request in, or return False if it should be shed."""
+        now = self.clock()
+        with self._lock:
+            if now - self.window_start >= self.interval:
+                self.overloaded = bool(
+                    self.target_latency and self.window_min is not None
+                    and self.window_min > self.target_latency
+                )
+                self.window_start, self.window_min = now, None
+            # A lone request is never queued behind others.
+            if (self.max_in_flight and self.in_flight >= self.max_in_flight) or (
+                self.overloaded and self.in_flight
+            ):
+                self.shed += 1
+                return False
+            self.in_flight += 1
+            return True
+
+    def done(self, latency):
+        with self._lock:
+            self.in_flight -= 1
+            if self.window_min is None or latency < self.window_min:
+                self.window_min = latency
+
+
+_shedder = None
+
+
+def get_load_shedder():
+    """Return the process-wide shedder configured by ``LOAD_SHEDDING``."""
+    global _shedder
+    if _shedder is None:
+        options = settings.LOAD_SHEDDING
+        _shedder = LoadShedder(
+            options['MAX_IN_FLIGHT'], options['TARGET_LATENCY_MS'] / 1000, options['INTERVAL_MS'] / 1000,
+        )
+    return _shedder
+
+
+@receiver(setting_changed)
+def reset_throttling(setting, **kwargs):
+    global _buckets, _shedder
+    if setting == 'THROTTLING':
+        _buckets = None
+    elif setting == 'LOAD_SHEDDING':
+        _shedder = None
+
+
+class LoadSheddingMiddleware:
+    """
+    Shed requests under ``LOAD_SHEDDING['PATHS']`` while the process is
+    overloaded. Place it right after ``PerformanceMiddleware``.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def applies(self, request):
+        return request.path.startswith(tuple(settings.LOAD_SHEDDING['PATHS']))
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.applies(request):
+            return self.get_response(request)
+        shedder = get_load_shedder()
+        if not shedder.admit():
+            return self.busy_response()
+        start = time.perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            shedder.done(time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        if not self.applies(request):
+            return await self.get_response(request)
+        shedder = get_load_shedder()
+        if not shedder.admit():
+            return self.busy_response()
+        start = time.perf_counter()
+        try:
+            return await self.get_response(request)
+        finally:
+            shedder.done(time.perf_counter() - start)
+
+    @staticmethod
+    def busy_response():
+        response = JsonResponse({'detail': 'The server is busy, try again shortly.'}, status=503)
+        response['Retry-After'] = str(settings.LOAD_SHEDDING['RETRY_AFTER'])
+        return response